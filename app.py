@@ -28,26 +28,6 @@ from shinyrealtime import realtime_server, realtime_ui
 
 load_dotenv()
 
-pricing_gpt4_realtime = {
-    "input_text": 4 / 1e6,
-    "input_audio": 32 / 1e6,
-    "input_image": 5 / 1e6,
-    "input_text_cached": 0.4 / 1e6,
-    "input_audio_cached": 0.4 / 1e6,
-    "input_image_cached": 0.5 / 1e6,
-    "output_text": 16 / 1e6,
-    "output_audio": 64 / 1e6,
-}
-
-pricing_gpt_4o_mini = {
-    "input_text": 0.6 / 1e6,
-    "input_audio": 10 / 1e6,
-    "input_text_cached": 0.3 / 1e6,
-    "input_audio_cached": 0.3 / 1e6,
-    "output_text": 2.4 / 1e6,
-    "output_audio": 20 / 1e6,
-}
-
 
 def hidden_audio_el(id: str, file_path: str, media_type: str = "audio/mp3"):
     """Create a hidden HTML audio element with embedded audio data."""
@@ -115,9 +95,6 @@ app_ui = ui.page_sidebar(
 def server(input: Inputs, output: Outputs, session: Session):
     last_code = reactive.value()
 
-    # Setup cost tracking
-    running_cost = reactive.value(0)
-
     async def run_python_plot_code(code: str):
         """Run Python code that generates a plot."""
 
@@ -161,38 +138,6 @@ def server(input: Inputs, output: Outputs, session: Session):
         if event["item"]["type"] == "function_call":
             ui.notification_remove(id=event["item"]["id"])
 
-    @realtime_controls.on("response.done")
-    async def _track_session_cost(event):
-        "Track session cost"
-
-        usage = event.get("response", {}).get("usage", {})
-        if not usage:
-            return
-
-        input_token_details = usage.get("input_token_details", {})
-        output_token_details = usage.get("output_token_details", {})
-        cached_tokens_details = input_token_details.get("cached_tokens_details", {})
-
-        current_response = {
-            "input_text": input_token_details.get("text_tokens", 0),
-            "input_audio": input_token_details.get("audio_tokens", 0),
-            "input_image": input_token_details.get("image_tokens", 0),
-            "input_text_cached": cached_tokens_details.get("text_tokens", 0),
-            "input_audio_cached": cached_tokens_details.get("audio_tokens", 0),
-            "input_image_cached": cached_tokens_details.get("image_tokens", 0),
-            "output_text": output_token_details.get("text_tokens", 0),
-            "output_audio": output_token_details.get("audio_tokens", 0),
-        }
-
-        # Calculate cost
-        cost = 0
-        for k, v in current_response.items():
-            if k in pricing_gpt4_realtime:
-                cost += v * pricing_gpt4_realtime[k]
-
-        with reactive.isolate():
-            running_cost.set(running_cost() + cost)
-
     @realtime_controls.on("response.created")
     async def _clear_transcript(event: Dict[str, Any]):
         "Clear the transcript when a new response starts"
@@ -225,7 +170,7 @@ def server(input: Inputs, output: Outputs, session: Session):
 
     @render.text
     def session_cost():
-        return f"Session cost: ${running_cost():.4f}"
+        return f"Session cost: ${realtime_controls.usage.cost():.4f}"
 
 
 def exec_with_return(code: str, globals: dict, locals: dict) -> Any | None:
@@ -0,0 +1,32 @@
+"""
+A local stand-in for the OpenAI API, shared by the benchmarks and the tests.
+"""
+
+import contextlib
+
+
+@contextlib.asynccontextmanager
+async def stand_in_server(routes):
+    """
+    Serve aiohttp `routes` on a free local port, as a stand-in for the OpenAI
+    API, and yield its base URL, e.g. "http://127.0.0.1:1234".
+
+    The process-wide HTTP client is closed on the way out, as it belongs to
+    the event loop the stand-in ran in.
+    """
+    from aiohttp import web
+
+    from shinyrealtime._secrets import close_http_session
+
+    app = web.Application()
+    app.add_routes(routes)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]  # type: ignore[union-attr]
+    try:
+        yield f"http://127.0.0.1:{port}"
+    finally:
+        await close_http_session()
+        await runner.cleanup()
@@ -0,0 +1,405 @@
+"""
+Replay realtime event streams through `realtime_server` and report how the
+server-side event path performs.
+
+Each scenario runs `realtime_server` in an in-memory Shiny session (no browser
+and no network; client secrets come from a local stand-in server), feeds it a
+synthetic or recorded stream of events through the `key_event` input, and
+reports:
+
+- throughput (events/s)
+- per-message latency (input message -> reactive flush done), p50/p99
+- dispatch latency (input message -> `on()` handler called), p50/p99
+- reactive flushes per event
+- net allocated blocks per event and peak traced memory (second, traced run)
+
+Usage:
+
+    uv run python pkg-py/benchmarks/bench_events.py
+    uv run python pkg-py/benchmarks/bench_events.py --scenario tool_burst --events 2000
+    uv run python pkg-py/benchmarks/bench_events.py --replay session.jsonl --rate 500
+    uv run python pkg-py/benchmarks/bench_events.py --json after.json --compare before.json
+
+`--replay` takes a JSONL file with one realtime event per line, e.g. captured
+from the browser's data channel.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+import tracemalloc
+from dataclasses import dataclass, field
+from typing import Any, Callable
+
+from aiohttp import web
+from shiny import App, ui
+from shiny.testserver import test_server_async
+from shinyrealtime import realtime_server, realtime_ui
+
+from _stand_in import stand_in_server
+
+MODULE_ID = "rt"
+
+
+@dataclass
+class Scenario:
+    """A stream of input messages plus the server setup to replay it against."""
+
+    name: str
+    description: str
+    # Payloads for the key_event input: one event, or a JSON array of events
+    messages: list[str]
+    events: int
+    handler_types: list[str] = field(default_factory=list)
+    tools: list[Callable[..., Any]] = field(default_factory=list)
+    server_kwargs: dict[str, Any] = field(default_factory=dict)
+    # Number of tool output messages to wait for after the last input message
+    expected_sends: int = 0
+
+
+def transcript_delta(i: int) -> dict[str, Any]:
+    return {
+        "type": "response.output_audio_transcript.delta",
+        "event_id": f"event_{i}",
+        "response_id": "resp_1",
+        "item_id": "item_1",
+        "output_index": 0,
+        "content_index": 0,
+        "delta": "word ",
+    }
+
+
+def bench_tool(city: str) -> dict[str, Any]:
+    """A fast tool, so the benchmark measures the call path rather than the tool."""
+    return {"city": city, "temp_f": 72, "condition": "sunny"}
+
+
+def large_response_done(i: int, size: int = 50_000) -> dict[str, Any]:
+    transcript = ("lorem ipsum " * (size // 12))[:size]
+    return {
+        "type": "response.done",
+        "event_id": f"event_{i}",
+        "response": {
+            "id": f"resp_{i}",
+            "status": "completed",
+            "output": [
+                {
+                    "id": f"item_{i}",
+                    "type": "message",
+                    "role": "assistant",
+                    "content": [{"type": "output_audio", "transcript": transcript}],
+                }
+            ],
+            "usage": {
+                "total_tokens": 1200,
+                "input_tokens": 800,
+                "output_tokens": 400,
+                "input_token_details": {"text_tokens": 700, "audio_tokens": 100},
+                "output_token_details": {"text_tokens": 100, "audio_tokens": 300},
+            },
+        },
+    }
+
+
+def make_scenarios(n: int) -> dict[str, Scenario]:
+    deltas = [transcript_delta(i) for i in range(n)]
+    batch_size = 20
+    batches = [
+        json.dumps([json.dumps(e) for e in deltas[i : i + batch_size]])
+        for i in range(0, n, batch_size)
+    ]
+
+    calls_per_response = 4
+    n_responses = max(1, n // (calls_per_response + 1))
+    tool_messages = []
+    for r in range(n_responses):
+        for c in range(calls_per_response):
+            tool_messages.append(
+                json.dumps(
+                    {
+                        "type": "response.function_call_arguments.done",
+                        "response_id": f"resp_{r}",
+                        "item_id": f"item_{r}_{c}",
+                        "output_index": c,
+                        "call_id": f"call_{r}_{c}",
+                        "name": "bench_tool",
+                        "arguments": json.dumps({"city": f"City {c}"}),
+                    }
+                )
+            )
+        tool_messages.append(
+            json.dumps({"type": "response.done", "response": {"id": f"resp_{r}"}})
+        )
+
+    n_large = max(1, n // 20)
+    return {
+        "transcript_deltas": Scenario(
+            name="transcript_deltas",
+            description="transcript delta storm, one event per message, one handler",
+            messages=[json.dumps(e) for e in deltas],
+            events=n,
+            handler_types=["response.output_audio_transcript.delta"],
+        ),
+        "batched_deltas": Scenario(
+            name="batched_deltas",
+            description=f"the same deltas, {batch_size} events per message",
+            messages=batches,
+            events=n,
+            handler_types=["response.output_audio_transcript.delta"],
+        ),
+        "unhandled_deltas": Scenario(
+            name="unhandled_deltas",
+            description="deltas that no handler subscribes to",
+            messages=[json.dumps(e) for e in deltas],
+            events=n,
+            handler_types=["response.done"],
+        ),
+        "tool_burst": Scenario(
+            name="tool_burst",
+            description=f"{calls_per_response} function calls per response",
+            messages=tool_messages,
+            events=len(tool_messages),
+            tools=[bench_tool],
+            handler_types=["response.done"],
+            expected_sends=n_responses,
+        ),
+        "large_response_done": Scenario(
+            name="large_response_done",
+            description="50 KB response.done payloads with a wildcard handler",
+            messages=[json.dumps(large_response_done(i)) for i in range(n_large)],
+            events=n_large,
+            handler_types=["response.*"],
+        ),
+    }
+
+
+def replay_scenario(path: str) -> Scenario:
+    with open(path) as f:
+        messages = [line.strip() for line in f if line.strip()]
+    return Scenario(
+        name=f"replay:{os.path.basename(path)}",
+        description=f"recorded events from {path}",
+        messages=messages,
+        events=len(messages),
+        handler_types=["*"],
+    )
+
+
+async def mint(request: web.Request) -> web.Response:
+    """A stand-in for the client secrets endpoint."""
+    return web.json_response({"value": "ek_bench", "expires_at": 2**31})
+
+
+async def inject(session: Any, payload: str, input_id: str) -> None:
+    """
+    Send one key_event input message and wait for its reactive flush.
+
+    `set_inputs()` also sleeps and snapshots every output after each flush,
+    which would swamp the numbers, so go through the mock connection
+    directly when it's available.
+    """
+    app_session = getattr(session, "_session", None)
+    conn = getattr(session, "_conn", None)
+    if app_session is None or conn is None:
+        await session.set_inputs(**{input_id: payload})
+        return
+
+    flushed = asyncio.Event()
+    unregister = app_session.on_flushed(flushed.set, once=True)
+    try:
+        conn.cause_receive(
+            json.dumps({"method": "update", "data": {input_id: payload}})
+        )
+        await flushed.wait()
+    finally:
+        unregister()
+
+
+def percentile(values: list[float], q: float) -> float:
+    if not values:
+        return float("nan")
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+async def run_scenario(
+    scenario: Scenario, secrets_url: str, rate: float, trace: bool
+) -> dict[str, Any]:
+    injected_at = 0.0
+    dispatch_latencies: list[float] = []
+    message_latencies: list[float] = []
+    flushes = 0
+    sends = 0
+    sends_done = asyncio.Event()
+
+    async def handler(event: dict[str, Any]):
+        dispatch_latencies.append(time.perf_counter() - injected_at)
+
+    def server(input, output, session):
+        def count_flush():
+            nonlocal flushes
+            flushes += 1
+
+        session.on_flushed(count_flush, once=False)
+
+        send_custom_message = session.send_custom_message
+
+        async def counting_send_custom_message(type: str, message: Any):
+            nonlocal sends
+            if type == "realtime_send":
+                sends += 1
+                if sends >= scenario.expected_sends:
+                    sends_done.set()
+            await send_custom_message(type, message)
+
+        session.send_custom_message = counting_send_custom_message
+
+        rt = realtime_server(
+            MODULE_ID,
+            api_key="sk-bench",
+            client_secrets_url=secrets_url,
+            tools=scenario.tools,
+            **scenario.server_kwargs,
+        )
+        for event_type in scenario.handler_types:
+            rt.on(event_type)(handler)
+
+    app = App(ui.page_fluid(realtime_ui(MODULE_ID)), server)
+    input_id = f"{MODULE_ID}-key_event"
+
+    async with test_server_async(app, timeout_secs=60) as session:
+        # Don't count session startup
+        flushes = 0
+        if trace:
+            tracemalloc.start()
+        blocks_before = sys.getallocatedblocks()
+        interval = 1 / rate if rate > 0 else 0
+        started = time.perf_counter()
+
+        for i, message in enumerate(scenario.messages):
+            if interval:
+                delay = started + i * interval - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            injected_at = time.perf_counter()
+            await inject(session, message, input_id)
+            message_latencies.append(time.perf_counter() - injected_at)
+
+        if scenario.expected_sends:
+            await asyncio.wait_for(sends_done.wait(), timeout=60)
+        elapsed = time.perf_counter() - started
+        blocks_after = sys.getallocatedblocks()
+        peak = 0
+        if trace:
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+    return {
+        "scenario": scenario.name,
+        "events": scenario.events,
+        "messages": len(scenario.messages),
+        "elapsed_s": elapsed,
+        "events_per_s": scenario.events / elapsed,
+        "message_p50_ms": percentile(message_latencies, 0.5) * 1000,
+        "message_p99_ms": percentile(message_latencies, 0.99) * 1000,
+        "dispatch_p50_ms": percentile(dispatch_latencies, 0.5) * 1000,
+        "dispatch_p99_ms": percentile(dispatch_latencies, 0.99) * 1000,
+        "flushes_per_event": flushes / scenario.events,
+        "blocks_per_event": (blocks_after - blocks_before) / scenario.events,
+        "peak_kib": peak / 1024,
+    }
+
+
+async def run(args: argparse.Namespace) -> list[dict[str, Any]]:
+    if args.replay:
+        scenarios = [replay_scenario(args.replay)]
+    else:
+        available = make_scenarios(args.events)
+        names = args.scenario or list(available)
+        scenarios = [available[name] for name in names]
+
+    results = []
+    async with stand_in_server([web.post("/client_secrets", mint)]) as base_url:
+        secrets_url = base_url + "/client_secrets"
+        for scenario in scenarios:
+            print(f"{scenario.name}: {scenario.description}", file=sys.stderr)
+            result = await run_scenario(scenario, secrets_url, args.rate, False)
+            if not args.no_alloc:
+                traced = await run_scenario(scenario, secrets_url, args.rate, True)
+                result["blocks_per_event"] = traced["blocks_per_event"]
+                result["peak_kib"] = traced["peak_kib"]
+            results.append(result)
+    return results
+
+
+COLUMNS = [
+    ("events_per_s", "events/s", "{:.0f}"),
+    ("message_p50_ms", "msg p50 ms", "{:.3f}"),
+    ("message_p99_ms", "msg p99 ms", "{:.3f}"),
+    ("dispatch_p50_ms", "disp p50 ms", "{:.3f}"),
+    ("dispatch_p99_ms", "disp p99 ms", "{:.3f}"),
+    ("flushes_per_event", "flush/evt", "{:.2f}"),
+    ("blocks_per_event", "blocks/evt", "{:.1f}"),
+    ("peak_kib", "peak KiB", "{:.0f}"),
+]
+
+
+def print_table(results: list[dict[str, Any]], baseline: dict[str, Any]) -> None:
+    width = max(len(r["scenario"]) for r in results)
+    print("scenario".ljust(width), *(label.rjust(12) for _, label, _ in COLUMNS))
+    for result in results:
+        print(
+            result["scenario"].ljust(width),
+            *(fmt.format(result[key]).rjust(12) for key, _, fmt in COLUMNS),
+        )
+        base = baseline.get(result["scenario"])
+        if base:
+            ratios = []
+            for key, _, _ in COLUMNS:
+                if base.get(key):
+                    ratios.append(f"{result[key] / base[key]:.2f}x".rjust(12))
+                else:
+                    ratios.append("-".rjust(12))
+            print("  vs baseline".ljust(width), *ratios)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "--scenario",
+        action="append",
+        choices=sorted(make_scenarios(1)),
+        help="scenario to run (repeatable; default: all)",
+    )
+    parser.add_argument("--events", type=int, default=1000, help="events per scenario")
+    parser.add_argument(
+        "--rate", type=float, default=0, help="messages per second (0: no limit)"
+    )
+    parser.add_argument("--replay", help="JSONL file of recorded events to replay")
+    parser.add_argument("--json", help="write results to this file")
+    parser.add_argument("--compare", help="baseline results (from --json) to compare")
+    parser.add_argument(
+        "--no-alloc", action="store_true", help="skip the traced allocation run"
+    )
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+
+    baseline = {}
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = {r["scenario"]: r for r in json.load(f)}
+    print_table(results, baseline)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -4,4 +4,17 @@ shinyrealtime: A Python package for integrating OpenAI's Real-Time API with Shin
 
 __version__ = "0.1.0"
 
-from ._realtime import realtime_ui, realtime_server, RealtimeControls
\ No newline at end of file
+from ._realtime import realtime_ui, realtime_server, RealtimeControls
+from ._tools import ToolCache, tool_options
+from ._logging import configure_event_logging
+from ._conversation import Conversation, ConversationItem
+from ._metrics import Metrics, process_metrics
+from ._outputs import encode_output, register_output_encoder
+from ._prefetch import prefetched
+from ._usage import (
+    TOKEN_KINDS,
+    SessionUsage,
+    UsageLedger,
+    process_usage,
+    register_prices,
+)
@@ -0,0 +1,130 @@
+"""JSON encoding/decoding for the event path.
+
+Uses orjson or msgspec when one of them is installed (`pip install
+shinyrealtime[fast]`), falling back to the standard library. Also provides
+`LazyEvent`, which reads an event's type without decoding the whole payload.
+"""
+
+import functools
+import json
+import re
+from typing import Any, Callable, Iterator, List, Mapping, Optional, Union
+
+_stdlib_dumps: Callable[..., str] = functools.partial(
+    json.dumps, separators=(",", ":")
+)
+
+try:
+    import orjson
+
+    backend = "orjson"
+    loads: Callable[[Union[str, bytes]], Any] = orjson.loads
+
+    def _fast_dumps_bytes(obj: Any, sort_keys: bool = False) -> bytes:
+        return orjson.dumps(obj, option=orjson.OPT_SORT_KEYS if sort_keys else None)
+
+except ImportError:
+    try:
+        import msgspec
+
+        backend = "msgspec"
+        _decoder = msgspec.json.Decoder()
+        _encoder = msgspec.json.Encoder()
+        _sorted_encoder = msgspec.json.Encoder(order="sorted")
+        loads = _decoder.decode
+
+        def _fast_dumps_bytes(obj: Any, sort_keys: bool = False) -> bytes:
+            return (_sorted_encoder if sort_keys else _encoder).encode(obj)
+
+    except ImportError:
+        backend = "json"
+        loads = json.loads
+
+        def _fast_dumps_bytes(obj: Any, sort_keys: bool = False) -> bytes:
+            return _stdlib_dumps(obj, sort_keys=sort_keys).encode()
+
+
+def dumps_bytes(obj: Any, sort_keys: bool = False) -> bytes:
+    """Encode `obj` as compact JSON bytes, with sorted keys if `sort_keys`."""
+    try:
+        return _fast_dumps_bytes(obj, sort_keys)
+    except TypeError:
+        # The fast codecs are stricter than json (e.g. about non-str keys)
+        return _stdlib_dumps(obj, sort_keys=sort_keys).encode()
+
+
+def dumps(obj: Any, sort_keys: bool = False) -> str:
+    """Encode `obj` as a compact JSON string, with sorted keys if `sort_keys`."""
+    return dumps_bytes(obj, sort_keys).decode()
+
+
+# Matches the top-level "type" of a realtime event when it comes first (or
+# right after "event_id"), which is how the Realtime API serializes events.
+_TYPE_PREFIX = re.compile(
+    r'\s*\{\s*(?:"event_id"\s*:\s*"[^"\\]*"\s*,\s*)?"type"\s*:\s*"([^"\\]*)"'
+)
+
+
+class LazyEvent(Mapping[str, Any]):
+    """
+    A realtime event that is only decoded when its contents are needed.
+
+    `type` is read with a cheap prefix match on the raw JSON where possible,
+    so the dispatcher can decide whether anything wants an event before paying
+    to parse it. Indexing the event (or calling `decode()`) parses it once.
+    """
+
+    __slots__ = ("_raw", "_type", "_data")
+
+    def __init__(self, raw: Optional[str], data: Optional[dict] = None):
+        self._raw = raw
+        self._data = data
+        self._type: Optional[str] = None
+        if data is None:
+            match = _TYPE_PREFIX.match(raw or "")
+            if match:
+                self._type = match.group(1)
+
+    @classmethod
+    def from_payload(cls, payload: str) -> List["LazyEvent"]:
+        """
+        Wrap a payload from the client: either a single JSON event, or a JSON
+        array of (JSON-encoded) events when the client batches them.
+        """
+        if not payload.lstrip().startswith("["):
+            return [cls(payload)]
+        return [
+            cls(item) if isinstance(item, str) else cls(None, item)
+            for item in loads(payload)
+        ]
+
+    @property
+    def raw(self) -> str:
+        """The event as JSON."""
+        if self._raw is None:
+            self._raw = dumps(self._data)
+        return self._raw
+
+    @property
+    def type(self) -> str:
+        if self._type is None:
+            self._type = self.decode()["type"]
+        return self._type
+
+    def decode(self) -> dict:
+        """Return the fully decoded event."""
+        if self._data is None:
+            self._data = loads(self._raw)
+        return self._data
+
+    def __getitem__(self, key: str) -> Any:
+        return self.decode()[key]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.decode())
+
+    def __len__(self) -> int:
+        return len(self.decode())
+
+    def __repr__(self) -> str:
+        return f"LazyEvent(type={self.type!r})"
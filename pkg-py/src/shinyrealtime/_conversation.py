@@ -0,0 +1,272 @@
+"""A server-side view of the conversation, built incrementally from events.
+
+Items are indexed by id as `conversation.item.*` and `response.output_item.*`
+events arrive. Text and transcript deltas are appended to per-part chunk
+lists, which are only joined when something reads them, and replaced by the
+full text when the matching `*.done` event arrives. The oldest items are
+evicted once there are more than `max_items`.
+"""
+
+import collections
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+#: The events the conversation is built from
+CONVERSATION_EVENT_TYPES: Tuple[str, ...] = (
+    "conversation.item.added",
+    "conversation.item.created",
+    "conversation.item.done",
+    "conversation.item.retrieved",
+    "conversation.item.deleted",
+    "conversation.item.input_audio_transcription.delta",
+    "conversation.item.input_audio_transcription.completed",
+    "response.output_item.added",
+    "response.output_item.done",
+    "response.output_text.delta",
+    "response.output_text.done",
+    "response.output_audio_transcript.delta",
+    "response.output_audio_transcript.done",
+    "response.function_call_arguments.done",
+)
+
+
+class ConversationItem:
+    """
+    One item of the conversation: a message, a function call or a function
+    call output.
+
+    Attributes:
+        id: The item id
+        type: "message", "function_call" or "function_call_output"
+        role: "user", "assistant" or "system", for messages
+        status: The item's status as last reported, e.g. "in_progress"
+        name: The function name, for function calls
+        call_id: The call id, for function calls and their outputs
+        arguments: The JSON arguments, for function calls
+        output: The output, for function call outputs
+    """
+
+    __slots__ = (
+        "id",
+        "type",
+        "role",
+        "status",
+        "name",
+        "call_id",
+        "arguments",
+        "output",
+        "_parts",
+    )
+
+    def __init__(self, item_id: str, role: Optional[str] = None):
+        self.id = item_id
+        self.type = "message"
+        self.role = role
+        self.status: Optional[str] = None
+        self.name: Optional[str] = None
+        self.call_id: Optional[str] = None
+        self.arguments: Optional[str] = None
+        self.output: Optional[str] = None
+        # Text or transcript chunks per content index
+        self._parts: Dict[int, List[str]] = {}
+
+    def _update(self, item: Dict[str, Any]) -> None:
+        for field in ("type", "role", "status", "name", "call_id", "arguments"):
+            if item.get(field) is not None:
+                setattr(self, field, item[field])
+        if item.get("output") is not None:
+            self.output = item["output"]
+        for index, content in enumerate(item.get("content") or ()):
+            text = content.get("text") or content.get("transcript")
+            if text or index not in self._parts:
+                self._parts[index] = [text or ""]
+
+    def _append(self, index: int, delta: str) -> None:
+        self._parts.setdefault(index, []).append(delta)
+
+    def _set(self, index: int, text: str) -> None:
+        self._parts[index] = [text]
+
+    @property
+    def text(self) -> str:
+        """The item's text and transcripts so far, joined."""
+        texts = []
+        for index in sorted(self._parts):
+            chunks = self._parts[index]
+            if len(chunks) > 1:
+                chunks[:] = ["".join(chunks)]
+            if chunks and chunks[0]:
+                texts.append(chunks[0])
+        return "\n".join(texts)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """The item as a plain dict, e.g. for serializing."""
+        return {
+            "id": self.id,
+            "type": self.type,
+            "role": self.role,
+            "status": self.status,
+            "name": self.name,
+            "call_id": self.call_id,
+            "arguments": self.arguments,
+            "output": self.output,
+            "text": self.text,
+        }
+
+    def __repr__(self) -> str:
+        return (
+            f"ConversationItem(id={self.id!r}, type={self.type!r}, "
+            f"role={self.role!r})"
+        )
+
+
+class Conversation:
+    """
+    The conversation so far, indexed by item id.
+
+    Args:
+        max_items: The most items kept; the oldest are evicted beyond this
+        depend: Called by every accessor before reading. `realtime_server()`
+            passes a reactive value here, so the accessors are reactive and
+            invalidated (at a throttled rate) when the conversation changes.
+            Read them inside `reactive.isolate()` from `on()` handlers.
+    """
+
+    def __init__(
+        self,
+        max_items: int = 200,
+        depend: Optional[Callable[[], Any]] = None,
+    ):
+        if max_items < 1:
+            raise ValueError("max_items must be at least 1")
+        self.max_items = max_items
+        self._depend = depend
+        self._items: collections.OrderedDict[str, ConversationItem] = (
+            collections.OrderedDict()
+        )
+        self._evicted = 0
+        self._handlers: Dict[str, Callable[[Dict[str, Any]], bool]] = {
+            "conversation.item.added": self._on_item,
+            "conversation.item.created": self._on_item,
+            "conversation.item.done": self._on_item,
+            "conversation.item.retrieved": self._on_item,
+            "response.output_item.added": self._on_item,
+            "response.output_item.done": self._on_item,
+            "conversation.item.deleted": self._on_deleted,
+            "conversation.item.input_audio_transcription.delta": self._on_delta,
+            "response.output_text.delta": self._on_delta,
+            "response.output_audio_transcript.delta": self._on_delta,
+            "conversation.item.input_audio_transcription.completed": (
+                self._on_transcript_done
+            ),
+            "response.output_audio_transcript.done": self._on_transcript_done,
+            "response.output_text.done": self._on_text_done,
+            "response.function_call_arguments.done": self._on_arguments_done,
+        }
+
+    def handle(self, event: Dict[str, Any]) -> bool:
+        """
+        Update the conversation from an event.
+
+        Returns:
+            bool: Whether the event changed the conversation
+        """
+        handler = self._handlers.get(event.get("type", ""))
+        return handler(event) if handler is not None else False
+
+    def _item(self, item_id: str, role: Optional[str] = None) -> ConversationItem:
+        item = self._items.get(item_id)
+        if item is None:
+            item = self._items[item_id] = ConversationItem(item_id, role)
+            while len(self._items) > self.max_items:
+                self._items.popitem(last=False)
+                self._evicted += 1
+        return item
+
+    def _on_item(self, event: Dict[str, Any]) -> bool:
+        item = event.get("item") or {}
+        if not item.get("id"):
+            return False
+        self._item(item["id"])._update(item)
+        return True
+
+    def _on_deleted(self, event: Dict[str, Any]) -> bool:
+        return self._items.pop(event.get("item_id"), None) is not None
+
+    def _on_delta(self, event: Dict[str, Any]) -> bool:
+        if not event.get("item_id") or not event.get("delta"):
+            return False
+        role = "user" if event["type"].startswith("conversation.") else "assistant"
+        item = self._item(event["item_id"], role)
+        item._append(event.get("content_index", 0), event["delta"])
+        return True
+
+    def _on_transcript_done(self, event: Dict[str, Any]) -> bool:
+        return self._set_text(event, event.get("transcript"))
+
+    def _on_text_done(self, event: Dict[str, Any]) -> bool:
+        return self._set_text(event, event.get("text"))
+
+    def _set_text(self, event: Dict[str, Any], text: Optional[str]) -> bool:
+        if not event.get("item_id") or text is None:
+            return False
+        role = "user" if event["type"].startswith("conversation.") else "assistant"
+        self._item(event["item_id"], role)._set(event.get("content_index", 0), text)
+        return True
+
+    def _on_arguments_done(self, event: Dict[str, Any]) -> bool:
+        if not event.get("item_id"):
+            return False
+        item = self._item(event["item_id"], "assistant")
+        item.type = "function_call"
+        item.name = event.get("name", item.name)
+        item.call_id = event.get("call_id", item.call_id)
+        item.arguments = event.get("arguments", item.arguments)
+        return True
+
+    def _read(self) -> None:
+        if self._depend is not None:
+            self._depend()
+
+    def items(self, role: Optional[str] = None) -> List[ConversationItem]:
+        """The items, oldest first, optionally only those with `role`."""
+        self._read()
+        if role is None:
+            return list(self._items.values())
+        return [item for item in self._items.values() if item.role == role]
+
+    def get(self, item_id: str) -> Optional[ConversationItem]:
+        """The item with the given id, if it hasn't been evicted."""
+        self._read()
+        return self._items.get(item_id)
+
+    def transcript(self) -> List[Tuple[str, str]]:
+        """The `(role, text)` of every message with text, oldest first."""
+        self._read()
+        transcript = []
+        for item in self._items.values():
+            if item.type == "message":
+                text = item.text
+                if text:
+                    transcript.append((item.role or "", text))
+        return transcript
+
+    def last_utterance(self, role: str = "user") -> Optional[str]:
+        """The text of the most recent message from `role` that has text."""
+        self._read()
+        for item in reversed(self._items.values()):
+            if item.type == "message" and item.role == role:
+                text = item.text
+                if text:
+                    return text
+        return None
+
+    def clear(self) -> None:
+        """Forget every item."""
+        self._items.clear()
+
+    def stats(self) -> Dict[str, int]:
+        """The number of items held and evicted so far."""
+        return {"items": len(self._items), "evicted": self._evicted}
+
+    def __len__(self) -> int:
+        return len(self._items)
@@ -1,12 +1,82 @@
-import uuid
-from typing import Any, Callable, Dict, List, Optional
+import asyncio
+import collections
+import itertools
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+from ._logging import logger
+
+ErrorHandler = Callable[[Callable, Exception], None]
+
+
+def _log_handler_error(callback: Callable, e: Exception) -> None:
+    name = getattr(callback, "__qualname__", repr(callback))
+    logger.error("Error in event handler %s: %s", name, e, exc_info=e)
+
+
+class _SerialWorker:
+    """
+    Runs one callback over the events pushed to it, one at a time and in
+    order. The task only exists while there are events to process.
+    """
+
+    def __init__(
+        self,
+        owner: "AsyncCallbacks",
+        callback_id: int,
+        callback: Callable,
+    ):
+        self._owner = owner
+        self._callback_id = callback_id
+        self._callback = callback
+        self._pending: Deque[Tuple[tuple, dict]] = collections.deque()
+        self.task: Optional[asyncio.Task] = None
+
+    def push(self, args: tuple, kwargs: dict) -> None:
+        self._pending.append((args, kwargs))
+        if self.task is None or self.task.done():
+            self.task = asyncio.create_task(self._run())
+
+    async def _run(self) -> None:
+        while self._pending:
+            args, kwargs = self._pending.popleft()
+            if self._callback_id not in self._owner._callbacks:
+                # Unsubscribed; drop anything still queued
+                self._pending.clear()
+                return
+            try:
+                await self._callback(*args, **kwargs)
+            except Exception as e:
+                self._owner._report(self._callback, e)
 
 
 class AsyncCallbacks:
-    """A reusable class for managing async callbacks."""
+    """
+    A reusable class for managing async callbacks.
+
+    By default, `invoke()` awaits each callback in turn, and an exception
+    stops the remaining callbacks. With `concurrent=True`, `invoke()` hands
+    the arguments to a serial queue per callback and returns immediately:
+    callbacks run concurrently with each other, but each one still sees its
+    invocations in order. If `on_error` is given (or `concurrent` is set),
+    exceptions are passed to it instead of propagating.
+    """
 
-    def __init__(self):
-        self._callbacks = {}
+    def __init__(
+        self,
+        on_change: Optional[Callable[[], None]] = None,
+        *,
+        concurrent: bool = False,
+        on_error: Optional[ErrorHandler] = None,
+    ):
+        self._callbacks: Dict[int, Callable] = {}
+        # Copy-on-write snapshot of the callbacks, so invoke() doesn't have to
+        # copy the dict on every call
+        self._snapshot: Tuple[Tuple[int, Callable], ...] = ()
+        self._ids = itertools.count()
+        self._on_change = on_change
+        self._concurrent = concurrent
+        self._on_error = on_error
+        self._workers: Dict[int, _SerialWorker] = {}
 
     def register(self, callback: Callable) -> Callable:
         """
@@ -17,22 +87,62 @@ class AsyncCallbacks:
         if not callable(callback):
             raise TypeError("callback must be a function")
 
-        # Generate a unique ID for the callback
-        callback_id = str(uuid.uuid4())
+        callback_id = next(self._ids)
         self._callbacks[callback_id] = callback
+        self._changed()
 
         # Return an unsubscribe function
         def unsubscribe():
             if callback_id in self._callbacks:
                 del self._callbacks[callback_id]
+                self._workers.pop(callback_id, None)
+                self._changed()
 
         return unsubscribe
 
+    def _changed(self):
+        self._snapshot = tuple(self._callbacks.items())
+        if self._on_change is not None:
+            self._on_change()
+
     async def invoke(self, *args, **kwargs):
         """Invoke all registered callbacks with the provided arguments."""
-        for callback_id, callback in list(self._callbacks.items()):
-            if callback_id in self._callbacks:
-                await callback(*args, **kwargs)
+        if self._concurrent:
+            for callback_id, callback in self._snapshot:
+                worker = self._workers.get(callback_id)
+                if worker is None:
+                    worker = self._workers[callback_id] = _SerialWorker(
+                        self, callback_id, callback
+                    )
+                worker.push(args, kwargs)
+            return
+
+        callbacks = self._callbacks
+        for callback_id, callback in self._snapshot:
+            # Skip callbacks unsubscribed by an earlier callback
+            if callback_id in callbacks:
+                if self._on_error is None:
+                    await callback(*args, **kwargs)
+                    continue
+                try:
+                    await callback(*args, **kwargs)
+                except Exception as e:
+                    self._on_error(callback, e)
+
+    async def join(self):
+        """Wait until every queued invocation (in concurrent mode) has run."""
+        while True:
+            tasks = [
+                worker.task
+                for worker in self._workers.values()
+                if worker.task is not None and not worker.task.done()
+            ]
+            if not tasks:
+                return
+            await asyncio.wait(tasks)
+
+    def _report(self, callback: Callable, e: Exception):
+        (self._on_error or _log_handler_error)(callback, e)
 
     def count(self) -> int:
         """Return the number of registered callbacks."""
@@ -40,10 +150,36 @@ class AsyncCallbacks:
 
 
 class EventEmitter:
-    """Event emitter for handling realtime events."""
+    """
+    Event emitter for handling realtime events.
+
+    Parameters:
+    - concurrent: If True, `emit()` doesn't wait for handlers. Every handler
+      gets its own serial queue, so handlers for the same event run
+      concurrently while each one sees events in the order they were
+      emitted. Use `join()` to wait for queued handlers to finish.
+    - on_error: Called with `(callback, exception)` when a handler raises.
+      Defaults to logging the error in concurrent mode and to propagating
+      it otherwise.
+    """
 
-    def __init__(self):
-        self.handlers = {}
+    # Upper bound on cached dispatch entries, in case a client sends many
+    # distinct (bogus) event types
+    _max_dispatch_cache = 1024
+
+    def __init__(
+        self,
+        *,
+        concurrent: bool = False,
+        on_error: Optional[ErrorHandler] = None,
+    ):
+        self.concurrent = concurrent
+        self._on_error = on_error
+        self.handlers: Dict[str, AsyncCallbacks] = {}
+        # Resolved handlers per concrete event type: exact, then matching
+        # "prefix.*" wildcards from shortest to longest, then "*". Cleared
+        # whenever a handler is registered or unsubscribed.
+        self._dispatch: Dict[str, Tuple[AsyncCallbacks, ...]] = {}
 
     def on(self, event_type: str, callback: Callable) -> Callable:
         """
@@ -60,11 +196,26 @@ class EventEmitter:
 
         # Create callbacks container for this event type if it doesn't exist
         if event_type not in self.handlers:
-            self.handlers[event_type] = AsyncCallbacks()
+            self.handlers[event_type] = AsyncCallbacks(
+                on_change=self._dispatch.clear,
+                concurrent=self.concurrent,
+                on_error=self._on_error,
+            )
 
         # Register the callback and return the unsubscribe function
         return self.handlers[event_type].register(callback)
 
+    def event_types(self) -> List[str]:
+        """
+        Return the event types (and wildcard patterns) that currently have at
+        least one handler registered.
+        """
+        return [
+            event_type
+            for event_type, callbacks in self.handlers.items()
+            if callbacks.count() > 0
+        ]
+
     async def emit(self, event_type: str, event: Any):
         """
         Emit an event.
@@ -73,20 +224,39 @@ class EventEmitter:
         - event_type: The type of event to emit
         - event: The event data to pass to handlers
         """
-        # Exact match handlers
-        if event_type in self.handlers:
-            await self.handlers[event_type].invoke(event)
+        for cb in self._handlers_for(event_type):
+            await cb.invoke(event)
 
-        # Check for wildcard handlers (e.g., "conversation.*")
-        event_parts = event_type.split(".")
+    async def join(self):
+        """Wait for all queued handlers to finish (in concurrent mode)."""
+        for callbacks in list(self.handlers.values()):
+            await callbacks.join()
 
-        for i in range(1, len(event_parts) + 1):
-            prefix = ".".join(event_parts[:i])
-            wildcard = f"{prefix}.*"
+    def has_handlers(self, event_type: str) -> bool:
+        """Whether emitting `event_type` would invoke any handler."""
+        return len(self._handlers_for(event_type)) > 0
 
-            if wildcard in self.handlers:
-                await self.handlers[wildcard].invoke(event)
+    def _handlers_for(self, event_type: str) -> Tuple[AsyncCallbacks, ...]:
+        callbacks = self._dispatch.get(event_type)
+        if callbacks is None:
+            if len(self._dispatch) >= self._max_dispatch_cache:
+                self._dispatch.clear()
+            callbacks = self._dispatch[event_type] = self._resolve(event_type)
+        return callbacks
 
+    def _resolve(self, event_type: str) -> Tuple[AsyncCallbacks, ...]:
+        """Find the non-empty handler containers that match an event type."""
+        # Check for wildcard handlers (e.g., "conversation.*")
+        event_parts = event_type.split(".")
+        patterns = [event_type]
+        patterns.extend(
+            ".".join(event_parts[:i]) + ".*" for i in range(1, len(event_parts) + 1)
+        )
         # Global wildcard handler
-        if "*" in self.handlers:
-            await self.handlers["*"].invoke(event)
\ No newline at end of file
+        patterns.append("*")
+
+        return tuple(
+            self.handlers[pattern]
+            for pattern in patterns
+            if pattern in self.handlers and self.handlers[pattern].count() > 0
+        )
@@ -0,0 +1,115 @@
+"""Leveled, sampled logging of realtime events.
+
+Everything is logged to the "shinyrealtime" logger. Each event is logged with
+structured fields (`session`, `event_type`, `size`, `latency`) in the
+record's `extra`; the raw payload is only included when the logger is enabled
+for DEBUG. Which level an event type is logged at, and what fraction of it is
+logged at all, is set with `configure_event_logging()`.
+"""
+
+import logging
+import time
+from typing import Dict, Optional, Tuple
+
+from ._utils import _best_match
+
+logger = logging.getLogger("shinyrealtime")
+
+_levels: Dict[str, int] = {"*": logging.DEBUG}
+_sample_rates: Dict[str, float] = {}
+# event type -> (level, log every Nth event)
+_resolved: Dict[str, Tuple[int, int]] = {}
+_counters: Dict[str, int] = {}
+
+
+def configure_event_logging(
+    *,
+    levels: Optional[Dict[str, int]] = None,
+    sample_rates: Optional[Dict[str, float]] = None,
+) -> None:
+    """
+    Set the level and sampling rate at which realtime events are logged.
+
+    Keys are event types or glob patterns such as `"response.*"` or
+    `"*.delta"`; the most specific matching pattern wins. Settings are
+    process-wide and merged with those from earlier calls. By default every
+    event is logged at DEBUG and none are sampled out.
+
+    Args:
+        levels: Logging level per event type pattern, e.g.
+            `{"error": logging.ERROR, "response.done": logging.INFO}`
+        sample_rates: Fraction of events to log per event type pattern, e.g.
+            `{"*.delta": 0.01}` logs one in every hundred deltas
+    """
+    if levels:
+        _levels.update(levels)
+    if sample_rates:
+        for pattern, rate in sample_rates.items():
+            if not 0 <= rate <= 1:
+                raise ValueError(f"Sample rate must be between 0 and 1, got {rate}")
+        _sample_rates.update(sample_rates)
+    _resolved.clear()
+    _counters.clear()
+
+
+def _resolve(event_type: str) -> Tuple[int, int]:
+    resolved = _resolved.get(event_type)
+    if resolved is None:
+        level_pattern = _best_match(event_type, _levels)
+        level = _levels[level_pattern] if level_pattern else logging.DEBUG
+        rate_pattern = _best_match(event_type, _sample_rates)
+        rate = _sample_rates[rate_pattern] if rate_pattern else 1.0
+        every = 0 if rate == 0 else round(1 / rate)
+        resolved = _resolved[event_type] = (level, every)
+    return resolved
+
+
+def log_event(session_id: str, event_type: str, raw: str, received_at: float) -> None:
+    """
+    Log one dispatched event, subject to its configured level and sampling.
+
+    Args:
+        session_id: The Shiny session id
+        event_type: The event's type
+        raw: The event's raw JSON
+        received_at: `time.perf_counter()` when the event arrived; the
+            logged latency is measured from here
+    """
+    level, every = _resolve(event_type)
+    if every == 0 or not logger.isEnabledFor(level):
+        return
+    if every > 1:
+        n = _counters.get(event_type, 0)
+        _counters[event_type] = n + 1
+        if n % every:
+            return
+
+    latency = time.perf_counter() - received_at
+    fields = {
+        "session": session_id,
+        "event_type": event_type,
+        "size": len(raw),
+        "latency": latency,
+    }
+    if logger.isEnabledFor(logging.DEBUG):
+        fields["payload"] = raw
+        logger.log(
+            level,
+            "%s event (%d bytes, %.2f ms) session=%s: %s",
+            event_type,
+            len(raw),
+            latency * 1000,
+            session_id,
+            raw,
+            extra=fields,
+        )
+    else:
+        logger.log(
+            level,
+            "%s event (%d bytes, %.2f ms) session=%s",
+            event_type,
+            len(raw),
+            latency * 1000,
+            session_id,
+            extra=fields,
+        )
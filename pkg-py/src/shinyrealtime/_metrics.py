@@ -0,0 +1,240 @@
+"""Counters and latency histograms for the realtime event path.
+
+Metrics are only collected for sessions started with
+`realtime_server(metrics=True)`; otherwise no `Metrics` object exists and the
+hot path pays a single `is not None` check. Each session's metrics also feed
+the process-wide totals returned by `process_metrics()`.
+"""
+
+import bisect
+import math
+from typing import Any, Dict, List, Optional, Tuple
+
+# Upper bounds (in seconds) of the latency histogram buckets
+LATENCY_BUCKETS: Tuple[float, ...] = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    math.inf,
+)
+
+
+class Histogram:
+    """A fixed-bucket histogram, Prometheus style."""
+
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float) -> float:
+        """Estimate a quantile as the upper bound of the bucket it falls in."""
+        if self.count == 0:
+            return math.nan
+        rank = q * self.count
+        seen = 0
+        for bound, n in zip(self.buckets, self.counts):
+            seen += n
+            if seen >= rank:
+                return bound
+        return math.inf
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "p50": self.quantile(0.5),
+            "p99": self.quantile(0.99),
+        }
+
+
+class ToolStats:
+    """Call count, errors, latency and output size for one tool."""
+
+    __slots__ = ("calls", "errors", "output_bytes", "latency")
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.output_bytes = 0
+        self.latency = Histogram()
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "output_bytes": self.output_bytes,
+            "latency": self.latency.snapshot(),
+        }
+
+
+class Metrics:
+    """
+    Metrics for one realtime session, or for the whole process.
+
+    Attributes:
+        events: `[count, bytes]` per event type received, where bytes is the
+            length of the raw JSON
+        dispatch_latency: Seconds from an event arriving to its handlers
+            (and tool-call bookkeeping) finishing
+        tools: Per-tool statistics
+        time_to_session_created: Seconds from the client secret being
+            requested to the first `session.created` event
+    """
+
+    def __init__(self, parent: Optional["Metrics"] = None):
+        self.events: Dict[str, List[int]] = {}
+        self.dispatch_latency = Histogram()
+        self.tools: Dict[str, ToolStats] = {}
+        self.time_to_session_created = Histogram()
+        self._parent = parent
+
+    def record_event(self, event_type: str, size: int) -> None:
+        counts = self.events.get(event_type)
+        if counts is None:
+            counts = self.events[event_type] = [0, 0]
+        counts[0] += 1
+        counts[1] += size
+        if self._parent is not None:
+            self._parent.record_event(event_type, size)
+
+    def record_dispatch(self, seconds: float) -> None:
+        self.dispatch_latency.observe(seconds)
+        if self._parent is not None:
+            self._parent.record_dispatch(seconds)
+
+    def record_tool(
+        self, name: str, seconds: float, error: bool, output_bytes: int
+    ) -> None:
+        stats = self.tools.get(name)
+        if stats is None:
+            stats = self.tools[name] = ToolStats()
+        stats.calls += 1
+        stats.errors += error
+        stats.output_bytes += output_bytes
+        stats.latency.observe(seconds)
+        if self._parent is not None:
+            self._parent.record_tool(name, seconds, error, output_bytes)
+
+    def record_session_created(self, seconds: float) -> None:
+        self.time_to_session_created.observe(seconds)
+        if self._parent is not None:
+            self._parent.record_session_created(seconds)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Return all metrics as plain Python data."""
+        return {
+            "events": {
+                event_type: {"count": count, "bytes": size}
+                for event_type, (count, size) in self.events.items()
+            },
+            "dispatch_latency": self.dispatch_latency.snapshot(),
+            "tools": {name: stats.snapshot() for name, stats in self.tools.items()},
+            "time_to_session_created": self.time_to_session_created.snapshot(),
+        }
+
+    def to_prometheus(self, prefix: str = "shinyrealtime") -> str:
+        """Render all metrics in the Prometheus text exposition format."""
+        lines: List[str] = []
+
+        def header(name: str, kind: str, help: str) -> None:
+            lines.append(f"# HELP {prefix}_{name} {help}")
+            lines.append(f"# TYPE {prefix}_{name} {kind}")
+
+        def histogram(name: str, hist: Histogram, labels: str = "") -> None:
+            cumulative = 0
+            for bound, n in zip(hist.buckets, hist.counts):
+                cumulative += n
+                le = "+Inf" if bound == math.inf else repr(bound)
+                sep = "," if labels else ""
+                lines.append(
+                    f'{prefix}_{name}_bucket{{{labels}{sep}le="{le}"}} {cumulative}'
+                )
+            braces = f"{{{labels}}}" if labels else ""
+            lines.append(f"{prefix}_{name}_sum{braces} {hist.sum}")
+            lines.append(f"{prefix}_{name}_count{braces} {hist.count}")
+
+        header("events_total", "counter", "Realtime events received, by type.")
+        for event_type, (count, _) in sorted(self.events.items()):
+            lines.append(
+                f'{prefix}_events_total{{type="{_escape(event_type)}"}} {count}'
+            )
+
+        header("event_bytes_total", "counter", "Bytes of realtime events, by type.")
+        for event_type, (_, size) in sorted(self.events.items()):
+            lines.append(
+                f'{prefix}_event_bytes_total{{type="{_escape(event_type)}"}} {size}'
+            )
+
+        header("dispatch_seconds", "histogram", "Time to dispatch an inbound event.")
+        histogram("dispatch_seconds", self.dispatch_latency)
+
+        header("tool_calls_total", "counter", "Tool calls, by tool.")
+        for name, stats in sorted(self.tools.items()):
+            lines.append(
+                f'{prefix}_tool_calls_total{{tool="{_escape(name)}"}} {stats.calls}'
+            )
+
+        header("tool_errors_total", "counter", "Tool calls that failed, by tool.")
+        for name, stats in sorted(self.tools.items()):
+            lines.append(
+                f'{prefix}_tool_errors_total{{tool="{_escape(name)}"}} {stats.errors}'
+            )
+
+        header(
+            "tool_output_bytes_total",
+            "counter",
+            "Bytes of serialized tool output, by tool.",
+        )
+        for name, stats in sorted(self.tools.items()):
+            lines.append(
+                f'{prefix}_tool_output_bytes_total{{tool="{_escape(name)}"}} '
+                f"{stats.output_bytes}"
+            )
+
+        header("tool_seconds", "histogram", "Tool call latency, by tool.")
+        for name, stats in sorted(self.tools.items()):
+            histogram("tool_seconds", stats.latency, f'tool="{_escape(name)}"')
+
+        header(
+            "time_to_session_created_seconds",
+            "histogram",
+            "Time from requesting a client secret to the first session.created.",
+        )
+        histogram("time_to_session_created_seconds", self.time_to_session_created)
+
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+_process_metrics = Metrics()
+
+
+def process_metrics() -> Metrics:
+    """
+    Return the process-wide metrics, aggregated over every session started
+    with `realtime_server(metrics=True)`.
+    """
+    return _process_metrics
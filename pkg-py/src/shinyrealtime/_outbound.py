@@ -0,0 +1,83 @@
+"""Serializing and batching events sent to the model.
+
+Outgoing events are serialized to JSON as soon as they are sent, with the
+fast codec, and common shapes (`response.create`, text messages, function
+call outputs) are built from cached templates rather than dicts. Sends made
+in the same event loop tick are then delivered together, e.g. as a single
+Shiny custom message.
+"""
+
+import asyncio
+from typing import Any, Awaitable, Callable, List, Optional
+
+from . import _codec as codec
+
+#: A `response.create` event with the session's defaults
+RESPONSE_CREATE = codec.dumps({"type": "response.create", "response": {}})
+
+_ITEM_CREATE = '{"type":"conversation.item.create","item":'
+_FUNCTION_CALL_OUTPUT = _ITEM_CREATE + '{"type":"function_call_output","call_id":'
+_MESSAGE = _ITEM_CREATE + '{"type":"message","role":'
+_TEXT_CONTENT = ',"content":[{"type":"input_text","text":'
+
+
+def event_to_json(event: Any) -> str:
+    """
+    Serialize an outgoing event: a dict, an openai pydantic model, or a
+    string, which is assumed to be serialized already.
+    """
+    if isinstance(event, str):
+        return event
+    if hasattr(event, "model_dump"):
+        event = event.model_dump(exclude_none=True)
+    return codec.dumps(event)
+
+
+def function_call_output(call_id: str, output: str) -> str:
+    """A `conversation.item.create` event for a function call's output."""
+    return (
+        f"{_FUNCTION_CALL_OUTPUT}{codec.dumps(call_id)},"
+        f'"output":{codec.dumps(output)}}}}}'
+    )
+
+
+def text_message(text: str, role: str = "user") -> str:
+    """A `conversation.item.create` event for a text message."""
+    return f"{_MESSAGE}{codec.dumps(role)}{_TEXT_CONTENT}{codec.dumps(text)}}}]}}}}"
+
+
+class OutboundQueue:
+    """
+    Coalesces the events sent within one event loop tick into one delivery.
+
+    The first `send()` in a tick schedules a delivery for the next one; every
+    send until then joins it, and waits for it.
+
+    Args:
+        deliver: Called with the serialized events of each batch, in order
+    """
+
+    def __init__(self, deliver: Callable[[List[str]], Awaitable[None]]):
+        self._deliver = deliver
+        self._buffer: List[str] = []
+        self._task: Optional[asyncio.Task] = None
+        self.batches = 0
+        self.events = 0
+
+    async def send(self, *events: Any) -> None:
+        """Serialize `events` and deliver them with this tick's batch."""
+        self._buffer.extend(event_to_json(event) for event in events)
+        if self._task is None:
+            self._task = asyncio.create_task(self._flush())
+        # A sender that is cancelled (e.g. an interrupted tool) mustn't cancel
+        # the delivery for everyone else
+        await asyncio.shield(self._task)
+
+    async def _flush(self) -> None:
+        # Tasks only start on the next tick, so everything sent in this one
+        # is in the buffer by now
+        payloads, self._buffer = self._buffer, []
+        self._task = None
+        self.batches += 1
+        self.events += len(payloads)
+        await self._deliver(payloads)
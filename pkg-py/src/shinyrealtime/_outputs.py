@@ -0,0 +1,266 @@
+"""Encoding tool results as compact, size-bounded text for the model.
+
+Tool results pass through a registry of output encoders before falling back
+to `_coerce_output`. Built-in encoders cover pandas and polars DataFrames
+(CSV), NumPy arrays and scalars, dataclasses and pydantic models; apps can
+register their own with `register_output_encoder()`.
+
+Every encoded output is held to a byte budget. Tables and lists of records
+that don't fit keep their first and last rows, and everything else is cut
+off, with a marker in square brackets telling the model what was left out.
+"""
+
+import dataclasses
+import sys
+from typing import Any, Callable, List, Optional, Sequence, Tuple, Union
+
+from . import _codec as codec
+from ._utils import _coerce_output
+
+#: Takes a tool result and the byte budget (None for unlimited). Returns the
+#: encoded text, or any other value to be encoded in turn, e.g. a dict.
+OutputEncoder = Callable[[Any, Optional[int]], Any]
+
+#: A type, a "module.Name" string (matched without importing the module), or
+#: a predicate
+EncoderMatch = Union[type, str, Callable[[Any], bool]]
+
+_encoders: List[Tuple[EncoderMatch, OutputEncoder]] = []
+
+# Records sampled to estimate the encoded size of a long list
+_SAMPLE_ROWS = 20
+
+
+def register_output_encoder(
+    match: EncoderMatch, encoder: Optional[OutputEncoder] = None
+) -> Any:
+    """
+    Register how tool results of a given type are encoded for the model.
+
+    Can be called directly or used as a decorator
+    (`@register_output_encoder(MyType)`). Encoders registered later take
+    precedence, so apps can override the built-in ones.
+
+    Args:
+        match: A type to match with `isinstance()`; a `"module.Name"` string,
+            which matches instances of that class only if its module has
+            already been imported (so optional dependencies are never
+            imported just to check); or a predicate function
+        encoder: Called with the result and the byte budget (None if
+            unlimited). Return a string to send it as is (it's still cut off
+            if it exceeds the budget), or any other value, such as a dict, to
+            encode that instead.
+
+    Returns:
+        The encoder, when used as a decorator.
+    """
+
+    def decorator(encoder: OutputEncoder) -> OutputEncoder:
+        _encoders.append((match, encoder))
+        return encoder
+
+    if encoder is not None:
+        return decorator(encoder)
+    return decorator
+
+
+def _matches(match: EncoderMatch, value: Any) -> bool:
+    if isinstance(match, type):
+        return isinstance(value, match)
+    if isinstance(match, str):
+        module_name, _, name = match.rpartition(".")
+        module = sys.modules.get(module_name)
+        cls = getattr(module, name, None) if module is not None else None
+        return isinstance(cls, type) and isinstance(value, cls)
+    return bool(match(value))
+
+
+def encode_output(
+    value: Any, max_bytes: Optional[int] = None, fallback: str = "OK"
+) -> str:
+    """
+    Encode a tool result as text for the model, within `max_bytes`.
+
+    Args:
+        value: The tool result
+        max_bytes: The budget for the encoded output, in UTF-8 bytes (roughly
+            four per token); None for no limit
+        fallback: Returned for empty results or results that can't be encoded
+
+    Returns:
+        str: The encoded output
+    """
+    # Let encoders unwrap values (e.g. a pydantic model into a dict) a few
+    # times before falling back to JSON
+    for _ in range(4):
+        if value is None or isinstance(value, (str, int, float, bool)):
+            break
+        for match, encoder in reversed(_encoders):
+            if _matches(match, value):
+                value = encoder(value, max_bytes)
+                break
+        else:
+            break
+
+    if (
+        max_bytes is not None
+        and isinstance(value, (list, tuple))
+        and len(value) > 1
+    ):
+        truncated = _fit_records(value, max_bytes)
+        if truncated is not None:
+            return truncated
+
+    return truncate_text(_coerce_output(value, fallback), max_bytes)
+
+
+def truncate_text(text: str, max_bytes: Optional[int]) -> str:
+    """Cut `text` off to fit in `max_bytes`, with a marker if it was cut."""
+    if max_bytes is None or len(text) * 4 <= max_bytes:
+        return text
+    size = len(text.encode("utf-8"))
+    if size <= max_bytes:
+        return text
+    marker = f"\n[truncated: output was {size} bytes; showing the first {{}}]"
+    keep = max(max_bytes - len(marker) - 8, 0)
+    head = text.encode("utf-8")[:keep].decode("utf-8", errors="ignore")
+    return head + marker.format(len(head.encode("utf-8")))
+
+
+def fit_rows(
+    n_rows: int,
+    render: Callable[[int, int], str],
+    max_bytes: Optional[int],
+) -> str:
+    """
+    Render as many leading and trailing rows of a table as fit in
+    `max_bytes`, followed by a marker saying how many were shown.
+
+    Args:
+        n_rows: The number of rows in the table
+        render: Called with `(head, tail)` row counts; returns the text for
+            the first `head` and last `tail` rows
+        max_bytes: The budget, in bytes; None for no limit
+
+    Returns:
+        str: The rendered rows, plus a marker if rows were left out
+    """
+    if max_bytes is None:
+        return render(n_rows, 0)
+    # Only render the whole table if a sample suggests it might fit
+    sample = min(n_rows, _SAMPLE_ROWS)
+    row_size = len(render(sample, 0)) / sample if sample else 1
+    if row_size * n_rows <= 2 * max_bytes:
+        full = render(n_rows, 0)
+        if len(full.encode("utf-8")) <= max_bytes:
+            return full
+
+    def attempt(k: int) -> str:
+        head = (k + 1) // 2
+        tail = k - head
+        marker = (
+            f"\n[truncated: showing the first {head} and last {tail} "
+            f"of {n_rows} rows]"
+        )
+        return render(head, tail) + marker
+
+    # Binary search for the most rows that fit, starting from what the sample
+    # suggests, so huge tables are never rendered whole
+    lo, hi = 0, min(n_rows - 1, int(2 * max_bytes / max(row_size, 1)) + 1)
+    best = attempt(0)
+    while lo <= hi:
+        mid = (lo + hi) // 2
+        text = attempt(mid)
+        if len(text.encode("utf-8")) <= max_bytes:
+            best, lo = text, mid + 1
+        else:
+            hi = mid - 1
+    return truncate_text(best, max_bytes)
+
+
+def _fit_records(rows: Sequence[Any], max_bytes: int) -> Optional[str]:
+    """
+    Encode a long list that doesn't fit in the budget as its first and last
+    rows. Lists of dicts with the same keys are then encoded column by
+    column, which repeats each key once instead of once per row.
+
+    Returns None, to encode the list as is, if it fits.
+    """
+    sample = rows[:_SAMPLE_ROWS]
+    try:
+        # Only serialize the whole list if the sample suggests it might fit
+        estimate = len(codec.dumps_bytes(sample)) * len(rows) / len(sample)
+        if estimate <= 2 * max_bytes and len(codec.dumps_bytes(rows)) <= max_bytes:
+            return None
+    except (TypeError, ValueError):
+        return None
+
+    keys = list(rows[0]) if isinstance(rows[0], dict) else None
+
+    def render(head: int, tail: int) -> str:
+        subset = list(rows[:head]) + (list(rows[-tail:]) if tail else [])
+        # Columns only when rows are left out, i.e. with fit_rows()' marker
+        if head + tail < len(rows) and keys is not None and all(
+            isinstance(row, dict) and list(row) == keys for row in subset
+        ):
+            return codec.dumps({key: [row[key] for row in subset] for key in keys})
+        return codec.dumps(subset)
+
+    try:
+        return fit_rows(len(rows), render, max_bytes)
+    except (TypeError, ValueError):
+        return None
+
+
+def _encode_frame(frame: Any, max_bytes: Optional[int]) -> str:
+    """pandas and polars DataFrames, as CSV."""
+    if hasattr(frame, "write_csv"):
+
+        def to_csv(part: Any, header: bool) -> str:
+            return part.write_csv(include_header=header)
+
+    else:
+
+        def to_csv(part: Any, header: bool) -> str:
+            return part.to_csv(index=False, header=header)
+
+    def render(head: int, tail: int) -> str:
+        text = to_csv(frame.head(head), True)
+        if tail:
+            text += to_csv(frame.tail(tail), False)
+        return text.rstrip("\n")
+
+    return fit_rows(len(frame), render, max_bytes)
+
+
+def _encode_ndarray(array: Any, max_bytes: Optional[int]) -> str:
+    """NumPy arrays, as (nested) JSON lists, keeping leading/trailing rows."""
+    if array.ndim == 0:
+        return _coerce_output(array.item())
+
+    def render(head: int, tail: int) -> str:
+        rows = array[:head].tolist()
+        if tail:
+            rows += array[len(array) - tail :].tolist()
+        return codec.dumps(rows)
+
+    return fit_rows(len(array), render, max_bytes)
+
+
+def _encode_dataclass(value: Any, max_bytes: Optional[int]) -> Any:
+    return dataclasses.asdict(value)
+
+
+def _encode_pydantic(model: Any, max_bytes: Optional[int]) -> Any:
+    return model.model_dump(mode="json")
+
+
+register_output_encoder(
+    lambda value: dataclasses.is_dataclass(value) and not isinstance(value, type),
+    _encode_dataclass,
+)
+register_output_encoder("pydantic.BaseModel", _encode_pydantic)
+register_output_encoder("numpy.ndarray", _encode_ndarray)
+register_output_encoder("numpy.generic", lambda value, max_bytes: value.item())
+register_output_encoder("pandas.DataFrame", _encode_frame)
+register_output_encoder("polars.DataFrame", _encode_frame)
@@ -0,0 +1,259 @@
+"""Speculative warm-up of tool calls while their arguments are streaming in.
+
+A tool opts in with `tool_options(prefetch=hook, prefetch_keys=(...))`. When
+the model starts a call to it, its arguments are parsed incrementally from
+`response.function_call_arguments.delta` events, and `hook` is started as soon
+as all the key arguments are complete. When the call itself runs, the hook's
+result is available to the tool through `prefetched()` if the final key
+arguments match; otherwise it is cancelled and discarded.
+"""
+
+import asyncio
+import contextvars
+import inspect
+import json
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from ._logging import logger
+from ._tools import ExecutorPolicy, get_tool_options, invoke_tool
+
+_MISSING = object()
+_prefetched: contextvars.ContextVar[Any] = contextvars.ContextVar(
+    "shinyrealtime_prefetched", default=_MISSING
+)
+
+_json_decoder = json.JSONDecoder()
+
+
+def prefetched(default: Any = None) -> Any:
+    """
+    Return the result of this tool call's prefetch hook.
+
+    Call this from a tool with a `tool_options(prefetch=...)` hook. If the
+    hook was started while the model was still streaming the call's
+    arguments, and the final key arguments match the ones it was started
+    with, this returns its result (waiting for it has already happened).
+    Otherwise, or outside of a tool call, it returns `default`, and the tool
+    should do the work itself.
+    """
+    value = _prefetched.get()
+    return default if value is _MISSING else value
+
+
+def prefetch_keys(func: Callable[..., Any]) -> Tuple[str, ...]:
+    """The argument names a tool's prefetch hook needs before it can start."""
+    options = get_tool_options(func)
+    if options.prefetch_keys is not None:
+        return tuple(options.prefetch_keys)
+    if options.prefetch is None:
+        return ()
+    return tuple(inspect.signature(options.prefetch).parameters)
+
+
+class PartialJSONObject:
+    """
+    Incrementally parses a JSON object that arrives in chunks, reporting each
+    top-level member as soon as its value is complete.
+
+    Only the unparsed tail of the text is re-scanned when a chunk arrives.
+    Numbers and literals are only reported once a following `,` or `}` shows
+    they can't be extended by the next chunk.
+    """
+
+    def __init__(self):
+        self._text = ""
+        self._pos = 0
+        self._started = False
+        self.values: Dict[str, Any] = {}
+
+    def feed(self, chunk: str) -> Dict[str, Any]:
+        """Add a chunk; return the members completed by it."""
+        self._text += chunk
+        completed: Dict[str, Any] = {}
+        while True:
+            member = self._next_member()
+            if member is None:
+                return completed
+            key, value = member
+            self.values[key] = completed[key] = value
+
+    def _skip_ws(self, pos: int) -> int:
+        text = self._text
+        while pos < len(text) and text[pos] in " \t\r\n":
+            pos += 1
+        return pos
+
+    def _next_member(self) -> Optional[Tuple[str, Any]]:
+        text = self._text
+        pos = self._skip_ws(self._pos)
+        if not self._started:
+            if pos >= len(text) or text[pos] != "{":
+                return None
+            self._started = True
+            self._pos = pos = self._skip_ws(pos + 1)
+        if pos < len(text) and text[pos] == ",":
+            pos = self._skip_ws(pos + 1)
+        if pos >= len(text) or text[pos] != '"':
+            return None
+
+        try:
+            key, pos = _json_decoder.raw_decode(text, pos)
+        except ValueError:
+            return None
+        pos = self._skip_ws(pos)
+        if pos >= len(text) or text[pos] != ":":
+            return None
+        pos = self._skip_ws(pos + 1)
+        if pos >= len(text):
+            return None
+
+        try:
+            value, end = _json_decoder.raw_decode(text, pos)
+        except ValueError:
+            return None
+        if text[pos] not in '"[{':
+            # A number or literal is only complete once something follows it
+            after = self._skip_ws(end)
+            if after >= len(text) or text[after] not in ",}":
+                return None
+        self._pos = end
+        return key, value
+
+
+class _Speculation:
+    __slots__ = ("tool", "keys", "parser", "key_args", "task", "response_id")
+
+    def __init__(self, tool: Callable[..., Any], response_id: Optional[str]):
+        self.tool = tool
+        self.keys = prefetch_keys(tool)
+        self.parser = PartialJSONObject()
+        self.key_args: Optional[Dict[str, Any]] = None
+        self.task: Optional[asyncio.Task] = None
+        self.response_id = response_id
+
+
+class Prefetcher:
+    """
+    Tracks in-progress function calls to tools with a prefetch hook, and
+    starts each hook as soon as the call's key arguments have streamed in.
+
+    Args:
+        tools_by_name: The session's tools
+        executor: Where synchronous hooks run (see `invoke_tool()`)
+    """
+
+    def __init__(
+        self,
+        tools_by_name: Dict[str, Callable[..., Any]],
+        executor: ExecutorPolicy = "inline",
+    ):
+        self._tools = {
+            name: tool
+            for name, tool in tools_by_name.items()
+            if get_tool_options(tool).prefetch is not None
+        }
+        self._executor = executor
+        # Calls whose arguments are still streaming, by item id
+        self._calls: Dict[str, _Speculation] = {}
+        # Calls whose arguments are done, waiting to run, by call id
+        self._claimed: Dict[str, _Speculation] = {}
+
+    @property
+    def enabled(self) -> bool:
+        """Whether any tool has a prefetch hook."""
+        return bool(self._tools)
+
+    def item_added(self, event: Dict[str, Any]) -> None:
+        """Handle a response.output_item.added event."""
+        item = event.get("item") or {}
+        if item.get("type") != "function_call":
+            return
+        tool = self._tools.get(item.get("name"))
+        if tool is not None and item.get("id"):
+            self._calls[item["id"]] = _Speculation(tool, event.get("response_id"))
+
+    def delta(self, event: Dict[str, Any]) -> None:
+        """Handle a response.function_call_arguments.delta event."""
+        call = self._calls.get(event.get("item_id"))
+        if call is None or call.task is not None:
+            return
+        call.parser.feed(event.get("delta", ""))
+        values = call.parser.values
+        if all(key in values for key in call.keys):
+            call.key_args = {key: values[key] for key in call.keys}
+            hook = get_tool_options(call.tool).prefetch
+            call.task = asyncio.create_task(
+                invoke_tool(hook, call.key_args, self._executor)
+            )
+            call.task.add_done_callback(_retrieve_exception)
+
+    def claim(self, event: Dict[str, Any]) -> None:
+        """
+        Handle a response.function_call_arguments.done event: set the call's
+        prefetch aside until the call runs.
+        """
+        call = self._calls.pop(event.get("item_id"), None)
+        if call is not None and event.get("call_id"):
+            self._claimed[event["call_id"]] = call
+
+    async def take(
+        self, event: Dict[str, Any], args: Dict[str, Any]
+    ) -> Optional[contextvars.Token]:
+        """
+        Claim the prefetch for a function call that is about to run. If its
+        key arguments match the final `args`, wait for the hook and make its
+        result available to `prefetched()`; return the token to reset it
+        with. Otherwise discard the prefetch and return None.
+        """
+        call = self._claimed.pop(event.get("call_id"), None)
+        if call is None or call.task is None:
+            return None
+        name = event.get("name")
+        if call.key_args != {key: args.get(key) for key in call.keys}:
+            call.task.cancel()
+            logger.debug("Discarded prefetch for %s: arguments changed", name)
+            return None
+        try:
+            value = await call.task
+        except Exception as e:
+            logger.warning("Prefetch for %s failed: %s", name, e, exc_info=e)
+            return None
+        logger.debug("Reusing prefetch for %s", name)
+        return _prefetched.set(value)
+
+    def drop(self, event: Dict[str, Any]) -> None:
+        """Discard the prefetch for a call that won't run the tool."""
+        call = self._claimed.pop(event.get("call_id"), None)
+        if call is not None and call.task is not None:
+            call.task.cancel()
+
+    def reset(self, token: Optional[contextvars.Token]) -> None:
+        """Undo `take()` once the tool has run."""
+        if token is not None:
+            _prefetched.reset(token)
+
+    def discard(self, response_id: Optional[str]) -> None:
+        """
+        Drop (and cancel) the prefetches of a finished response whose
+        arguments never completed.
+        """
+        for item_id, call in list(self._calls.items()):
+            if call.response_id == response_id:
+                del self._calls[item_id]
+                if call.task is not None:
+                    call.task.cancel()
+
+    def cancel_all(self) -> None:
+        """Cancel every prefetch that is still running."""
+        for call in [*self._calls.values(), *self._claimed.values()]:
+            if call.task is not None:
+                call.task.cancel()
+        self._calls.clear()
+        self._claimed.clear()
+
+
+def _retrieve_exception(task: asyncio.Task) -> None:
+    # Failed prefetches that are never claimed shouldn't be reported as
+    # "exception was never retrieved"
+    if not task.cancelled():
+        task.exception()
@@ -0,0 +1,162 @@
+"""A bounded per-session queue between incoming events and `on()` handlers.
+
+When handlers fall behind, events wait here instead of piling up in Shiny's
+input machinery. What happens to a waiting event is decided by the policy of
+the most specific pattern matching its type:
+
+- "keep": never dropped or merged, even if that means exceeding the bound
+- "coalesce": merged into the previous queued event if that is a delta for
+  the same item, by concatenating their `delta` strings; otherwise treated
+  like "drop_oldest"
+- "drop_oldest": when the queue is full, the oldest droppable event is
+  discarded to make room
+"""
+
+import asyncio
+import collections
+from typing import Any, Deque, Dict, List, Literal, Optional, Tuple
+
+from ._utils import _best_match
+
+QueuePolicy = Literal["keep", "coalesce", "drop_oldest"]
+
+DEFAULT_QUEUE_POLICIES: Dict[str, QueuePolicy] = {
+    "*": "drop_oldest",
+    "*.delta": "coalesce",
+    "response.function_call_arguments.done": "keep",
+    "response.done": "keep",
+    "error": "keep",
+}
+
+
+class _Entry:
+    __slots__ = ("event_type", "event", "received_at", "policy", "chunks")
+
+    def __init__(
+        self,
+        event_type: str,
+        event: Dict[str, Any],
+        received_at: float,
+        policy: QueuePolicy,
+    ):
+        self.event_type = event_type
+        self.event = event
+        self.received_at = received_at
+        self.policy = policy
+        # Deltas merged into this entry, joined when it's dequeued
+        self.chunks: Optional[List[str]] = None
+
+    def merge(self, event: Dict[str, Any]) -> None:
+        if self.chunks is None:
+            self.chunks = [self.event["delta"]]
+        self.chunks.append(event["delta"])
+        self.event = event
+
+    def finish(self) -> Dict[str, Any]:
+        if self.chunks is not None:
+            self.event = {**self.event, "delta": "".join(self.chunks)}
+            self.chunks = None
+        return self.event
+
+
+def _item_key(event_type: str, event: Dict[str, Any]) -> Tuple[Any, ...]:
+    return (
+        event_type,
+        event.get("response_id"),
+        event.get("item_id"),
+        event.get("output_index"),
+        event.get("content_index"),
+    )
+
+
+class EventQueue:
+    """
+    A bounded FIFO of decoded events, with per-pattern drop policies.
+
+    Args:
+        max_size: The number of waiting events above which droppable events
+            are discarded
+        policies: Policy per event type pattern, merged over
+            `DEFAULT_QUEUE_POLICIES`
+    """
+
+    def __init__(
+        self,
+        max_size: int = 256,
+        policies: Optional[Dict[str, QueuePolicy]] = None,
+    ):
+        if max_size < 1:
+            raise ValueError("max_size must be at least 1")
+        self.max_size = max_size
+        self.policies: Dict[str, QueuePolicy] = {**DEFAULT_QUEUE_POLICIES}
+        if policies:
+            for pattern, policy in policies.items():
+                if policy not in ("keep", "coalesce", "drop_oldest"):
+                    raise ValueError(f"Unknown queue policy: {policy!r}")
+            self.policies.update(policies)
+        self._resolved: Dict[str, QueuePolicy] = {}
+        self._entries: Deque[_Entry] = collections.deque()
+        self._not_empty = asyncio.Event()
+        self._max_depth = 0
+        self._coalesced = 0
+        self._dropped: Dict[str, int] = {}
+
+    def policy(self, event_type: str) -> QueuePolicy:
+        """The policy that applies to an event type."""
+        policy = self._resolved.get(event_type)
+        if policy is None:
+            pattern = _best_match(event_type, self.policies)
+            policy = self.policies[pattern] if pattern else "drop_oldest"
+            self._resolved[event_type] = policy
+        return policy
+
+    def put(self, event_type: str, event: Dict[str, Any], received_at: float) -> None:
+        """Add an event, coalescing or dropping events according to policy."""
+        policy = self.policy(event_type)
+        entries = self._entries
+
+        if policy == "coalesce" and entries and isinstance(event.get("delta"), str):
+            last = entries[-1]
+            if last.policy == "coalesce" and _item_key(
+                last.event_type, last.event
+            ) == _item_key(event_type, event):
+                last.merge(event)
+                self._coalesced += 1
+                return
+
+        entries.append(_Entry(event_type, event, received_at, policy))
+        if len(entries) > self.max_size:
+            self._drop_oldest()
+        self._max_depth = max(self._max_depth, len(entries))
+        self._not_empty.set()
+
+    def _drop_oldest(self) -> None:
+        for i, entry in enumerate(self._entries):
+            if entry.policy != "keep":
+                del self._entries[i]
+                self._dropped[entry.event_type] = (
+                    self._dropped.get(entry.event_type, 0) + 1
+                )
+                return
+
+    async def get(self) -> Tuple[str, Dict[str, Any], float]:
+        """Wait for and remove the oldest event: `(type, event, received_at)`."""
+        while not self._entries:
+            self._not_empty.clear()
+            await self._not_empty.wait()
+        entry = self._entries.popleft()
+        return entry.event_type, entry.finish(), entry.received_at
+
+    def depth(self) -> int:
+        """The number of events waiting."""
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, Any]:
+        """Current and peak depth, and coalesced and dropped event counts."""
+        return {
+            "depth": len(self._entries),
+            "max_depth": self._max_depth,
+            "coalesced": self._coalesced,
+            "dropped": sum(self._dropped.values()),
+            "dropped_by_type": dict(self._dropped),
+        }
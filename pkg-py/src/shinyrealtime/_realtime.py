@@ -1,20 +1,66 @@
 import asyncio
+import functools
 import json
 import os
+import time
+import weakref
 from dataclasses import dataclass
-from typing import Any, Callable, Dict, List, Literal, Tuple, Union
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Literal, Tuple, Union
 
-import aiohttp
-import chatlas
-import openai.types.beta.realtime as oair
-from faicons import icon_svg
 from htmltools import HTMLDependency
-from pydantic import TypeAdapter
 from shiny import Inputs, Outputs, Session, module, reactive, render, ui
 
+from . import _codec as codec
+from ._codec import LazyEvent
+from ._conversation import CONVERSATION_EVENT_TYPES, Conversation
 from ._events import EventEmitter
+from ._logging import log_event, logger
+from ._metrics import Metrics, process_metrics
+from ._outbound import (
+    RESPONSE_CREATE,
+    OutboundQueue,
+    function_call_output,
+    text_message,
+)
+from ._outputs import encode_output
+from ._prefetch import Prefetcher
+from ._queue import EventQueue, QueuePolicy
+from ._secrets import (
+    DEFAULT_CLIENT_SECRETS_URL,
+    get_client_secret_pool,
+    hold_http_session,
+    mint_client_secret,
+)
+from ._transport import DEFAULT_REALTIME_URL, RealtimeWebSocket
+from ._tools import (
+    ExecutorPolicy,
+    ToolCache,
+    ToolCallRunner,
+    get_tool_options,
+    invoke_tool,
+    resolve_tool_cache,
+)
+from ._usage import PriceTable, SessionUsage, process_usage
 from ._utils import _coerce_output
 
+if TYPE_CHECKING:
+    import openai.types.beta.realtime as oair
+
+# Event types the server needs forwarded from the client even when no app
+# handler has subscribed to them.
+_REQUIRED_EVENT_TYPES = ("response.function_call_arguments.done", "response.done")
+
+# Event types that interrupt a response, and so cancel its running tool calls
+_INTERRUPT_EVENT_TYPES = ("input_audio_buffer.speech_started", "response.cancelled")
+
+# Seconds to wait before each retry of attaching the server's WebSocket to a
+# call, with the "websocket" transport
+_SOCKET_RETRY_DELAYS = (0.5, 1.0, 2.0)
+
+# Seconds after the WebSocket is attached during which the client may still
+# forward events that the socket receives too, so they're deduplicated
+_SOCKET_HANDOVER_SECONDS = 5.0
+
 
 def dep() -> HTMLDependency:
     """
@@ -32,8 +78,136 @@ def dep() -> HTMLDependency:
     )
 
 
+class _ToolKey:
+    """
+    A tool, hashed and compared by what its schema is generated from rather
+    than by identity: tools defined inside a server function are new closures
+    in every session, but have the same code. Factory-made tools share their
+    code too, but differ in name, docstring or annotations.
+
+    Functions are only weakly referenced, so a cached key doesn't keep a
+    session's closure (and whatever it captured) alive.
+    """
+
+    __slots__ = ("_tool", "_key")
+
+    def __init__(self, tool: Callable[..., Any]):
+        code = getattr(tool, "__code__", None)
+        if code is None:
+            self._tool = None
+            self._key: Any = tool
+        else:
+            self._tool = weakref.ref(tool)
+            self._key = (
+                tool.__module__,
+                tool.__qualname__,
+                tool.__name__,
+                code,
+                tool.__doc__,
+                repr(getattr(tool, "__annotations__", None)),
+                repr(getattr(tool, "__defaults__", None)),
+                repr(getattr(tool, "__kwdefaults__", None)),
+            )
+
+    @property
+    def tool(self) -> Callable[..., Any]:
+        return self._key if self._tool is None else self._tool()
+
+    def __hash__(self) -> int:
+        return hash(self._key)
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, _ToolKey) and self._key == other._key
+
+
+def _tool_schema(tool: Callable[..., Any]) -> dict[str, Any]:
+    """The Realtime API function schema for a tool, computed once per tool."""
+    return _keyed_tool_schema(_ToolKey(tool))
+
+
+@functools.lru_cache(maxsize=256)
+def _keyed_tool_schema(tool: _ToolKey) -> dict[str, Any]:
+    import chatlas._tools
+
+    return chatlas._tools.func_to_schema(tool.tool)["function"] | {
+        "type": "function"
+    }
+
+
+def _session_config_body(
+    tools: tuple[Callable[..., Any], ...],
+    model: str,
+    voice: str,
+    speed: float,
+    instructions: str,
+    kwargs_json: str,
+    push_to_talk: bool = False,
+) -> bytes:
+    """
+    The JSON-encoded client secret request body for a session config.
+
+    Memoized process-wide, so sessions that share a config (the common case:
+    every visitor to an app) reuse the same bytes, even when their tools are
+    per-session closures. `kwargs_json` is the extra `realtime_server()`
+    kwargs, canonically JSON-encoded so they're hashable. With
+    `push_to_talk`, turn detection is off: the client commits the audio
+    buffer itself when the user releases the mic button.
+    """
+    return _keyed_session_config_body(
+        tuple(_ToolKey(tool) for tool in tools),
+        model,
+        voice,
+        speed,
+        instructions,
+        kwargs_json,
+        push_to_talk,
+    )
+
+
+@functools.lru_cache(maxsize=64)
+def _keyed_session_config_body(
+    tools: tuple[_ToolKey, ...],
+    model: str,
+    voice: str,
+    speed: float,
+    instructions: str,
+    kwargs_json: str,
+    push_to_talk: bool,
+) -> bytes:
+    return codec.dumps_bytes(
+        {
+            "session": {
+                "type": "realtime",
+                "model": model,
+                "instructions": instructions,
+                "audio": {
+                    "input": {
+                        "turn_detection": (
+                            None if push_to_talk else {"type": "semantic_vad"}
+                        )
+                    },
+                    "output": {
+                        "voice": voice,
+                        "speed": speed
+                    }
+                },
+                "tools": [_keyed_tool_schema(tool) for tool in tools]
+            }
+        }
+        | codec.loads(kwargs_json)
+    )
+
+
 @module.ui
-def realtime_ui(*, top=None, right="16px", bottom="16px", left=None, **kwargs):
+def realtime_ui(
+    *,
+    top=None,
+    right="16px",
+    bottom="16px",
+    left=None,
+    push_to_talk: bool = False,
+    **kwargs,
+):
     """
     Creates the UI components for real-time interactions.
     
@@ -42,11 +216,16 @@ def realtime_ui(*, top=None, right="16px", bottom="16px", left=None, **kwargs):
         right: Right position for the microphone button
         bottom: Bottom position for the microphone button
         left: Left position for the microphone button
+        push_to_talk: Label the microphone button for push-to-talk (hold to
+            talk). Use together with `realtime_server(push_to_talk=True)`,
+            which decides how the button behaves.
         **kwargs: Additional parameters to pass to the div element
         
     Returns:
         ui.TagList: A UI definition that can be used in a Shiny app
     """
+    from faicons import icon_svg
+
     return ui.TagList(
         ui.div(
             dep(),
@@ -56,7 +235,12 @@ def realtime_ui(*, top=None, right="16px", bottom="16px", left=None, **kwargs):
                     ui.tags.span(icon_svg("microphone-slash"), class_="mic-off"),
                     id=module.resolve_id("mic_button"),
                     class_="btn btn-secondary mic-toggle-btn",
-                    title="Click to toggle mic, hold for push-to-talk, or use spacebar",
+                    title=(
+                        "Hold to talk (or hold the spacebar)"
+                        if push_to_talk
+                        else "Click to toggle mic, hold for push-to-talk, or use "
+                        "spacebar"
+                    ),
                 ),
                 top=top,
                 right=right,
@@ -97,6 +281,34 @@ def realtime_server(
     instructions: str = "",
     tools: list[Callable[..., Any]] = [],
     api_key: str | None = None,
+    filter_events: bool = True,
+    batch_window: float = 0,
+    batch_size: int = 50,
+    batch_exclude: tuple[str, ...] = (
+        "response.function_call_arguments.done",
+        "response.done",
+        "input_audio_buffer.speech_started",
+    ),
+    current_event_throttle: float | None = None,
+    tool_executor: ExecutorPolicy = "inline",
+    max_concurrent_tools: int = 4,
+    tool_timeout: float | None = None,
+    tool_output_max_bytes: int | None = 32_000,
+    tool_max_updates: int | None = 100,
+    cancel_tools_on_interrupt: bool = True,
+    tool_cache: ToolCache | Literal["session", "process"] | None = None,
+    secret_pool_size: int = 0,
+    client_secrets_url: str = DEFAULT_CLIENT_SECRETS_URL,
+    transport: Literal["webrtc", "websocket"] = "webrtc",
+    realtime_url: str = DEFAULT_REALTIME_URL,
+    metrics: bool = False,
+    event_queue_size: int | None = None,
+    event_queue_policies: dict[str, QueuePolicy] | None = None,
+    concurrent_handlers: bool = False,
+    conversation_max_items: int | None = None,
+    conversation_throttle: float = 0.25,
+    prices: PriceTable | None = None,
+    push_to_talk: bool = False,
     **kwargs: Any,
 ):
     """
@@ -112,6 +324,128 @@ def realtime_server(
         instructions: System instructions for the AI model
         tools: List of tools/functions that the AI can call
         api_key: OpenAI API key (optional, defaults to OPENAI_API_KEY environment variable)
+        filter_events: If True (the default), the browser only forwards events
+            that have a handler registered via `on()` (plus the events needed
+            for tool calls); everything else is dropped client-side. Set to
+            False to forward every event, e.g. when reading `current_event`.
+        batch_window: If greater than zero, the browser buffers events for up
+            to this many seconds (e.g. 0.03) and forwards them to the server
+            as a single batch, which is then dispatched in order. Defaults to
+            0, which forwards each event as soon as it arrives.
+        batch_size: When batching, the maximum number of events in a batch; a
+            full batch is forwarded immediately.
+        batch_exclude: Event types (or wildcard patterns) that are never
+            held back by batching. When one of these arrives, it and any
+            buffered events are forwarded right away.
+        current_event_throttle: Events are dispatched to `on()` handlers
+            directly, without a reactive round trip. If this is not None,
+            `current_event` also mirrors the most recent event, updated at
+            most once every `current_event_throttle` seconds (0 updates it for
+            every batch). Defaults to None, in which case `current_event` is
+            never updated.
+        tool_executor: Where synchronous tools run: "inline" (on the event
+            loop, blocking other sessions while the tool runs), "thread" (a
+            shared thread pool), "process" (a shared process pool, for
+            CPU-bound tools), or a `concurrent.futures.Executor`. Individual
+            tools can override this with `tool_options(executor=...)`.
+            Coroutine functions are always awaited on the event loop.
+        max_concurrent_tools: The maximum number of tool calls that run at
+            the same time. When the model requests several calls in one
+            response, they run concurrently and their outputs are sent
+            together, followed by a single `response.create`.
+        tool_timeout: Seconds a tool may run before the model is told it timed
+            out. Individual tools can override this with
+            `tool_options(timeout=...)`. Defaults to None (no limit).
+        tool_output_max_bytes: Budget, in bytes (roughly four per token), for
+            each tool's output. Tool results are encoded compactly (CSV for
+            DataFrames, JSON for NumPy arrays, dataclasses and pydantic
+            models; see `register_output_encoder()`), and outputs over budget
+            keep their first and last rows, or are cut off, with a marker
+            telling the model what was left out. Individual tools can
+            override this with `tool_options(max_output_bytes=...)`. None
+            means no limit.
+        tool_max_updates: Tools can be async generators that report progress
+            by yielding values: each one is emitted as a "tool.progress" event
+            to `on()` handlers (with `call_id`, `name`, `index` and `value`),
+            and the last one becomes the tool's output. This is the most
+            values consumed from such a tool, as a guard against runaway
+            generators; override it per tool with
+            `tool_options(max_updates=...)`. Use
+            `tool_options(progress_to_model=True)` to also add progress to the
+            conversation.
+        cancel_tools_on_interrupt: If True (the default), running tool calls
+            are cancelled when the user starts speaking
+            (`input_audio_buffer.speech_started`) or their response is
+            cancelled (`response.cancelled`, or `response.done` with status
+            "cancelled"). The model is told the calls were cancelled, and no
+            new response is requested, so no stale answer is produced.
+        tool_cache: Opt-in memoization of tool results, keyed on the tool and
+            its arguments. "session" caches per Shiny session, "process"
+            shares one cache across all sessions, or pass a `ToolCache` to
+            control its size and default TTL. Per-tool TTLs can be set with
+            `tool_options(cache_ttl=...)`.
+        secret_pool_size: If greater than zero, keep this many ephemeral
+            client secrets pre-minted (per process, per session config) so
+            new sessions get a key without waiting on the API. Secrets close
+            to expiry are discarded and the pool refills in the background.
+        client_secrets_url: The endpoint used to mint client secrets; change
+            it to point at a proxy or a local stand-in server.
+        transport: How model events reach the server. With "webrtc" (the
+            default) they travel over the browser's WebRTC data channel and
+            are forwarded through Shiny. With "websocket", audio still flows
+            over WebRTC, but the server attaches its own WebSocket to the call
+            for events, so tool calls, `send()`, `send_text()` and `on()`
+            handlers run without a round trip through the browser. If the
+            WebSocket can't be attached (after a few retries) or later fails,
+            the session falls back to the data channel.
+        realtime_url: The WebSocket endpoint used by the "websocket"
+            transport; change it to test against a local mock server.
+        metrics: If True, record per-event-type counts and bytes, event
+            dispatch latency, per-tool call statistics and the time from
+            requesting a client secret to the first `session.created`. Read
+            them from `RealtimeControls.metrics`; they are also added to the
+            process-wide totals returned by `process_metrics()`. Defaults to
+            False, which adds no overhead.
+        event_queue_size: If not None, events are handed to `on()` handlers
+            through a bounded queue of this size, drained by a background
+            task, so a slow handler can't hold up incoming events (tool calls
+            still start as soon as they arrive). When the queue is full,
+            events are dropped or merged according to `event_queue_policies`.
+            Its depth and drop counts are available from
+            `RealtimeControls.event_queue.stats()`. Defaults to None, which
+            awaits handlers as each event arrives.
+        event_queue_policies: Queue policy per event type pattern: "keep"
+            (never dropped), "coalesce" (consecutive deltas for the same item
+            are merged into one event) or "drop_oldest". Merged over the
+            defaults, which keep tool calls, `response.done` and `error`,
+            coalesce `*.delta` and drop the oldest of anything else.
+        concurrent_handlers: If True, the `on()` handlers for an event run
+            concurrently instead of one after another, so e.g. a slow
+            analytics handler doesn't delay a transcript handler. Each handler
+            still receives events in order, through its own queue. A handler
+            that raises is logged without affecting the others. Reactive
+            values set by handlers are flushed once they finish.
+        conversation_max_items: If not None, keep a server-side view of the
+            conversation in `RealtimeControls.conversation`, built from
+            `conversation.item.*` events and text and transcript deltas, and
+            holding at most this many items (the oldest are evicted). Its
+            accessors, such as `transcript()` and `last_utterance()`, are
+            reactive. Defaults to None, which doesn't track the conversation
+            (and doesn't forward the events it needs).
+        conversation_throttle: The conversation's reactive accessors are
+            invalidated at most once every this many seconds, rather than for
+            every delta.
+        prices: USD per million tokens, by token kind (see `TOKEN_KINDS`),
+            used to cost the session's usage in `RealtimeControls.usage`.
+            Defaults to the table registered for `model` with
+            `register_prices()`.
+        push_to_talk: If True, the model's voice activity detection is turned
+            off and the mic is only open while the mic button (or spacebar) is
+            held. Releasing it commits the recorded audio and requests a
+            response right away, instead of waiting for a silence timeout.
+            Audio captured between turns is cleared rather than sent as input,
+            and pressing the button while the model is responding interrupts
+            it. Pair with `realtime_ui(push_to_talk=True)`.
         **kwargs: Additional parameters to pass to the OpenAI API
         
     Returns:
@@ -119,7 +453,40 @@ def realtime_server(
     """
     api_key = api_key or os.getenv("OPENAI_API_KEY")
     tools_by_name = {tool.__name__: tool for tool in tools}
+    cache = resolve_tool_cache(tool_cache)
+    prefetcher = Prefetcher(tools_by_name, tool_executor)
+    session_metrics = Metrics(parent=process_metrics()) if metrics else None
+    # When was the client secret for the current connection requested?
+    key_requested_at: float | None = None
+    conversation_version = reactive.value(0)
+    conversation = (
+        Conversation(conversation_max_items, depend=conversation_version)
+        if conversation_max_items is not None
+        else None
+    )
+    usage_version = reactive.value(0)
+    usage = SessionUsage(model, prices, ledger=process_usage(), depend=usage_version)
+    required_types = (
+        _REQUIRED_EVENT_TYPES
+        + (_INTERRUPT_EVENT_TYPES if tools and cancel_tools_on_interrupt else ())
+        + (("session.created",) if session_metrics is not None else ())
+        + (
+            ("response.output_item.added", "response.function_call_arguments.delta")
+            if prefetcher.enabled
+            else ()
+        )
+        + (CONVERSATION_EVENT_TYPES if conversation is not None else ())
+    )
     current_event = reactive.value()
+    batch_options = (
+        {
+            "window": round(batch_window * 1000),
+            "size": batch_size,
+            "exclude": list(batch_exclude),
+        }
+        if batch_window > 0
+        else None
+    )
 
     @reactive.effect
     @reactive.event(input.send)
@@ -128,16 +495,21 @@ def realtime_server(
 
     async def send_function_call_output(call_id: str, output: Any):
         """Send function_call_output + response.create so the model continues."""
+        await send_function_call_outputs([(call_id, output)])
+
+    async def send_function_call_outputs(
+        outputs: list[tuple[str, Any]], respond: bool = True
+    ):
+        """
+        Send a function_call_output item for each `(call_id, output)` pair,
+        followed by a single response.create (unless `respond` is False).
+        """
         await send(
-            {
-                "type": "conversation.item.create",
-                "item": {
-                    "type": "function_call_output",
-                    "call_id": call_id,
-                    "output": _coerce_output(output),
-                },
-            },
-            {"type": "response.create", "response": {}},
+            *(
+                function_call_output(call_id, _coerce_output(output))
+                for call_id, output in outputs
+            ),
+            *([RESPONSE_CREATE] if respond else []),
         )
 
     async def send_text(text: str):
@@ -147,20 +519,7 @@ def realtime_server(
         Args:
             text: The text to send
         """
-        await send(
-            oair.ConversationItemCreateEvent(
-                item=oair.ConversationItem(
-                    role="user",
-                    content=[
-                        oair.ConversationItemContent(
-                            type="input_text",
-                            text=text,
-                        )
-                    ],
-                ),
-            ),
-            oair.ResponseCreateEvent(response={}),
-        )
+        await send(text_message(text), RESPONSE_CREATE)
 
     @output(suspend_when_hidden=False)
     @render.text
@@ -171,100 +530,545 @@ def realtime_server(
         Returns:
             str: The client secret
         """
+        nonlocal key_requested_at
         if not api_key:
             raise ValueError("OPENAI_API_KEY environment variable is not set.")
-        async with aiohttp.ClientSession() as session:
-            async with session.post(
-                "https://api.openai.com/v1/realtime/client_secrets",
-                headers={
-                    "Authorization": f"Bearer {api_key}",
-                    "Content-Type": "application/json",
-                },
-                json={
-                    "session": {
-                        "type": "realtime",
-                        "model": model,
-                        "instructions": instructions,
-                        "audio": {
-                            "input": {
-                                # TODO: Consider turning off detection when push-to-talk is used
-                                "turn_detection": {"type": "semantic_vad"}
-                            },
-                            "output": {
-                                "voice": voice,
-                                "speed": speed
-                            }
-                        },
-                        "tools": [
-                            chatlas._tools.func_to_schema(tool)["function"]
-                            | {"type": "function"}
-                            for tool in tools
-                        ]
-                    }
-                }
-                | kwargs,
-            ) as response:
-                data = await response.json()
-                return json.dumps({"value": data["value"], "model": model})
+        key_requested_at = time.perf_counter()
+        body = _session_config_body(
+            tuple(tools),
+            model,
+            voice,
+            speed,
+            instructions,
+            json.dumps(kwargs, sort_keys=True),
+            push_to_talk,
+        )
+        if secret_pool_size > 0:
+            pool = get_client_secret_pool(
+                api_key, body, client_secrets_url, secret_pool_size
+            )
+            data = await pool.get()
+        else:
+            data = await mint_client_secret(api_key, body, client_secrets_url)
+        return json.dumps(
+            {
+                "value": data["value"],
+                "model": model,
+                "batch": batch_options,
+                "transport": transport,
+                "push_to_talk": push_to_talk,
+            }
+        )
 
     @reactive.Effect
     @reactive.event(input.key_event)
     async def handle_event():
         """
-        Handles events from the client.
+        Handles events from the client. The client sends either a single
+        event or, when batching is enabled, an array of events.
         """
+        if socket is not None and socket_attached() and handover_ids is None:
+            # The socket receives these events itself
+            return
         try:
-            from openai._models import construct_type_unchecked
-
             # This is a oair.RealtimeServerEvent but actually using it caused
             # validation errors all the time
-            event = json.loads(input.key_event())
-            current_event.set(event)
+            events = LazyEvent.from_payload(input.key_event())
         except Exception as e:
-            print(f"Event: {input.key_event()}")
-            print(f"Error processing event: {e}")
-            await send_text(
-                "(System: an internal event could not be parsed. "
-                "Please briefly let the user know something went wrong.)"
-            )
+            await report_parse_error(input.key_event(), e)
             return
 
-        print("-------------")
-        print(event["type"])
-        print(input.key_event())
+        await process_events(drop_handed_over(events))
+
+    async def handle_socket_message(raw: str):
+        """
+        Handles an event received over the server's own WebSocket. This runs
+        outside of any reactive flush, so take the reactive lock and flush
+        afterwards, like an extended task does.
+        """
+        async with reactive.lock():
+            await process_events(drop_handed_over([LazyEvent(raw)]))
+            await reactive.flush()
+
+    def drop_handed_over(events: list[LazyEvent]) -> list[LazyEvent]:
+        """
+        Right after the WebSocket is attached, the client may still forward
+        events that the socket receives too. Drops those already received one
+        way or the other, by event id.
+        """
+        if handover_ids is None:
+            return events
+        fresh = []
+        for event in events:
+            try:
+                event_id = event.get("event_id")
+            except Exception:
+                event_id = None  # reported when the event is dispatched
+            if event_id is not None:
+                if event_id in handover_ids:
+                    continue
+                handover_ids.add(event_id)
+            fresh.append(event)
+        return fresh
+
+    async def process_events(events: list[LazyEvent]):
+        """
+        Dispatches events, in order, to the tool-call machinery and to the
+        handlers registered with `on()`.
+        """
+        if events and current_event_throttle is not None:
+            try:
+                mirror_event(events[-1].decode())
+            except Exception:
+                pass  # reported when the event is dispatched below
+
+        nonlocal key_requested_at, drain_task
+        received_at = time.perf_counter()
+        for lazy_event in events:
+            try:
+                if session_metrics is not None:
+                    session_metrics.record_event(lazy_event.type, len(lazy_event.raw))
+
+                # Only decode events that something actually wants
+                if lazy_event.type not in required_types and (
+                    not emitter.has_handlers(lazy_event.type)
+                ):
+                    log_event(session.id, lazy_event.type, lazy_event.raw, received_at)
+                    continue
+                event = lazy_event.decode()
+            except Exception as e:
+                await report_parse_error(lazy_event.raw, e)
+                continue
+
+            if prefetcher.enabled:
+                if event["type"] == "response.output_item.added":
+                    prefetcher.item_added(event)
+                elif event["type"] == "response.function_call_arguments.delta":
+                    prefetcher.delta(event)
+                elif event["type"] == "response.function_call_arguments.done":
+                    prefetcher.claim(event)
+                elif event["type"] == "response.done":
+                    prefetcher.discard(event.get("response", {}).get("id"))
+
+            if conversation is not None and conversation.handle(event):
+                conversation_changed()
 
-        try:
             if event["type"] == "response.function_call_arguments.done":
-                fname = event["name"]
-                if fname not in tools_by_name:
-                    raise ValueError(f"Unknown function: {fname}")
-                tool = tools_by_name[fname]
-                args = json.loads(event["arguments"])
-                # If the tool is async, we need to await it
-                if asyncio.iscoroutinefunction(tool):
-                    _result = await tool(**args)
-                else:
-                    _result = tool(**args)
-                # gpt-realtime-2 requires a function_call_output matching the
-                # call_id, otherwise the model treats the call as in-flight.
-                await send_function_call_output(event["call_id"], _result)
+                tool_calls.start(event)
+                if event.get("response_id") is None:
+                    # Can't group it with other calls; reply straight away
+                    run_in_background(send_tool_outputs(None))
+            elif event["type"] == "response.done":
+                response = event.get("response", {})
+                response_id = response.get("id")
+                if response.get("status") == "cancelled":
+                    cancel_tool_calls(response_id)
+                if usage.record(response):
+                    with reactive.isolate():
+                        usage_version.set(usage_version() + 1)
+                if tool_calls.has_calls(response_id):
+                    run_in_background(send_tool_outputs(response_id))
+            elif event["type"] == "response.cancelled":
+                cancel_tool_calls(
+                    event.get("response_id") or event.get("response", {}).get("id")
+                )
+            elif event["type"] == "input_audio_buffer.speech_started":
+                cancel_tool_calls(None, barge_in=True)
+            elif event["type"] == "session.created":
+                if session_metrics is not None and key_requested_at is not None:
+                    session_metrics.record_session_created(
+                        received_at - key_requested_at
+                    )
+                    key_requested_at = None
+
+            if inbound is None:
+                # A failing handler mustn't hold up the rest of the batch
+                try:
+                    await emitter.emit(event["type"], event)
+                except Exception as e:
+                    log_handler_error(event["type"], e)
+                record_dispatch(received_at)
+            elif emitter.has_handlers(event["type"]):
+                inbound.put(event["type"], event, received_at)
+                if drain_task is None or drain_task.done():
+                    drain_task = asyncio.create_task(drain_inbound())
+
+            log_event(session.id, lazy_event.type, lazy_event.raw, received_at)
+
+    def log_handler_error(event_type: str, e: Exception):
+        logger.error(
+            "Error in %s handler: %s",
+            event_type,
+            e,
+            exc_info=e,
+            extra={"session": session.id, "event_type": event_type},
+        )
+
+    def record_dispatch(received_at: float):
+        if session_metrics is not None:
+            session_metrics.record_dispatch(time.perf_counter() - received_at)
+
+    inbound = (
+        EventQueue(event_queue_size, event_queue_policies)
+        if event_queue_size is not None
+        else None
+    )
+    drain_task: asyncio.Task | None = None
+
+    async def drain_inbound():
+        """
+        Hands queued events to the `on()` handlers. Handlers run outside of
+        the reactive lock (like tool calls), so new events keep arriving while
+        a slow handler is busy; reactive values they set are flushed once the
+        queue is empty.
+        """
+        while True:
+            event_type, event, received_at = await inbound.get()
+            try:
+                with reactive.isolate():
+                    await emitter.emit(event_type, event)
+            except Exception as e:
+                log_handler_error(event_type, e)
+            record_dispatch(received_at)
+            if not inbound.depth():
+                async with reactive.lock():
+                    await reactive.flush()
+
+    def cancel_drain():
+        if drain_task is not None:
+            drain_task.cancel()
+
+    session.on_ended(cancel_drain)
+
+    async def report_parse_error(raw: str, e: Exception):
+        logger.error(
+            "Error processing event: %s",
+            e,
+            exc_info=e,
+            extra={"session": session.id, "size": len(raw)},
+        )
+        logger.debug("Unparseable event: %s", raw, extra={"session": session.id})
+        await send_text(
+            "(System: an internal event could not be parsed. "
+            "Please briefly let the user know something went wrong.)"
+        )
+
+    async def run_function_call(event: dict[str, Any]) -> Any:
+        """
+        Runs the tool requested by a response.function_call_arguments.done
+        event and returns its serialized output, or an error message for the
+        model. Errors are never cached.
+        """
+        started_at = time.perf_counter() if session_metrics is not None else 0.0
+        failed = False
+        try:
+            fname = event["name"]
+            if fname not in tools_by_name:
+                raise ValueError(f"Unknown function: {fname}")
+            tool = tools_by_name[fname]
+            args = codec.loads(event["arguments"])
+
+            options = get_tool_options(tool)
+            ttl = options.cache_ttl
+            timeout = options.timeout if options.timeout is not None else tool_timeout
+            max_updates = (
+                options.max_updates
+                if options.max_updates is not None
+                else tool_max_updates
+            )
+            max_bytes = (
+                options.max_output_bytes
+                if options.max_output_bytes is not None
+                else tool_output_max_bytes
+            )
+            use_cache = cache is not None and ttl != 0
+            cached = None
+            if use_cache:
+                cache_key = cache.key(tool, args)
+                cached = cache.get(cache_key)
+
+            if cached is not None:
+                prefetcher.drop(event)
+                output = cached
+            else:
+                prefetch_token = await prefetcher.take(event, args)
+                try:
+                    result = await asyncio.wait_for(
+                        invoke_tool(
+                            tool,
+                            args,
+                            tool_executor,
+                            tool_update_reporter(
+                                event, bool(options.progress_to_model)
+                            ),
+                            max_updates,
+                        ),
+                        timeout,
+                    )
+                except asyncio.TimeoutError:
+                    raise TimeoutError(
+                        f"{fname} timed out after {timeout:g} seconds"
+                    ) from None
+                finally:
+                    prefetcher.reset(prefetch_token)
+                output = encode_output(result, max_bytes)
+                if use_cache:
+                    cache.set(cache_key, output, ttl)
         except Exception as e:
-            print(f"Error processing function call: {e}")
+            prefetcher.drop(event)
+            logger.warning(
+                "Error processing function call %s: %s",
+                event.get("name"),
+                e,
+                exc_info=e,
+                extra={"session": session.id, "tool": event.get("name")},
+            )
+            logger.debug(
+                "Function call arguments: %s",
+                event.get("arguments"),
+                extra={"session": session.id, "tool": event.get("name")},
+            )
             # Forward the actual error message so the model can tell the user
             # what went wrong instead of silently guessing.
-            await send_function_call_output(event["call_id"], f"Error: {e}")
+            failed = True
+            output = f"Error: {e}"
+
+        if session_metrics is not None:
+            session_metrics.record_tool(
+                event.get("name", ""),
+                time.perf_counter() - started_at,
+                failed,
+                len(output) if isinstance(output, str) else 0,
+            )
+        return output
+
+    def tool_update_reporter(call: dict[str, Any], to_model: bool):
+        """
+        Returns the callback for the values yielded by an async generator
+        tool. Each is emitted as a "tool.progress" event. With `to_model`,
+        each value is also added to the conversation once the next one
+        arrives, so the final value (the output) isn't sent as progress.
+        """
+        previous: list[Any] = []
+
+        async def report(value: Any, index: int):
+            update = {
+                "type": "tool.progress",
+                "call_id": call.get("call_id"),
+                "response_id": call.get("response_id"),
+                "name": call.get("name"),
+                "index": index,
+                "value": value,
+            }
+            # Tools run in the background, outside of any reactive flush. A
+            # failing handler mustn't fail the tool.
+            async with reactive.lock():
+                try:
+                    await emitter.emit("tool.progress", update)
+                except Exception as e:
+                    log_handler_error("tool.progress", e)
+                await reactive.flush()
+            if not to_model:
+                return
+            if previous:
+                text = encode_output(previous.pop(), 1_000)
+                await send(
+                    text_message(
+                        f"(Progress from the {call.get('name')} tool, still "
+                        f"running: {text})",
+                        role="system",
+                    )
+                )
+            previous.append(value)
+
+        return report
+
+    tool_calls = ToolCallRunner(run_function_call, max_concurrent_tools)
+    session.on_ended(tool_calls.cancel_all)
+    session.on_ended(prefetcher.cancel_all)
+
+    async def send_tool_outputs(response_id: str | None):
+        """
+        Waits for the tool calls of a response and sends all of their outputs.
+        gpt-realtime-2 requires a function_call_output matching each call_id,
+        otherwise the model treats the call as in-flight.
+        """
+        outputs = await tool_calls.collect(response_id)
+        respond = not tool_calls.interrupted(response_id)
+        outputs = [
+            (
+                call_id,
+                "Cancelled: the user interrupted before this call finished."
+                if output is ToolCallRunner.CANCELLED
+                else output,
+            )
+            for call_id, output in outputs
+        ]
+        async with reactive.lock():
+            await send_function_call_outputs(outputs, respond=respond)
+            # Tools may have updated reactive values while running in the
+            # background
+            await reactive.flush()
+
+    def cancel_tool_calls(response_id: str | None, barge_in: bool = False):
+        if not cancel_tools_on_interrupt:
+            return
+        if barge_in:
+            cancelled = tool_calls.cancel_running()
+        else:
+            cancelled = tool_calls.cancel(response_id)
+        if cancelled:
+            logger.info(
+                "Cancelled %d tool call(s) after an interruption",
+                cancelled,
+                extra={"session": session.id, "response_id": response_id},
+            )
+
+    background_tasks: set[asyncio.Task] = set()
 
-    async def send(*events: dict[str, Any]):
+    def run_in_background(coro):
+        task = asyncio.create_task(coro)
+        background_tasks.add(task)
+        task.add_done_callback(background_tasks.discard)
+
+    async def send(*events: dict[str, Any] | str):
         """
-        Sends events to the client.
+        Sends events to the model: through the client, or over the server's
+        own WebSocket with the "websocket" transport. Events are serialized
+        right away, and events sent through the client in the same event
+        loop tick are delivered in a single message.
         
         Args:
-            *events: Events to send
+            *events: Events to send, as dicts, openai event models, or
+                already-serialized JSON strings
+        """
+        if socket is not None and not socket_failed:
+            await socket.send(*events)
+        else:
+            await outbound.send(*events)
+
+    async def deliver_to_client(payloads: list[str]):
+        await session.send_custom_message("realtime_send", payloads)
+
+    outbound = OutboundQueue(deliver_to_client)
+
+    async def socket_lost():
+        await fall_back_to_client("Lost the realtime WebSocket")
+
+    socket = (
+        RealtimeWebSocket(
+            api_key, handle_socket_message, realtime_url, on_lost=socket_lost
+        )
+        if transport == "websocket"
+        else None
+    )
+    # Whether the WebSocket couldn't be attached, or failed, so events go
+    # through the client's data channel after all
+    socket_failed = False
+    # Whether the WebSocket is attached, so the client needn't forward events
+    socket_attached = reactive.value(False)
+    # The ids of events received during the handover to the WebSocket
+    handover_ids: set[str] | None = None
+    connect_task: asyncio.Task | None = None
+
+    async def connect_socket(call_id: str):
+        """
+        Attaches the WebSocket to the client's call, retrying with backoff.
+        Events sent meanwhile are queued by the socket, and the client keeps
+        forwarding the events it receives until the socket is attached.
         """
-        await session.send_custom_message("realtime_send", events)
+        nonlocal handover_ids
+        for attempt, delay in enumerate((0.0, *_SOCKET_RETRY_DELAYS)):
+            await asyncio.sleep(delay)
+            try:
+                await socket.close()
+                await socket.connect(call_id=call_id)
+            except Exception as e:
+                logger.warning(
+                    "Couldn't attach to realtime call (attempt %d): %s",
+                    attempt + 1,
+                    e,
+                    extra={"session": session.id},
+                )
+                continue
+            handover_ids = set()
+            async with reactive.lock():
+                socket_attached.set(True)
+                await reactive.flush()
+            await asyncio.sleep(_SOCKET_HANDOVER_SECONDS)
+            handover_ids = None
+            return
+        await fall_back_to_client("Couldn't attach to the realtime call")
+
+    async def fall_back_to_client(reason: str):
+        """
+        Switches event delivery to the client's data channel, as with the
+        "webrtc" transport: the client is asked to forward events again, and
+        events queued for the socket are sent through it.
+        """
+        nonlocal socket_failed, handover_ids
+        if socket_failed:
+            return
+        logger.error(
+            "%s; falling back to the data channel",
+            reason,
+            extra={"session": session.id},
+        )
+        socket_failed = True
+        handover_ids = None
+        async with reactive.lock():
+            socket_attached.set(False)
+            await reactive.flush()
+        await outbound.send(*socket.take_pending())
+
+    if socket is not None:
+        # The client reports the WebRTC call id once the call is set up; attach
+        # to the same call for the event channel. That may take a few retries,
+        # so it happens in the background rather than holding up the flush.
+        @reactive.effect
+        @reactive.event(input.key_call_id)
+        def _connect_socket():
+            nonlocal connect_task
+            if connect_task is not None:
+                connect_task.cancel()
+            connect_task = asyncio.create_task(
+                connect_socket(input.key_call_id())
+            )
+
+        def cancel_connect():
+            if connect_task is not None:
+                connect_task.cancel()
+
+        session.on_ended(cancel_connect)
+        session.on_ended(socket.close)
+
+    # The shared HTTP client (for client secrets and the WebSocket) is closed
+    # once the last session has ended
+    session.on_ended(hold_http_session())
 
     # Create event emitter
-    emitter = EventEmitter()
+    emitter = EventEmitter(concurrent=concurrent_handlers)
+
+    # The set of event types the client should forward to us
+    subscriptions = reactive.value(required_types)
+
+    def update_subscriptions():
+        subscriptions.set(
+            tuple(sorted(set(required_types) | set(emitter.event_types())))
+        )
+
+    if filter_events or socket is not None:
+
+        @reactive.effect
+        async def _send_subscriptions():
+            # With the websocket transport, events come to us directly once
+            # the socket is attached, so the client needn't forward any
+            direct = socket is not None and socket_attached()
+            types = [] if direct else list(subscriptions())
+            await session.send_custom_message(
+                "realtime_subscribe",
+                {"id": session.ns("key"), "types": types},
+            )
 
     # Add on() method to realtime_controls
     def on(
@@ -281,16 +1085,115 @@ def realtime_server(
             decorator returns an unsubscribe function.
         """
         def wrapper(callback: Callable[[dict[str, Any]], None]) -> Callable[[], None]:
-            return emitter.on(event_type, callback)
+            if concurrent_handlers:
+                callback = run_concurrently(callback)
+            unsubscribe = emitter.on(event_type, callback)
+            update_subscriptions()
+
+            def unsubscribe_and_update():
+                unsubscribe()
+                update_subscriptions()
+
+            return unsubscribe_and_update
 
         return wrapper
 
-    # Handle events from the reactive value
-    @reactive.effect
-    async def _handle_event():
-        event = current_event()
-        if event:
-            await emitter.emit(event["type"], event)
+    # With concurrent handlers, handlers run in their own tasks, outside of
+    # the reactive flush that received the event. Run them isolated, like
+    # tool calls, and flush whatever they changed afterwards.
+    handler_flush_pending = False
+
+    def run_concurrently(callback):
+        @functools.wraps(callback)
+        async def run(event: dict[str, Any]):
+            nonlocal handler_flush_pending
+            try:
+                with reactive.isolate():
+                    await callback(event)
+            finally:
+                if not handler_flush_pending:
+                    handler_flush_pending = True
+                    run_in_background(flush_after_handlers())
+
+        return run
+
+    async def flush_after_handlers():
+        nonlocal handler_flush_pending
+        async with reactive.lock():
+            handler_flush_pending = False
+            await reactive.flush()
+
+    # Throttled mirror of the latest event into current_event. Events that
+    # arrive too soon after the last update are held in mirror_pending and
+    # written out by _flush_mirror once the interval has passed.
+    mirror_pending: dict[str, Any] | None = None
+    mirror_last = 0.0
+    mirror_trigger = reactive.value(0)
+
+    def mirror_event(event: dict[str, Any]):
+        nonlocal mirror_pending, mirror_last
+        if current_event_throttle is None:
+            return
+        now = time.monotonic()
+        if now - mirror_last >= current_event_throttle:
+            mirror_last = now
+            mirror_pending = None
+            current_event.set(event)
+        else:
+            if mirror_pending is None:
+                with reactive.isolate():
+                    mirror_trigger.set(mirror_trigger() + 1)
+            mirror_pending = event
+
+    if current_event_throttle is not None:
+
+        @reactive.effect
+        def _flush_mirror():
+            nonlocal mirror_pending, mirror_last
+            mirror_trigger()
+            if mirror_pending is None:
+                return
+            remaining = mirror_last + current_event_throttle - time.monotonic()
+            if remaining > 0:
+                reactive.invalidate_later(remaining)
+                return
+            mirror_last = time.monotonic()
+            current_event.set(mirror_pending)
+            mirror_pending = None
+
+    # Throttled invalidation of the conversation's reactive accessors. The
+    # first change since the last update bumps conversation_trigger, and
+    # _publish_conversation bumps conversation_version once the interval has
+    # passed.
+    conversation_dirty = False
+    conversation_published = 0.0
+    conversation_trigger = reactive.value(0)
+
+    def conversation_changed():
+        nonlocal conversation_dirty
+        if not conversation_dirty:
+            conversation_dirty = True
+            with reactive.isolate():
+                conversation_trigger.set(conversation_trigger() + 1)
+
+    if conversation is not None:
+
+        @reactive.effect
+        def _publish_conversation():
+            nonlocal conversation_dirty, conversation_published
+            conversation_trigger()
+            if not conversation_dirty:
+                return
+            remaining = (
+                conversation_published + conversation_throttle - time.monotonic()
+            )
+            if remaining > 0:
+                reactive.invalidate_later(remaining)
+                return
+            conversation_published = time.monotonic()
+            conversation_dirty = False
+            with reactive.isolate():
+                conversation_version.set(conversation_version() + 1)
 
     # Create the return object and attach event emitter functionality
     realtime_controls = RealtimeControls(
@@ -298,6 +1201,11 @@ def realtime_server(
         send_text=send_text,
         current_event=current_event,
         on=on,
+        tool_cache=cache,
+        metrics=session_metrics,
+        event_queue=inbound,
+        conversation=conversation,
+        usage=usage,
     )
 
     return realtime_controls
@@ -310,14 +1218,41 @@ class RealtimeControls:
     Attributes:
         send: Function to send events to the client
         send_text: Function to send text messages to the AI
-        current_event: Reactive value containing the current event
+        current_event: Reactive value mirroring the most recent event; only
+            updated when `realtime_server()` is called with
+            `current_event_throttle`
         on: Function to register event handlers
+        tool_cache: The tool result cache, if `realtime_server()` was called
+            with `tool_cache`; use its `stats()` for hit/miss counts
+        metrics: The session's `Metrics`, if `realtime_server()` was called
+            with `metrics=True`; use its `snapshot()` or `to_prometheus()`
+        event_queue: The inbound event queue, if `realtime_server()` was
+            called with `event_queue_size`; use its `stats()` for its depth
+            and how many events were coalesced or dropped
+        conversation: The conversation so far, if `realtime_server()` was
+            called with `conversation_max_items`; its accessors are reactive
+        usage: The session's token usage and cost (`cost()`, `tokens()`),
+            from the usage reported with each response; its accessors are
+            reactive. Usage across sessions is in `process_usage()`.
     """
     send: Callable[
-        [Union[oair.ConversationItemCreateEvent, oair.ResponseCreateEvent]], Any
+        [
+            Union[
+                dict[str, Any],
+                str,
+                "oair.ConversationItemCreateEvent",
+                "oair.ResponseCreateEvent",
+            ]
+        ],
+        Any,
     ]
     send_text: Callable[[str], Any]
     current_event: reactive.Value
     on: Callable[
         [str], Callable[[Callable[[dict[str, Any]], None]], Callable[[], None]]
-    ]
\ No newline at end of file
+    ]
+    tool_cache: ToolCache | None = None
+    metrics: Metrics | None = None
+    event_queue: EventQueue | None = None
+    conversation: Conversation | None = None
+    usage: SessionUsage | None = None
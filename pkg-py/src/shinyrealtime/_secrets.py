@@ -0,0 +1,187 @@
+"""Minting (and pre-minting) ephemeral client secrets for the Realtime API."""
+
+import asyncio
+import collections
+import time
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, Optional
+
+from ._logging import logger
+
+if TYPE_CHECKING:
+    import aiohttp
+
+DEFAULT_CLIENT_SECRETS_URL = "https://api.openai.com/v1/realtime/client_secrets"
+
+_http_session: Optional["aiohttp.ClientSession"] = None
+_http_session_loop: Optional[asyncio.AbstractEventLoop] = None
+_http_session_holders = 0
+
+
+def http_session() -> "aiohttp.ClientSession":
+    """
+    Return the process-wide HTTP client, creating it on first use.
+
+    Reusing one connection-pooled client means a new Shiny session doesn't pay
+    for a fresh TLS handshake before it can mint a key. A new client is
+    created if the previous one was closed or belongs to another event loop.
+    """
+    import aiohttp
+
+    global _http_session, _http_session_loop
+    loop = asyncio.get_running_loop()
+    if _http_session is None or _http_session.closed or _http_session_loop is not loop:
+        _http_session = aiohttp.ClientSession()
+        _http_session_loop = loop
+    return _http_session
+
+
+async def close_http_session() -> None:
+    """Close the process-wide HTTP client, if it was created."""
+    global _http_session, _http_session_loop
+    if _http_session is not None:
+        await _http_session.close()
+    _http_session = None
+    _http_session_loop = None
+
+
+def hold_http_session() -> Callable[[], Awaitable[None]]:
+    """
+    Keep the process-wide HTTP client open until the returned function is
+    awaited. `realtime_server()` holds it for each Shiny session, so the
+    client is closed when the last session ends, e.g. as the app shuts down.
+    """
+    global _http_session_holders
+    _http_session_holders += 1
+    released = False
+
+    async def release() -> None:
+        global _http_session_holders
+        nonlocal released
+        if released:
+            return
+        released = True
+        _http_session_holders -= 1
+        if _http_session_holders == 0:
+            await close_http_session()
+
+    return release
+
+
+async def mint_client_secret(
+    api_key: str,
+    body: bytes,
+    url: str = DEFAULT_CLIENT_SECRETS_URL,
+) -> dict[str, Any]:
+    """
+    Request a new ephemeral client secret.
+
+    Args:
+        api_key: OpenAI API key
+        body: The JSON-encoded request body (the session config)
+        url: The client secrets endpoint
+
+    Returns:
+        dict: The response, including `value` and `expires_at`
+    """
+    async with http_session().post(
+        url,
+        headers={
+            "Authorization": f"Bearer {api_key}",
+            "Content-Type": "application/json",
+        },
+        data=body,
+    ) as response:
+        data = await response.json()
+    if "value" not in data:
+        error = data.get("error", {})
+        message = error.get("message") if isinstance(error, dict) else error
+        raise ValueError(f"Failed to create a client secret: {message or data}")
+    return data
+
+
+class ClientSecretPool:
+    """
+    Keeps a few pre-minted client secrets for one session config ready, so a
+    new visitor can be handed a key without waiting on the API.
+
+    Each secret is handed out once. Secrets that are about to expire are
+    discarded, and the pool refills itself in the background after every
+    `get()`. If the pool is empty, a secret is minted on demand.
+
+    Args:
+        api_key: OpenAI API key
+        body: The JSON-encoded request body (the session config)
+        url: The client secrets endpoint
+        size: How many secrets to keep ready
+        min_ttl: Secrets with fewer than this many seconds left are discarded
+    """
+
+    def __init__(
+        self,
+        api_key: str,
+        body: bytes,
+        url: str = DEFAULT_CLIENT_SECRETS_URL,
+        size: int = 2,
+        min_ttl: float = 60,
+    ):
+        self.api_key = api_key
+        self.body = body
+        self.url = url
+        self.size = size
+        self.min_ttl = min_ttl
+        self._secrets: collections.deque[dict[str, Any]] = collections.deque()
+        self._refill_task: Optional[asyncio.Task] = None
+
+    async def get(self) -> dict[str, Any]:
+        """Return a secret, from the pool if possible."""
+        self._discard_expiring()
+        secret = self._secrets.popleft() if self._secrets else None
+        self._schedule_refill()
+        if secret is None:
+            secret = await mint_client_secret(self.api_key, self.body, self.url)
+        return secret
+
+    def available(self) -> int:
+        """Number of unexpired secrets ready to hand out."""
+        self._discard_expiring()
+        return len(self._secrets)
+
+    def _discard_expiring(self) -> None:
+        cutoff = time.time() + self.min_ttl
+        self._secrets = collections.deque(
+            secret
+            for secret in self._secrets
+            if secret.get("expires_at") is None or secret["expires_at"] > cutoff
+        )
+
+    def _schedule_refill(self) -> None:
+        if self._refill_task is None or self._refill_task.done():
+            self._refill_task = asyncio.create_task(self._refill())
+
+    async def _refill(self) -> None:
+        while len(self._secrets) < self.size:
+            try:
+                secret = await mint_client_secret(self.api_key, self.body, self.url)
+            except Exception as e:
+                # Leave it to the next get() to try again (or mint on demand)
+                logger.warning("Error pre-minting client secret: %s", e)
+                return
+            self._secrets.append(secret)
+
+
+_pools: dict[tuple[str, str, bytes], ClientSecretPool] = {}
+
+
+def get_client_secret_pool(
+    api_key: str,
+    body: bytes,
+    url: str = DEFAULT_CLIENT_SECRETS_URL,
+    size: int = 2,
+) -> ClientSecretPool:
+    """Return the process-wide pool for this key, endpoint and session config."""
+    key = (url, api_key, body)
+    pool = _pools.get(key)
+    if pool is None:
+        pool = _pools[key] = ClientSecretPool(api_key, body, url, size=size)
+    pool.size = size
+    return pool
@@ -0,0 +1,439 @@
+"""Helpers for invoking the tools passed to ``realtime_server``."""
+
+import asyncio
+import contextvars
+import dataclasses
+import functools
+import inspect
+import math
+import time
+from collections import OrderedDict
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Literal, Optional, Union
+
+from shiny import reactive
+
+from . import _codec as codec
+from ._logging import logger
+
+ExecutorPolicy = Union[Literal["inline", "thread", "process"], Executor]
+
+_OPTIONS_ATTR = "_shinyrealtime_tool_options"
+
+
+@dataclass(frozen=True)
+class ToolOptions:
+    """
+    Per-tool settings attached with `tool_options()`.
+
+    Attributes:
+        executor: Where to run the tool if it is synchronous, overriding the
+            `tool_executor` passed to `realtime_server()`
+        cache_ttl: Seconds to keep this tool's results in the tool cache,
+            overriding the cache's default TTL; 0 disables caching for it
+        timeout: Seconds the tool may run before a timeout error is returned
+            to the model, overriding `realtime_server(tool_timeout=...)`
+        max_output_bytes: Budget for the tool's encoded output, overriding
+            `realtime_server(tool_output_max_bytes=...)`
+        max_updates: For async generator tools, the most values to consume,
+            overriding `realtime_server(tool_max_updates=...)`
+        progress_to_model: For async generator tools, whether intermediate
+            values are also added to the conversation as context
+        prefetch: A warm-up hook started while the call's arguments are still
+            streaming in; its result is available from `prefetched()`
+        prefetch_keys: The arguments `prefetch` is called with
+    """
+
+    executor: Optional[ExecutorPolicy] = None
+    cache_ttl: Optional[float] = None
+    timeout: Optional[float] = None
+    max_output_bytes: Optional[int] = None
+    max_updates: Optional[int] = None
+    progress_to_model: Optional[bool] = None
+    prefetch: Optional[Callable[..., Any]] = None
+    prefetch_keys: Optional[tuple[str, ...]] = None
+
+
+def tool_options(
+    func: Optional[Callable[..., Any]] = None,
+    *,
+    executor: Optional[ExecutorPolicy] = None,
+    cache_ttl: Optional[float] = None,
+    timeout: Optional[float] = None,
+    max_output_bytes: Optional[int] = None,
+    max_updates: Optional[int] = None,
+    progress_to_model: Optional[bool] = None,
+    prefetch: Optional[Callable[..., Any]] = None,
+    prefetch_keys: Optional[tuple[str, ...]] = None,
+) -> Any:
+    """
+    Decorator that attaches shinyrealtime-specific options to a tool.
+
+    Can be used bare (`@tool_options`) or with arguments
+    (`@tool_options(executor="process")`). Options given here take precedence
+    over the corresponding `realtime_server()` arguments.
+
+    Args:
+        func: The tool function
+        executor: Where to run the tool if it is synchronous: "inline" (on the
+            event loop), "thread" (a shared thread pool), "process" (a shared
+            process pool; the tool and its arguments must be picklable), or a
+            `concurrent.futures.Executor`
+        cache_ttl: When `realtime_server()` is given a `tool_cache`, how many
+            seconds to keep this tool's results. Use 0 for tools whose results
+            must never be reused (e.g. tools with side effects).
+        timeout: How many seconds the tool may run. If it takes longer, the
+            model is told the tool timed out. Coroutine tools are cancelled;
+            synchronous tools running in an executor can't be interrupted,
+            so their result is just discarded.
+        max_output_bytes: The most bytes of encoded output to send to the
+            model for this tool; larger outputs are truncated with a marker
+            saying what was left out.
+        max_updates: For async generator tools, stop consuming the generator
+            after this many values, and use the last one as the result.
+        progress_to_model: For async generator tools, if True, each value
+            but the last is also added to the conversation (without asking
+            for a response), so the model knows the tool is making progress.
+        prefetch: A function (sync or async) that starts the expensive part
+            of the tool early. It is called with the `prefetch_keys`
+            arguments as soon as the model has finished streaming them,
+            before the rest of the call's arguments have arrived. The tool
+            gets the hook's result from `prefetched()`, which returns None if
+            the final arguments no longer match.
+        prefetch_keys: The names of the arguments passed to `prefetch`.
+            Defaults to the hook's own parameter names.
+
+    Returns:
+        The tool function, unchanged apart from the attached options.
+    """
+
+    def decorator(func: Callable[..., Any]) -> Callable[..., Any]:
+        changes = {
+            "executor": executor,
+            "cache_ttl": cache_ttl,
+            "timeout": timeout,
+            "max_output_bytes": max_output_bytes,
+            "max_updates": max_updates,
+            "progress_to_model": progress_to_model,
+            "prefetch": prefetch,
+            "prefetch_keys": prefetch_keys and tuple(prefetch_keys),
+        }
+        options = dataclasses.replace(
+            get_tool_options(func),
+            **{name: value for name, value in changes.items() if value is not None},
+        )
+        setattr(func, _OPTIONS_ATTR, options)
+        return func
+
+    if func is not None:
+        return decorator(func)
+    return decorator
+
+
+def get_tool_options(func: Callable[..., Any]) -> ToolOptions:
+    """Return the options attached to a tool, or the defaults."""
+    return getattr(func, _OPTIONS_ATTR, None) or ToolOptions()
+
+
+_thread_pool: Optional[ThreadPoolExecutor] = None
+_process_pool: Optional[ProcessPoolExecutor] = None
+
+
+def _shared_thread_pool() -> ThreadPoolExecutor:
+    global _thread_pool
+    if _thread_pool is None:
+        _thread_pool = ThreadPoolExecutor(thread_name_prefix="shinyrealtime-tool")
+    return _thread_pool
+
+
+def _shared_process_pool() -> ProcessPoolExecutor:
+    global _process_pool
+    if _process_pool is None:
+        _process_pool = ProcessPoolExecutor()
+    return _process_pool
+
+
+def _resolve_executor(policy: ExecutorPolicy) -> Optional[Executor]:
+    if isinstance(policy, Executor):
+        return policy
+    if policy == "inline":
+        return None
+    if policy == "thread":
+        return _shared_thread_pool()
+    if policy == "process":
+        return _shared_process_pool()
+    raise ValueError(f"Unknown tool executor: {policy!r}")
+
+
+async def invoke_tool(
+    tool: Callable[..., Any],
+    args: dict[str, Any],
+    executor: ExecutorPolicy = "inline",
+    on_update: Optional[Callable[[Any, int], Awaitable[None]]] = None,
+    max_updates: Optional[int] = None,
+) -> Any:
+    """
+    Call a tool with the given arguments.
+
+    Coroutine functions are awaited on the event loop. Synchronous tools run
+    on the executor named by the tool's `tool_options()`, falling back to
+    `executor`.
+
+    Async generator functions are consumed on the event loop: each value they
+    yield is passed to `on_update` with its index, and the last one is the
+    result. At most `max_updates` values are consumed.
+    """
+    if inspect.isasyncgenfunction(tool):
+        return await _consume_updates(tool(**args), on_update, max_updates)
+
+    if asyncio.iscoroutinefunction(tool):
+        return await tool(**args)
+
+    pool = _resolve_executor(get_tool_options(tool).executor or executor)
+    if pool is None:
+        return tool(**args)
+
+    if isinstance(pool, ProcessPoolExecutor):
+        call = functools.partial(tool, **args)
+    else:
+        # Carry context variables (e.g. the current Shiny session) into the
+        # worker thread
+        call = functools.partial(contextvars.copy_context().run, tool, **args)
+    return await asyncio.get_running_loop().run_in_executor(pool, call)
+
+
+async def _consume_updates(
+    gen: Any,
+    on_update: Optional[Callable[[Any, int], Awaitable[None]]],
+    max_updates: Optional[int],
+) -> Any:
+    result = None
+    index = 0
+    try:
+        async for value in gen:
+            result = value
+            if on_update is not None:
+                await on_update(value, index)
+            index += 1
+            if max_updates is not None and index >= max_updates:
+                logger.warning(
+                    "Stopped %s after %d updates",
+                    getattr(gen, "__qualname__", "tool"),
+                    max_updates,
+                )
+                break
+    finally:
+        await gen.aclose()
+    return result
+
+
+class ToolCache:
+    """
+    A memoizing cache of tool outputs.
+
+    Entries are keyed on the tool (its qualified name, and the name the model
+    calls it by) and its canonicalized JSON arguments, and hold the serialized
+    output that is sent to the model, so a hit skips both the tool call and
+    serialization. The least recently used entries are evicted once
+    `max_size` is exceeded.
+
+    Args:
+        max_size: Maximum number of cached results
+        ttl: Default number of seconds a result stays valid, or None to keep
+            results until they are evicted. Tools can override this with
+            `tool_options(cache_ttl=...)`.
+
+    Attributes:
+        hits: Number of lookups that found a valid entry
+        misses: Number of lookups that didn't
+    """
+
+    def __init__(self, max_size: int = 256, ttl: Optional[float] = 300):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[tuple[str, str, str], tuple[float, str]] = (
+            OrderedDict()
+        )
+
+    @staticmethod
+    def key(tool: Callable[..., Any], args: dict[str, Any]) -> tuple[str, str, str]:
+        """Build the cache key for a call of `tool` with `args`."""
+        return (
+            f"{tool.__module__}.{tool.__qualname__}",
+            tool.__name__,
+            codec.dumps(args, sort_keys=True),
+        )
+
+    def get(self, key: tuple[str, str, str]) -> Optional[str]:
+        """Return the cached output for `key`, or None."""
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] <= time.monotonic():
+            del self._entries[key]
+            entry = None
+        if entry is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def set(self, key: tuple[str, str, str], output: str, ttl: Optional[float] = None):
+        """Store `output` under `key`, valid for `ttl` seconds."""
+        ttl = self.ttl if ttl is None else ttl
+        expires = math.inf if ttl is None else time.monotonic() + ttl
+        self._entries[key] = (expires, output)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """Remove all entries and reset the counters."""
+        self._entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self) -> dict[str, int]:
+        """Return the hit/miss counters and the current number of entries."""
+        return {"hits": self.hits, "misses": self.misses, "size": len(self._entries)}
+
+
+_process_tool_cache: Optional[ToolCache] = None
+
+
+def resolve_tool_cache(
+    tool_cache: Union[ToolCache, Literal["session", "process"], None],
+) -> Optional[ToolCache]:
+    """Turn a `realtime_server(tool_cache=...)` argument into a cache."""
+    global _process_tool_cache
+    if tool_cache is None or isinstance(tool_cache, ToolCache):
+        return tool_cache
+    if tool_cache == "session":
+        return ToolCache()
+    if tool_cache == "process":
+        if _process_tool_cache is None:
+            _process_tool_cache = ToolCache()
+        return _process_tool_cache
+    raise ValueError(f"Unknown tool cache scope: {tool_cache!r}")
+
+
+class ToolCallRunner:
+    """
+    Runs the function calls belonging to a model response concurrently.
+
+    Each call is started as soon as its `response.function_call_arguments.done`
+    event arrives, limited to `max_concurrency` calls at a time. Calls are
+    grouped by `response_id` so that all of a response's outputs can be sent
+    together, in `output_index` order, once the response is done.
+
+    When a response is interrupted, its running calls can be cancelled with
+    `cancel()` or `cancel_running()`; `collect()` then reports them as
+    `CANCELLED`, and `interrupted()` tells the caller not to ask the model for
+    another response.
+    """
+
+    #: The result `collect()` reports for a call that was cancelled
+    CANCELLED: Any = object()
+
+    def __init__(
+        self,
+        run_call: Callable[[dict[str, Any]], Awaitable[Any]],
+        max_concurrency: int = 4,
+    ):
+        self._run_call = run_call
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._calls: dict[Optional[str], list[tuple[int, str, asyncio.Task]]] = {}
+        # Calls that haven't finished yet, including ones being collected
+        self._running: dict[Optional[str], set[asyncio.Task]] = {}
+        self._interrupted: set[Optional[str]] = set()
+
+    def start(self, event: dict[str, Any]) -> None:
+        """Start the call described by a function_call_arguments.done event."""
+        response_id = event.get("response_id")
+        task = asyncio.create_task(self._run_limited(event))
+        self._calls.setdefault(response_id, []).append(
+            (event.get("output_index", 0), event["call_id"], task)
+        )
+        running = self._running.setdefault(response_id, set())
+        running.add(task)
+
+        def done(task: asyncio.Task):
+            running.discard(task)
+            if not running and self._running.get(response_id) is running:
+                del self._running[response_id]
+
+        task.add_done_callback(done)
+
+    def has_calls(self, response_id: Optional[str]) -> bool:
+        """Whether any calls have been started for the given response."""
+        return response_id in self._calls
+
+    async def collect(self, response_id: Optional[str]) -> list[tuple[str, Any]]:
+        """
+        Wait for every call started for a response and return their
+        `(call_id, result)` pairs in output order.
+        """
+        calls = sorted(self._calls.pop(response_id, []), key=lambda call: call[0])
+        results = await asyncio.gather(
+            *(task for _, _, task in calls), return_exceptions=True
+        )
+        return [
+            (
+                call_id,
+                self.CANCELLED
+                if isinstance(result, asyncio.CancelledError)
+                else result,
+            )
+            for (_, call_id, _), result in zip(calls, results)
+        ]
+
+    def cancel(self, response_id: Optional[str]) -> int:
+        """
+        Cancel the running calls of an interrupted response. Returns the
+        number of calls cancelled.
+        """
+        if response_id not in self._calls and response_id not in self._running:
+            return 0
+        self._interrupted.add(response_id)
+        tasks = self._running.pop(response_id, set())
+        for task in tasks:
+            task.cancel()
+        return len(tasks)
+
+    def cancel_running(self) -> int:
+        """
+        Cancel the running calls of every response, e.g. because the user
+        started speaking. Returns the number of calls cancelled.
+        """
+        return sum(
+            self.cancel(response_id)
+            for response_id in set(self._running) | set(self._calls)
+        )
+
+    def interrupted(self, response_id: Optional[str]) -> bool:
+        """
+        Whether the response was interrupted. Checking clears the flag, so
+        call this once, after `collect()`.
+        """
+        if response_id in self._interrupted:
+            self._interrupted.discard(response_id)
+            return True
+        return False
+
+    def cancel_all(self) -> None:
+        """Cancel every call that is still running."""
+        for tasks in self._running.values():
+            for task in tasks:
+                task.cancel()
+        self._calls.clear()
+        self._running.clear()
+        self._interrupted.clear()
+
+    async def _run_limited(self, event: dict[str, Any]) -> Any:
+        async with self._semaphore:
+            # Tools run outside of the reactive effect that started them, so
+            # don't let reactive reads attach to that effect
+            with reactive.isolate():
+                return await self._run_call(event)
@@ -0,0 +1,127 @@
+"""Server-side WebSocket connection to the Realtime API.
+
+In the "websocket" transport mode, the browser still carries audio over
+WebRTC, but the Python process attaches its own WebSocket to the same call
+(a "sideband" connection) for the control/event channel. Model events and
+tool calls are then handled without a round trip through the browser.
+"""
+
+import asyncio
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, Optional
+
+from ._logging import logger
+from ._outbound import event_to_json
+from ._secrets import http_session
+
+if TYPE_CHECKING:
+    import aiohttp
+
+DEFAULT_REALTIME_URL = "wss://api.openai.com/v1/realtime"
+
+
+class RealtimeWebSocket:
+    """
+    A WebSocket connection to the Realtime API's event channel.
+
+    Events sent before the connection is open are queued and flushed once it
+    is. Each incoming text message is passed, still JSON-encoded, to
+    `on_message`.
+
+    Args:
+        api_key: OpenAI API key
+        on_message: Async callback for each raw incoming message
+        url: The realtime WebSocket endpoint; point it at a local server to
+            test against a mock
+        on_lost: Async callback for when an open connection fails; events
+            sent afterwards are queued again
+    """
+
+    def __init__(
+        self,
+        api_key: str,
+        on_message: Callable[[str], Awaitable[None]],
+        url: str = DEFAULT_REALTIME_URL,
+        on_lost: Optional[Callable[[], Awaitable[None]]] = None,
+    ):
+        self.api_key = api_key
+        self.url = url
+        self._on_message = on_message
+        self._on_lost = on_lost
+        self._ws: Optional["aiohttp.ClientWebSocketResponse"] = None
+        self._reader: Optional[asyncio.Task] = None
+        self._pending: list[str] = []
+
+    @property
+    def connected(self) -> bool:
+        return self._ws is not None and not self._ws.closed
+
+    async def connect(
+        self, *, call_id: Optional[str] = None, model: Optional[str] = None
+    ) -> None:
+        """
+        Open the connection, either attached to an existing WebRTC call
+        (`call_id`) or as a new session for `model`.
+        """
+        if call_id is not None:
+            params = {"call_id": call_id}
+        elif model is not None:
+            params = {"model": model}
+        else:
+            raise ValueError("Either call_id or model must be provided")
+
+        self._ws = await http_session().ws_connect(
+            self.url,
+            params=params,
+            headers={"Authorization": f"Bearer {self.api_key}"},
+        )
+        self._reader = asyncio.create_task(self._read_loop(self._ws))
+
+        pending, self._pending = self._pending, []
+        for payload in pending:
+            await self._ws.send_str(payload)
+
+    async def send(self, *events: Any) -> None:
+        """Send events, queueing them if the connection isn't open yet."""
+        payloads = [event_to_json(event) for event in events]
+        if not self.connected:
+            self._pending.extend(payloads)
+            return
+        for payload in payloads:
+            await self._ws.send_str(payload)
+
+    def take_pending(self) -> list[str]:
+        """Remove and return the events queued while not connected."""
+        pending, self._pending = self._pending, []
+        return pending
+
+    async def close(self) -> None:
+        """Close the connection and stop reading from it."""
+        if self._reader is not None:
+            self._reader.cancel()
+            self._reader = None
+        if self._ws is not None:
+            await self._ws.close()
+            self._ws = None
+
+    async def _read_loop(self, ws: "aiohttp.ClientWebSocketResponse") -> None:
+        import aiohttp
+
+        try:
+            async for msg in ws:
+                if msg.type == aiohttp.WSMsgType.TEXT:
+                    try:
+                        await self._on_message(msg.data)
+                    except Exception as e:
+                        logger.error(
+                            "Error handling realtime event: %s", e, exc_info=e
+                        )
+                elif msg.type == aiohttp.WSMsgType.ERROR:
+                    logger.error("Realtime WebSocket error: %s", ws.exception())
+                    break
+            else:
+                # Closed by the server: the call is over
+                return
+        except Exception as e:
+            logger.error("Error reading from realtime WebSocket: %s", e, exc_info=e)
+        if self._on_lost is not None:
+            await self._on_lost()
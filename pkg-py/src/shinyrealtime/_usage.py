@@ -0,0 +1,383 @@
+"""Token usage and cost accounting for realtime sessions.
+
+Every `response.done` event carries the response's token usage. Each session
+totals it, priced with the table for its model, in a `SessionUsage`, and adds
+it to the process-wide `UsageLedger` returned by `process_usage()`. The
+ledger keeps one row per (time bucket, model, tool) in flat `array` columns,
+so it stays small however many sessions and responses it has seen, and its
+rollups are computed with NumPy when it's installed.
+"""
+
+import math
+import sys
+import time
+from array import array
+from typing import Any, Callable, Dict, Iterable, List, Literal, Optional, Tuple
+
+from ._utils import _best_match
+
+#: The token kinds usage is broken down into. Cached input tokens are counted
+#: separately from (not as well as) the uncached ones.
+TOKEN_KINDS: Tuple[str, ...] = (
+    "input_text",
+    "input_audio",
+    "input_image",
+    "input_text_cached",
+    "input_audio_cached",
+    "input_image_cached",
+    "output_text",
+    "output_audio",
+)
+
+#: USD per million tokens, by token kind
+PriceTable = Dict[str, float]
+
+_MINI_PRICES: PriceTable = {
+    "input_text": 0.6,
+    "input_audio": 10,
+    "input_text_cached": 0.3,
+    "input_audio_cached": 0.3,
+    "output_text": 2.4,
+    "output_audio": 20,
+}
+
+# By model name pattern; the most specific matching pattern wins
+_prices: Dict[str, PriceTable] = {
+    "gpt-realtime*": {
+        "input_text": 4,
+        "input_audio": 32,
+        "input_image": 5,
+        "input_text_cached": 0.4,
+        "input_audio_cached": 0.4,
+        "input_image_cached": 0.5,
+        "output_text": 16,
+        "output_audio": 64,
+    },
+    "gpt-realtime-mini*": _MINI_PRICES,
+    "gpt-4o-mini-realtime*": _MINI_PRICES,
+}
+
+# Columns of a ledger row after the token counts
+_COST = len(TOKEN_KINDS)
+_RESPONSES = _COST + 1
+_WIDTH = _RESPONSES + 1
+
+
+def register_prices(model: str, prices: PriceTable) -> None:
+    """
+    Set the prices used to cost a model's usage.
+
+    Args:
+        model: A model name, or a wildcard pattern such as `"gpt-realtime*"`;
+            the most specific matching pattern is used
+        prices: USD per million tokens, keyed by token kind (see
+            `TOKEN_KINDS`); kinds that are left out are free
+    """
+    unknown = set(prices) - set(TOKEN_KINDS)
+    if unknown:
+        raise ValueError(f"Unknown token kinds: {', '.join(sorted(unknown))}")
+    _prices[model] = dict(prices)
+
+
+def prices_for(model: str) -> PriceTable:
+    """The price table for a model; empty if none is registered."""
+    pattern = _best_match(model, _prices)
+    return _prices[pattern] if pattern is not None else {}
+
+
+def tokens_from_usage(usage: Dict[str, Any]) -> List[float]:
+    """
+    Break the `usage` of a `response.done` event down into `TOKEN_KINDS`.
+    """
+    input_details = usage.get("input_token_details") or {}
+    output_details = usage.get("output_token_details") or {}
+    cached_details = input_details.get("cached_tokens_details") or {}
+    uncached = []
+    cached = []
+    for modality in ("text", "audio", "image"):
+        total = input_details.get(f"{modality}_tokens") or 0
+        hits = cached_details.get(f"{modality}_tokens") or 0
+        uncached.append(max(total - hits, 0))
+        cached.append(hits)
+    return [
+        *uncached,
+        *cached,
+        output_details.get("text_tokens") or 0,
+        output_details.get("audio_tokens") or 0,
+    ]
+
+
+def price_tokens(tokens: Iterable[float], prices: PriceTable) -> float:
+    """The cost, in USD, of token counts ordered as `TOKEN_KINDS`."""
+    return (
+        sum(n * prices.get(kind, 0) for kind, n in zip(TOKEN_KINDS, tokens)) / 1e6
+    )
+
+
+class UsageLedger:
+    """
+    Usage totals per time bucket, model and tool.
+
+    Args:
+        bucket_seconds: The width of the time buckets usage is summed into
+        retention: Buckets older than this many seconds are dropped
+    """
+
+    def __init__(self, bucket_seconds: float = 60.0, retention: float = 86_400.0):
+        self.bucket_seconds = bucket_seconds
+        self.retention = retention
+        self.clear()
+
+    def clear(self) -> None:
+        """Forget all usage."""
+        self._names: List[str] = []
+        self._name_ids: Dict[str, int] = {}
+        # One row per (bucket, model, tool): its bucket start, model and tool
+        # name ids, and _WIDTH values (token counts, cost, responses)
+        self._buckets = array("d")
+        self._models = array("I")
+        self._tools = array("I")
+        self._values = array("d")
+        self._rows: Dict[Tuple[float, int, int], int] = {}
+        self._oldest = math.inf
+
+    def _name_id(self, name: str) -> int:
+        name_id = self._name_ids.get(name)
+        if name_id is None:
+            name_id = self._name_ids[name] = len(self._names)
+            self._names.append(name)
+        return name_id
+
+    def record(
+        self,
+        model: str,
+        tool: str,
+        tokens: Iterable[float],
+        cost: float,
+        responses: float = 1,
+        at: Optional[float] = None,
+    ) -> None:
+        """
+        Add usage.
+
+        Args:
+            model: The model that was used
+            tool: The tool the usage is attributed to; "" for none
+            tokens: Token counts, ordered as `TOKEN_KINDS`
+            cost: Their cost, in USD
+            responses: How many responses this is (a fraction when one
+                response is split between tools)
+            at: When it happened, as a `time.time()` timestamp; defaults to
+                now
+        """
+        at = time.time() if at is None else at
+        bucket = at - at % self.bucket_seconds
+        if bucket - self._oldest > self.retention:
+            self._prune(bucket - self.retention)
+
+        key = (bucket, self._name_id(model), self._name_id(tool))
+        row = self._rows.get(key)
+        if row is None:
+            row = self._rows[key] = len(self._buckets)
+            self._buckets.append(bucket)
+            self._models.append(key[1])
+            self._tools.append(key[2])
+            self._values.extend([0.0] * _WIDTH)
+            self._oldest = min(self._oldest, bucket)
+
+        start = row * _WIDTH
+        values = self._values
+        for i, n in enumerate(tokens):
+            values[start + i] += n
+        values[start + _COST] += cost
+        values[start + _RESPONSES] += responses
+
+    def _prune(self, cutoff: float) -> None:
+        keep = [row for row, bucket in enumerate(self._buckets) if bucket >= cutoff]
+        self._buckets = array("d", (self._buckets[row] for row in keep))
+        self._models = array("I", (self._models[row] for row in keep))
+        self._tools = array("I", (self._tools[row] for row in keep))
+        values = self._values
+        self._values = array("d")
+        for row in keep:
+            self._values.extend(values[row * _WIDTH : (row + 1) * _WIDTH])
+        self._rows = {
+            (self._buckets[i], self._models[i], self._tools[i]): i
+            for i in range(len(keep))
+        }
+        self._oldest = min(self._buckets, default=math.inf)
+
+    def rollup(
+        self,
+        by: Literal["model", "tool", "window"] = "model",
+        since: Optional[float] = None,
+        window: Optional[float] = None,
+    ) -> Dict[Any, Dict[str, float]]:
+        """
+        Sum usage by model, tool or time window.
+
+        Args:
+            by: What to group by. "window" groups by time window, keyed by
+                the window's start time.
+            since: Only include usage from buckets starting at or after this
+                `time.time()` timestamp
+            window: With `by="window"`, the window width in seconds; defaults
+                to `bucket_seconds`
+
+        Returns:
+            A dict of totals per group: the token counts by kind, plus "cost"
+            (USD) and "responses".
+        """
+        if by == "model":
+            keys: Any = self._models
+        elif by == "tool":
+            keys = self._tools
+        elif by == "window":
+            width = window or self.bucket_seconds
+            keys = array("d", (b - b % width for b in self._buckets))
+        else:
+            raise ValueError(f"Can't roll up usage by {by!r}")
+
+        if "numpy" in sys.modules or len(self._buckets) > 1_000:
+            sums = self._sum_numpy(keys, since)
+        else:
+            sums = self._sum_python(keys, since)
+
+        return {
+            (key if by == "window" else self._names[int(key)]): dict(
+                zip((*TOKEN_KINDS, "cost", "responses"), row)
+            )
+            for key, row in sums.items()
+        }
+
+    def _sum_python(self, keys: Any, since: Optional[float]) -> Dict[Any, List[float]]:
+        sums: Dict[Any, List[float]] = {}
+        values = self._values
+        for row, key in enumerate(keys):
+            if since is not None and self._buckets[row] < since:
+                continue
+            total = sums.setdefault(key, [0.0] * _WIDTH)
+            start = row * _WIDTH
+            for i in range(_WIDTH):
+                total[i] += values[start + i]
+        return sums
+
+    def _sum_numpy(self, keys: Any, since: Optional[float]) -> Dict[Any, List[float]]:
+        try:
+            import numpy as np
+        except ImportError:
+            return self._sum_python(keys, since)
+
+        # np.array() copies, so the arrays can keep growing afterwards
+        values = np.array(self._values).reshape(-1, _WIDTH)
+        keys = np.array(keys)
+        if since is not None:
+            mask = np.array(self._buckets) >= since
+            values, keys = values[mask], keys[mask]
+        unique, inverse = np.unique(keys, return_inverse=True)
+        sums = np.zeros((len(unique), _WIDTH))
+        np.add.at(sums, inverse, values)
+        return {key.item(): list(row) for key, row in zip(unique, sums.tolist())}
+
+    def total(self, since: Optional[float] = None) -> Dict[str, float]:
+        """Sum all usage, optionally only since a `time.time()` timestamp."""
+        rollup = self.rollup("model", since=since)
+        totals = dict.fromkeys((*TOKEN_KINDS, "cost", "responses"), 0.0)
+        for row in rollup.values():
+            for name, value in row.items():
+                totals[name] += value
+        return totals
+
+
+_process_usage = UsageLedger()
+
+
+def process_usage() -> UsageLedger:
+    """Return the process-wide usage ledger, fed by every session."""
+    return _process_usage
+
+
+class SessionUsage:
+    """
+    A session's running token usage and cost.
+
+    Args:
+        model: The session's model, used to look up prices and for the
+            ledger's model rollup
+        prices: The price table; defaults to the one registered for `model`
+        ledger: Where usage is also recorded, across sessions
+        depend: Called by the accessors before reading; `realtime_server()`
+            passes a reactive value, which makes them reactive
+    """
+
+    def __init__(
+        self,
+        model: str,
+        prices: Optional[PriceTable] = None,
+        ledger: Optional[UsageLedger] = None,
+        depend: Optional[Callable[[], Any]] = None,
+    ):
+        self.model = model
+        self.prices = prices if prices is not None else prices_for(model)
+        self._ledger = ledger
+        self._depend = depend
+        self._tokens = array("d", [0.0] * len(TOKEN_KINDS))
+        self._cost = 0.0
+        self._responses = 0
+
+    def record(self, response: Dict[str, Any]) -> bool:
+        """
+        Add the usage of a response from a `response.done` event.
+
+        Usage is attributed, in the ledger, to the tools the response called
+        (split evenly), or to no tool ("") if it didn't call any.
+
+        Returns:
+            bool: Whether the response reported usage, even if it cost
+            nothing (e.g. with a model that has no prices)
+        """
+        usage = response.get("usage")
+        if not usage:
+            return False
+        tokens = tokens_from_usage(usage)
+        cost = price_tokens(tokens, self.prices)
+        for i, n in enumerate(tokens):
+            self._tokens[i] += n
+        self._cost += cost
+        self._responses += 1
+
+        if self._ledger is not None:
+            tools = [
+                item.get("name") or ""
+                for item in response.get("output") or ()
+                if item.get("type") == "function_call"
+            ] or [""]
+            share = 1 / len(tools)
+            for tool in tools:
+                self._ledger.record(
+                    self.model,
+                    tool,
+                    [n * share for n in tokens],
+                    cost * share,
+                    responses=share,
+                )
+        return True
+
+    def _read(self) -> None:
+        if self._depend is not None:
+            self._depend()
+
+    def cost(self) -> float:
+        """The session's cost so far, in USD."""
+        self._read()
+        return self._cost
+
+    def tokens(self) -> Dict[str, float]:
+        """The session's token counts so far, by kind."""
+        self._read()
+        return dict(zip(TOKEN_KINDS, self._tokens))
+
+    def responses(self) -> int:
+        """The number of responses with usage so far."""
+        self._read()
+        return self._responses
@@ -1,17 +1,19 @@
 """Internal helpers extracted so they can be unit-tested without importing the
-heavier realtime module (which pulls in aiohttp/openai/chatlas).
+realtime module (which pulls in shiny).
 """
 
-import json
-from typing import Any
+from fnmatch import fnmatchcase
+from typing import Any, Iterable, Optional
+
+from . import _codec as codec
 
 
 def _coerce_output(x: Any, fallback: str = "OK") -> str:
     """Coerce tool result to non-empty scalar string per Realtime API spec.
 
     Strings pass through unchanged. int/float/bool are stringified. Anything
-    else (dicts, lists, dataclasses via ``__dict__``) is JSON-serialized so
-    the model receives structured data. Returns ``fallback`` for ``None``,
+    else (dicts, lists, dataclasses via ``__dict__``) is serialized as compact
+    JSON so the model receives structured data. Returns ``fallback`` for ``None``,
     empty containers, or empty strings.
     """
     if x is None:
@@ -22,9 +24,21 @@ def _coerce_output(x: Any, fallback: str = "OK") -> str:
         elif isinstance(x, (int, float, bool)):
             s = str(x)
         else:
-            s = json.dumps(x)
+            s = codec.dumps(x)
     except Exception:
         return fallback
     if not s:
         return fallback
     return s
+
+
+def _best_match(event_type: str, patterns: Iterable[str]) -> Optional[str]:
+    """Return the most specific glob pattern matching an event type, if any.
+
+    An exact match wins; otherwise the longest matching pattern does, so
+    ``"response.done"`` beats ``"response.*"``, which beats ``"*"``.
+    """
+    matches = [p for p in patterns if fnmatchcase(event_type, p)]
+    if not matches:
+        return None
+    return max(matches, key=lambda p: (p == event_type, len(p)))
@@ -0,0 +1,20 @@
+import pytest
+
+from benchmarks._stand_in import stand_in_server
+
+
+@pytest.fixture
+def stand_in():
+    """`async with stand_in(routes) as base_url`, inside the test's event loop."""
+    return stand_in_server
+
+
+@pytest.fixture(autouse=True)
+def reactive_lock(monkeypatch):
+    """
+    Shiny's reactive lock is bound to the first event loop that waits on it,
+    but each test runs its own loop, so every test gets a new lock.
+    """
+    from shiny.reactive import _core
+
+    monkeypatch.setattr(_core._reactive_environment, "_lock", None)
@@ -0,0 +1,56 @@
+import json
+
+from shinyrealtime import _codec as codec
+from shinyrealtime._codec import LazyEvent
+
+
+def test_dumps_round_trips():
+    obj = {"type": "response.create", "response": {}, "n": [1, 2.5, None]}
+    assert codec.loads(codec.dumps(obj)) == obj
+    assert codec.loads(codec.dumps_bytes(obj)) == obj
+
+
+def test_dumps_falls_back_for_non_string_keys():
+    # Compact, like the fast codecs
+    assert codec.dumps({1: "a", "b": [1, 2]}) == '{"1":"a","b":[1,2]}'
+
+
+def test_dumps_sorts_keys_on_request():
+    obj = {"b": 1, "a": {"d": 2, "c": 3}}
+    assert codec.dumps(obj, sort_keys=True) == '{"a":{"c":3,"d":2},"b":1}'
+    assert codec.dumps(obj) == '{"b":1,"a":{"d":2,"c":3}}'
+    # Through the standard library fallback
+    assert codec.dumps({2: "x", 1: "y"}, sort_keys=True) == '{"1":"y","2":"x"}'
+
+
+def test_lazy_event_reads_type_without_decoding():
+    raw = '{"type":"response.done","event_id":"evt_1","response":{"type":"x"}}'
+    event = LazyEvent(raw)
+    assert event.type == "response.done"
+    assert event._data is None
+    assert event["response"] == {"type": "x"}
+
+
+def test_lazy_event_type_after_event_id():
+    event = LazyEvent('{"event_id": "evt_1", "type": "session.created"}')
+    assert event.type == "session.created"
+    assert event._data is None
+
+
+def test_lazy_event_falls_back_to_decoding():
+    # "type" isn't first, so the nested "type" must not be picked up
+    event = LazyEvent('{"item": {"type": "message"}, "type": "conversation.item.added"}')
+    assert event.type == "conversation.item.added"
+
+
+def test_from_payload_single_and_batch():
+    single = LazyEvent.from_payload('{"type": "a"}')
+    assert [e.type for e in single] == ["a"]
+
+    batch = LazyEvent.from_payload(json.dumps(['{"type": "a"}', '{"type": "b"}']))
+    assert [e.type for e in batch] == ["a", "b"]
+
+    decoded = LazyEvent.from_payload(json.dumps([{"type": "c", "n": 1}]))
+    assert decoded[0].type == "c"
+    assert dict(decoded[0]) == {"type": "c", "n": 1}
+    assert json.loads(decoded[0].raw) == {"type": "c", "n": 1}
@@ -6,16 +6,16 @@ def test_string_passthrough():
 
 
 def test_dict_preserves_field_names():
-    assert _coerce_output({"temp": 72, "cond": "sunny"}) == '{"temp": 72, "cond": "sunny"}'
+    assert _coerce_output({"temp": 72, "cond": "sunny"}) == '{"temp":72,"cond":"sunny"}'
 
 
 def test_list_serialized_as_json_array():
-    assert _coerce_output([1, 2, 3]) == "[1, 2, 3]"
+    assert _coerce_output([1, 2, 3]) == "[1,2,3]"
 
 
 def test_list_of_records():
     assert _coerce_output([{"a": 1, "b": "x"}, {"a": 2, "b": "y"}]) == \
-        '[{"a": 1, "b": "x"}, {"a": 2, "b": "y"}]'
+        '[{"a":1,"b":"x"},{"a":2,"b":"y"}]'
 
 
 def test_int_stringified():
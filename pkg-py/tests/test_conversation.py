@@ -0,0 +1,126 @@
+from shinyrealtime._conversation import Conversation
+
+
+def user_turn(item_id, transcript):
+    return [
+        {
+            "type": "conversation.item.added",
+            "item": {
+                "id": item_id,
+                "type": "message",
+                "role": "user",
+                "content": [{"type": "input_audio", "transcript": None}],
+            },
+        },
+        {
+            "type": "conversation.item.input_audio_transcription.completed",
+            "item_id": item_id,
+            "content_index": 0,
+            "transcript": transcript,
+        },
+    ]
+
+
+def assistant_turn(item_id, deltas):
+    events = [
+        {
+            "type": "response.output_item.added",
+            "item": {"id": item_id, "type": "message", "role": "assistant"},
+        }
+    ]
+    events += [
+        {
+            "type": "response.output_audio_transcript.delta",
+            "item_id": item_id,
+            "content_index": 0,
+            "delta": delta,
+        }
+        for delta in deltas
+    ]
+    return events
+
+
+def test_transcript_is_assembled_from_deltas():
+    conversation = Conversation()
+    for event in user_turn("u1", "What's the weather?") + assistant_turn(
+        "a1", ["It's ", "sunny", " today."]
+    ):
+        assert conversation.handle(event)
+
+    assert conversation.get("a1").text == "It's sunny today."
+    assert conversation.transcript() == [
+        ("user", "What's the weather?"),
+        ("assistant", "It's sunny today."),
+    ]
+    assert conversation.last_utterance() == "What's the weather?"
+    assert conversation.last_utterance("assistant") == "It's sunny today."
+
+    # The final transcript replaces the chunks
+    conversation.handle(
+        {
+            "type": "response.output_audio_transcript.done",
+            "item_id": "a1",
+            "content_index": 0,
+            "transcript": "It's sunny today!",
+        }
+    )
+    assert conversation.last_utterance("assistant") == "It's sunny today!"
+
+    # conversation.item.done with an empty transcript doesn't clobber it
+    conversation.handle(
+        {
+            "type": "conversation.item.done",
+            "item": {
+                "id": "a1",
+                "type": "message",
+                "role": "assistant",
+                "status": "completed",
+                "content": [{"type": "output_audio", "transcript": ""}],
+            },
+        }
+    )
+    assert conversation.get("a1").status == "completed"
+    assert conversation.get("a1").text == "It's sunny today!"
+
+    assert not conversation.handle({"type": "response.output_audio.delta"})
+
+
+def test_function_calls_and_deletions():
+    conversation = Conversation()
+    conversation.handle(
+        {
+            "type": "response.function_call_arguments.done",
+            "item_id": "f1",
+            "call_id": "call_1",
+            "name": "get_weather",
+            "arguments": '{"city": "Oslo"}',
+        }
+    )
+    call = conversation.get("f1")
+    assert (call.type, call.name, call.arguments) == (
+        "function_call",
+        "get_weather",
+        '{"city": "Oslo"}',
+    )
+    assert conversation.transcript() == []
+
+    conversation.handle({"type": "conversation.item.deleted", "item_id": "f1"})
+    assert conversation.get("f1") is None
+
+
+def test_old_items_are_evicted():
+    conversation = Conversation(max_items=3)
+    for i in range(10):
+        for event in assistant_turn(f"a{i}", [f"turn {i}"]):
+            conversation.handle(event)
+
+    assert [item.id for item in conversation.items()] == ["a7", "a8", "a9"]
+    assert conversation.stats() == {"items": 3, "evicted": 7}
+
+
+def test_accessors_call_depend():
+    reads = []
+    conversation = Conversation(depend=lambda: reads.append(1))
+    conversation.transcript()
+    conversation.items()
+    assert len(reads) == 2
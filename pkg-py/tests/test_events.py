@@ -0,0 +1,313 @@
+import asyncio
+import json
+
+import pytest
+
+from shinyrealtime._events import EventEmitter
+
+
+def test_event_types_lists_active_patterns():
+    emitter = EventEmitter()
+
+    async def handler(event):
+        pass
+
+    emitter.on("response.done", handler)
+    unsubscribe = emitter.on("conversation.*", handler)
+    assert sorted(emitter.event_types()) == ["conversation.*", "response.done"]
+
+    unsubscribe()
+    assert emitter.event_types() == ["response.done"]
+
+
+def test_emit_exact_wildcard_and_global_in_order():
+    emitter = EventEmitter()
+    calls = []
+
+    def recorder(name):
+        async def handler(event):
+            calls.append(name)
+
+        return handler
+
+    emitter.on("*", recorder("global"))
+    emitter.on("conversation.item.*", recorder("item.*"))
+    emitter.on("conversation.*", recorder("conversation.*"))
+    emitter.on("conversation.item.added", recorder("exact"))
+    emitter.on("response.done", recorder("other"))
+
+    asyncio.run(emitter.emit("conversation.item.added", {}))
+    assert calls == ["exact", "conversation.*", "item.*", "global"]
+
+
+def test_dispatch_cache_tracks_registrations():
+    emitter = EventEmitter()
+    seen = []
+
+    async def exact(event):
+        seen.append("exact")
+
+    async def wildcard(event):
+        seen.append("wildcard")
+
+    emitter.on("response.done", exact)
+    asyncio.run(emitter.emit("response.done", {}))
+    assert seen == ["exact"]
+
+    # Registering a new wildcard handler must invalidate the cached entry
+    unsubscribe = emitter.on("response.*", wildcard)
+    asyncio.run(emitter.emit("response.done", {}))
+    assert seen == ["exact", "exact", "wildcard"]
+
+    unsubscribe()
+    asyncio.run(emitter.emit("response.done", {}))
+    assert seen == ["exact", "exact", "wildcard", "exact"]
+
+
+def test_unsubscribe_during_emit_skips_handler():
+    emitter = EventEmitter()
+    seen = []
+    unsubscribers = {}
+
+    async def first(event):
+        seen.append("first")
+        unsubscribers["second"]()
+
+    async def second(event):
+        seen.append("second")
+
+    emitter.on("response.done", first)
+    unsubscribers["second"] = emitter.on("response.done", second)
+    asyncio.run(emitter.emit("response.done", {}))
+    assert seen == ["first"]
+
+
+def test_concurrent_handlers_do_not_wait_on_each_other():
+    emitter = EventEmitter(concurrent=True)
+    log = []
+
+    async def slow(event):
+        await asyncio.sleep(0.01)
+        log.append(("slow", event["n"]))
+
+    async def fast(event):
+        log.append(("fast", event["n"]))
+
+    emitter.on("response.*", slow)
+    emitter.on("response.done", fast)
+
+    async def go():
+        for n in range(3):
+            await emitter.emit("response.done", {"n": n})
+        await emitter.join()
+
+    asyncio.run(go())
+    # Each handler sees events in order; the fast one isn't held up
+    assert [n for name, n in log if name == "slow"] == [0, 1, 2]
+    assert [n for name, n in log if name == "fast"] == [0, 1, 2]
+    assert log[:3] == [("fast", 0), ("fast", 1), ("fast", 2)]
+
+
+def test_concurrent_handler_errors_are_isolated():
+    errors = []
+    emitter = EventEmitter(
+        concurrent=True, on_error=lambda callback, e: errors.append(str(e))
+    )
+    seen = []
+
+    async def broken(event):
+        raise RuntimeError(f"boom {event['n']}")
+
+    async def ok(event):
+        seen.append(event["n"])
+
+    emitter.on("*", broken)
+    emitter.on("*", ok)
+
+    async def go():
+        await emitter.emit("error", {"n": 1})
+        await emitter.emit("error", {"n": 2})
+        await emitter.join()
+
+    asyncio.run(go())
+    assert errors == ["boom 1", "boom 2"]
+    assert seen == [1, 2]
+
+
+def test_sequential_on_error_keeps_remaining_handlers():
+    errors = []
+    emitter = EventEmitter(on_error=lambda callback, e: errors.append(e))
+    seen = []
+
+    async def broken(event):
+        raise ValueError("nope")
+
+    async def ok(event):
+        seen.append(event)
+
+    emitter.on("response.done", broken)
+    emitter.on("*", ok)
+    asyncio.run(emitter.emit("response.done", {}))
+    assert len(errors) == 1 and seen == [{}]
+
+
+def test_unsubscribed_concurrent_handler_drops_queued_events():
+    emitter = EventEmitter(concurrent=True)
+    seen = []
+
+    async def handler(event):
+        seen.append(event["n"])
+        unsubscribe()
+
+    unsubscribe = emitter.on("response.done", handler)
+
+    async def go():
+        for n in range(3):
+            await emitter.emit("response.done", {"n": n})
+        await emitter.join()
+
+    asyncio.run(go())
+    assert seen == [0]
+
+
+def burst_server(received, mirrored, **kwargs):
+    from shiny import reactive
+
+    from shinyrealtime import realtime_server
+
+    def server(input, output, session):
+        controls = realtime_server("rt", **kwargs)
+
+        @controls.on("test.*")
+        async def record(event):
+            received.append(event["n"])
+
+        if kwargs.get("current_event_throttle") is not None:
+
+            @reactive.effect
+            def mirror():
+                mirrored.append(controls.current_event()["n"])
+
+    return server
+
+
+def test_server_dispatches_every_event_of_a_burst(monkeypatch):
+    pytest.importorskip("shiny")
+    from shiny.testserver import test_server_async
+
+    monkeypatch.delenv("OPENAI_API_KEY", raising=False)
+    received = []
+
+    async def go():
+        async with test_server_async(burst_server(received, [])) as server:
+            rt = server.make_scope("rt")
+            # Single events and a client-side batch, sent without waiting for
+            # each other's flush
+            await asyncio.gather(
+                *(
+                    rt.set_inputs(key_event=json.dumps({"type": "test.a", "n": n}))
+                    for n in range(20)
+                ),
+                rt.set_inputs(
+                    key_event=json.dumps(
+                        [{"type": "test.b", "n": n} for n in range(20, 30)]
+                    )
+                ),
+            )
+
+    asyncio.run(go())
+    assert received == list(range(30))
+
+
+def test_throttled_current_event_ends_on_the_last_event(monkeypatch):
+    pytest.importorskip("shiny")
+    from shiny.testserver import test_server_async
+
+    monkeypatch.delenv("OPENAI_API_KEY", raising=False)
+    received, mirrored = [], []
+    server_fn = burst_server(received, mirrored, current_event_throttle=0.5)
+
+    async def go():
+        async with test_server_async(server_fn) as server:
+            rt = server.make_scope("rt")
+            for n in range(10):
+                await rt.set_inputs(key_event=json.dumps({"type": "test.a", "n": n}))
+            await asyncio.sleep(0.6)
+            await server.flush()
+
+    asyncio.run(go())
+    assert received == list(range(10))
+    # Throttled, so not every event is mirrored, but the last one is
+    assert len(mirrored) < 10
+    assert mirrored[-1] == 9
+
+
+def test_failing_handler_does_not_abandon_the_batch(monkeypatch):
+    pytest.importorskip("shiny")
+    from shiny.testserver import test_server_async
+
+    from shinyrealtime import realtime_server
+
+    monkeypatch.delenv("OPENAI_API_KEY", raising=False)
+    seen = []
+
+    def server(input, output, session):
+        controls = realtime_server("rt")
+
+        @controls.on("test.*")
+        async def handler(event):
+            seen.append(event["n"])
+            if event["n"] == 0:
+                raise RuntimeError("handler failed")
+
+    async def go():
+        async with test_server_async(server) as test_server:
+            batch = [{"type": "test.a", "n": n} for n in range(3)]
+            await test_server.make_scope("rt").set_inputs(key_event=json.dumps(batch))
+
+    asyncio.run(go())
+    assert seen == [0, 1, 2]
+
+
+def test_server_sends_subscriptions_as_handlers_change(monkeypatch):
+    pytest.importorskip("shiny")
+    from shiny import reactive
+    from shiny.testserver import test_server_async
+
+    from shinyrealtime import realtime_server
+    from shinyrealtime._realtime import _REQUIRED_EVENT_TYPES
+
+    monkeypatch.delenv("OPENAI_API_KEY", raising=False)
+    subscribed = []
+    controls = {}
+
+    def server(input, output, session):
+        send_custom_message = session.send_custom_message
+
+        async def record(type, message):
+            if type == "realtime_subscribe":
+                subscribed.append(message["types"])
+            await send_custom_message(type, message)
+
+        session.send_custom_message = record
+        controls["rt"] = realtime_server("rt")
+
+    async def handler(event):
+        pass
+
+    async def go():
+        async with test_server_async(server) as test_server:
+            await test_server.flush()
+            # Registered outside of a flush, as from a background task
+            unsubscribe = controls["rt"].on("conversation.item.*")(handler)
+            await reactive.flush()
+            unsubscribe()
+            await reactive.flush()
+
+    asyncio.run(go())
+    required = sorted(_REQUIRED_EVENT_TYPES)
+    assert subscribed == [
+        list(_REQUIRED_EVENT_TYPES),
+        sorted(required + ["conversation.item.*"]),
+        required,
+    ]
@@ -0,0 +1,34 @@
+import subprocess
+import sys
+
+# Loaded on first use, never by `import shinyrealtime`
+HEAVY_MODULES = {"aiohttp", "chatlas", "openai", "pydantic", "faicons"}
+
+# Import time on top of shiny itself, in milliseconds. Generous, so only a
+# new eager import of a heavy dependency trips it.
+BUDGET_MS = 250
+
+
+def test_import_stays_within_budget():
+    code = "import shiny; import shinyrealtime"
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    rows = [
+        line.split("|")
+        for line in result.stderr.splitlines()
+        if line.startswith("import time:") and "[us]" not in line
+    ]
+    names = [row[2][1:] for row in rows]
+    # Everything listed after shiny's own entry was imported for shinyrealtime
+    ours = names[names.index("shiny") + 1 :]
+    assert ours[-1] == "shinyrealtime"
+
+    heavy = {name.strip().split(".")[0] for name in ours} & HEAVY_MODULES
+    assert not heavy, f"import shinyrealtime loads {sorted(heavy)}"
+
+    total_ms = int(rows[-1][1]) / 1000
+    assert total_ms < BUDGET_MS, f"import shinyrealtime took {total_ms:.0f}ms"
@@ -0,0 +1,66 @@
+import logging
+import time
+
+import pytest
+
+from shinyrealtime import _logging
+from shinyrealtime._logging import configure_event_logging, log_event
+
+
+@pytest.fixture(autouse=True)
+def reset_event_logging(monkeypatch):
+    monkeypatch.setattr(_logging, "_levels", {"*": logging.DEBUG})
+    monkeypatch.setattr(_logging, "_sample_rates", {})
+    monkeypatch.setattr(_logging, "_resolved", {})
+    monkeypatch.setattr(_logging, "_counters", {})
+
+
+def test_events_are_silent_by_default(caplog):
+    caplog.set_level(logging.INFO, logger="shinyrealtime")
+    log_event("s1", "response.done", "{}", time.perf_counter())
+    assert caplog.records == []
+
+
+def test_per_type_levels_and_structured_fields(caplog):
+    caplog.set_level(logging.INFO, logger="shinyrealtime")
+    configure_event_logging(
+        levels={"response.*": logging.INFO, "response.done": logging.WARNING}
+    )
+    log_event("s1", "response.done", '{"type":"response.done"}', time.perf_counter())
+    log_event("s1", "response.created", "{}", time.perf_counter())
+
+    done, created = caplog.records
+    assert done.levelno == logging.WARNING
+    assert created.levelno == logging.INFO
+    assert done.session == "s1"
+    assert done.event_type == "response.done"
+    assert done.size == 24
+    assert done.latency >= 0
+    # Payloads are only logged at DEBUG
+    assert not hasattr(done, "payload")
+    assert '"type"' not in done.getMessage()
+
+
+def test_payload_logged_at_debug(caplog):
+    caplog.set_level(logging.DEBUG, logger="shinyrealtime")
+    log_event("s1", "response.done", '{"type":"response.done"}', time.perf_counter())
+    (record,) = caplog.records
+    assert record.payload == '{"type":"response.done"}'
+
+
+def test_sampling(caplog):
+    caplog.set_level(logging.DEBUG, logger="shinyrealtime")
+    configure_event_logging(sample_rates={"*.delta": 0.1, "input_audio_buffer.*": 0})
+    for _ in range(30):
+        log_event("s1", "response.output_audio_transcript.delta", "{}", 0.0)
+        log_event("s1", "input_audio_buffer.committed", "{}", 0.0)
+        log_event("s1", "response.done", "{}", 0.0)
+    types = [record.event_type for record in caplog.records]
+    assert types.count("response.output_audio_transcript.delta") == 3
+    assert types.count("input_audio_buffer.committed") == 0
+    assert types.count("response.done") == 30
+
+
+def test_invalid_sample_rate():
+    with pytest.raises(ValueError):
+        configure_event_logging(sample_rates={"*": 2})
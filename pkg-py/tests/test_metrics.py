@@ -0,0 +1,51 @@
+import math
+
+from shinyrealtime._metrics import Histogram, Metrics
+
+
+def test_histogram_buckets_and_quantiles():
+    hist = Histogram((0.01, 0.1, math.inf))
+    for value in (0.005, 0.005, 0.05, 3.0):
+        hist.observe(value)
+    assert hist.counts == [2, 1, 1]
+    assert hist.count == 4
+    assert hist.quantile(0.5) == 0.01
+    assert hist.quantile(0.75) == 0.1
+    assert hist.quantile(1.0) == math.inf
+    assert math.isnan(Histogram().quantile(0.5))
+
+
+def test_session_metrics_roll_up_to_parent():
+    parent = Metrics()
+    a = Metrics(parent=parent)
+    b = Metrics(parent=parent)
+    a.record_event("response.done", 100)
+    b.record_event("response.done", 50)
+    b.record_tool("lookup", 0.2, True, 12)
+
+    assert a.snapshot()["events"] == {"response.done": {"count": 1, "bytes": 100}}
+    snapshot = parent.snapshot()
+    assert snapshot["events"] == {"response.done": {"count": 2, "bytes": 150}}
+    assert snapshot["tools"]["lookup"]["calls"] == 1
+    assert snapshot["tools"]["lookup"]["errors"] == 1
+    assert snapshot["tools"]["lookup"]["output_bytes"] == 12
+
+
+def test_prometheus_export():
+    metrics = Metrics()
+    metrics.record_event('odd"type', 10)
+    metrics.record_dispatch(0.002)
+    metrics.record_tool("lookup", 0.2, False, 5)
+    metrics.record_session_created(1.5)
+    text = metrics.to_prometheus()
+
+    assert '# TYPE shinyrealtime_events_total counter' in text
+    assert 'shinyrealtime_events_total{type="odd\\"type"} 1' in text
+    assert 'shinyrealtime_event_bytes_total{type="odd\\"type"} 10' in text
+    assert 'shinyrealtime_dispatch_seconds_bucket{le="0.0025"} 1' in text
+    assert 'shinyrealtime_dispatch_seconds_bucket{le="+Inf"} 1' in text
+    assert "shinyrealtime_dispatch_seconds_count 1" in text
+    assert 'shinyrealtime_tool_seconds_bucket{tool="lookup",le="0.25"} 1' in text
+    assert 'shinyrealtime_tool_seconds_count{tool="lookup"} 1' in text
+    assert "shinyrealtime_time_to_session_created_seconds_sum 1.5" in text
+    assert text.endswith("\n")
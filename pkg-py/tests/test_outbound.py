@@ -0,0 +1,69 @@
+import asyncio
+import json
+
+from shinyrealtime._outbound import (
+    RESPONSE_CREATE,
+    OutboundQueue,
+    function_call_output,
+    text_message,
+)
+
+
+def test_templates_match_the_event_shapes():
+    assert json.loads(RESPONSE_CREATE) == {"type": "response.create", "response": {}}
+    assert json.loads(function_call_output("call_1", 'He said "hi"\n')) == {
+        "type": "conversation.item.create",
+        "item": {
+            "type": "function_call_output",
+            "call_id": "call_1",
+            "output": 'He said "hi"\n',
+        },
+    }
+    assert json.loads(text_message("Grüß dich", role="system")) == {
+        "type": "conversation.item.create",
+        "item": {
+            "type": "message",
+            "role": "system",
+            "content": [{"type": "input_text", "text": "Grüß dich"}],
+        },
+    }
+
+
+def test_sends_in_one_tick_are_coalesced():
+    delivered = []
+
+    async def deliver(payloads):
+        delivered.append(payloads)
+
+    async def main():
+        queue = OutboundQueue(deliver)
+        await asyncio.gather(
+            queue.send({"type": "a"}),
+            queue.send(RESPONSE_CREATE, {"type": "b"}),
+        )
+        await queue.send({"type": "c"})
+
+    asyncio.run(main())
+    assert [[json.loads(p)["type"] for p in batch] for batch in delivered] == [
+        ["a", "response.create", "b"],
+        ["c"],
+    ]
+
+
+def test_cancelled_sender_does_not_cancel_delivery():
+    delivered = []
+
+    async def deliver(payloads):
+        await asyncio.sleep(0.01)
+        delivered.append(payloads)
+
+    async def main():
+        queue = OutboundQueue(deliver)
+        first = asyncio.create_task(queue.send({"type": "a"}))
+        second = asyncio.create_task(queue.send({"type": "b"}))
+        await asyncio.sleep(0)
+        first.cancel()
+        await second
+
+    asyncio.run(main())
+    assert len(delivered) == 1 and len(delivered[0]) == 2
@@ -0,0 +1,108 @@
+import dataclasses
+import json
+
+import pytest
+
+from shinyrealtime import _codec as codec
+from shinyrealtime import _outputs
+from shinyrealtime._outputs import encode_output, register_output_encoder
+
+
+@pytest.fixture
+def restore_encoders(monkeypatch):
+    monkeypatch.setattr(_outputs, "_encoders", list(_outputs._encoders))
+
+
+def test_small_outputs_match_coerce_output():
+    assert encode_output("hello", 100) == "hello"
+    assert encode_output(42, 100) == "42"
+    assert encode_output(None, 100) == "OK"
+    assert encode_output([{"a": 1}, {"a": 2}], 100) == '[{"a":1},{"a":2}]'
+
+
+def test_dataclasses_are_encoded_as_json():
+    @dataclasses.dataclass
+    class Weather:
+        city: str
+        temp: int
+
+    assert json.loads(encode_output(Weather("Boston", 72))) == {
+        "city": "Boston",
+        "temp": 72,
+    }
+
+
+def test_long_record_lists_are_columnar_and_truncated():
+    rows = [{"id": i, "name": f"row {i}"} for i in range(50_000)]
+    text = encode_output(rows, 2_000)
+    assert len(text.encode("utf-8")) <= 2_000
+
+    body, marker = text.rsplit("\n", 1)
+    columns = json.loads(body)
+    assert list(columns) == ["id", "name"]
+    assert columns["id"][0] == 0 and columns["id"][-1] == 49_999
+    shown = len(columns["id"])
+    assert marker == (
+        f"[truncated: showing the first {(shown + 1) // 2} and last "
+        f"{shown // 2} of 50000 rows]"
+    )
+
+
+def test_record_lists_that_fit_are_kept_as_rows():
+    rows = [{"id": i, "name": f"row {i}"} for i in range(100)]
+    size = len(codec.dumps(rows))
+    assert encode_output(rows, size) == codec.dumps(rows)
+
+    # One byte short, rows are dropped, and only then are they columnar
+    body, marker = encode_output(rows, size - 1).rsplit("\n", 1)
+    assert list(json.loads(body)) == ["id", "name"]
+    assert marker.startswith("[truncated: showing the first ")
+
+
+def test_long_text_is_cut_off_with_marker():
+    text = encode_output("x" * 10_000, 500)
+    assert len(text) <= 500
+    assert text.endswith("]")
+    assert "[truncated: output was 10000 bytes" in text
+
+
+def test_custom_encoders_take_precedence(restore_encoders):
+    class Point:
+        def __init__(self, x, y):
+            self.x, self.y = x, y
+
+    @register_output_encoder(Point)
+    def encode_point(point, max_bytes):
+        return {"x": point.x, "y": point.y}
+
+    assert encode_output(Point(1, 2)) == '{"x":1,"y":2}'
+
+    register_output_encoder(Point, lambda point, max_bytes: f"({point.x}, {point.y})")
+    assert encode_output(Point(1, 2)) == "(1, 2)"
+
+
+def test_pandas_dataframes_are_csv():
+    pd = pytest.importorskip("pandas")
+    frame = pd.DataFrame({"a": range(10_000), "b": ["x"] * 10_000})
+
+    assert encode_output(frame.head(2)) == "a,b\n0,x\n1,x"
+
+    text = encode_output(frame, 1_000)
+    assert len(text) <= 1_000
+    lines = text.split("\n")
+    assert lines[0] == "a,b"
+    assert lines[1] == "0,x"
+    assert lines[-2] == "9999,x"
+    assert lines[-1].startswith("[truncated: showing the first")
+    assert lines[-1].endswith("of 10000 rows]")
+
+
+def test_numpy_values():
+    np = pytest.importorskip("numpy")
+    assert encode_output(np.int64(3)) == "3"
+    assert encode_output(np.arange(4).reshape(2, 2)) == "[[0,1],[2,3]]"
+
+    text = encode_output(np.arange(100_000), 300)
+    assert len(text) <= 300
+    assert text.startswith("[0,1,")
+    assert "99999]" in text
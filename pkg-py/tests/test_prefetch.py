@@ -0,0 +1,108 @@
+import asyncio
+
+from shinyrealtime._prefetch import PartialJSONObject, Prefetcher, prefetched
+from shinyrealtime._tools import tool_options
+
+
+def test_partial_json_reports_members_as_they_complete():
+    parser = PartialJSONObject()
+    assert parser.feed('{"city": "Bos') == {}
+    assert parser.feed('ton", "days": 1') == {"city": "Boston"}
+    # 1 could still become 10
+    assert parser.feed("0") == {}
+    assert parser.feed(', "units": {"temp": "F"') == {"days": 10}
+    assert parser.feed(', "wind": "mph"}, "raw": tr') == {
+        "units": {"temp": "F", "wind": "mph"}
+    }
+    assert parser.feed("ue}") == {"raw": True}
+    assert parser.values == {
+        "city": "Boston",
+        "days": 10,
+        "units": {"temp": "F", "wind": "mph"},
+        "raw": True,
+    }
+
+
+def test_partial_json_handles_escapes_split_across_chunks():
+    parser = PartialJSONObject()
+    for chunk in ['{"q', '": "a \\', '"quoted\\" ', 'word"}']:
+        parser.feed(chunk)
+    assert parser.values == {"q": 'a "quoted" word'}
+
+
+started = []
+
+
+async def load_city(city):
+    started.append(city)
+    await asyncio.sleep(0.01)
+    return f"data for {city}"
+
+
+@tool_options(prefetch=load_city)
+async def forecast(city: str, days: int):
+    return prefetched() or "cold"
+
+
+def stream_call(prefetcher, arguments, chunk_size=4):
+    prefetcher.item_added(
+        {
+            "type": "response.output_item.added",
+            "response_id": "resp_1",
+            "item": {"type": "function_call", "id": "item_1", "name": "forecast"},
+        }
+    )
+    for i in range(0, len(arguments), chunk_size):
+        prefetcher.delta(
+            {"item_id": "item_1", "delta": arguments[i : i + chunk_size]}
+        )
+    done = {"item_id": "item_1", "call_id": "call_1", "name": "forecast"}
+    prefetcher.claim(done)
+    return done
+
+
+def test_prefetch_starts_early_and_is_reused():
+    async def main():
+        started.clear()
+        prefetcher = Prefetcher({"forecast": forecast})
+        assert prefetcher.enabled
+
+        prefetcher.item_added(
+            {
+                "response_id": "resp_1",
+                "item": {"type": "function_call", "id": "item_1", "name": "forecast"},
+            }
+        )
+        prefetcher.delta({"item_id": "item_1", "delta": '{"city": "Oslo", '})
+        # Started before the rest of the arguments arrive
+        await asyncio.sleep(0)
+        assert started == ["Oslo"]
+        prefetcher.delta({"item_id": "item_1", "delta": '"days": 3}'})
+        done = {"item_id": "item_1", "call_id": "call_1", "name": "forecast"}
+        prefetcher.claim(done)
+
+        token = await prefetcher.take(done, {"city": "Oslo", "days": 3})
+        try:
+            return await forecast(city="Oslo", days=3)
+        finally:
+            prefetcher.reset(token)
+
+    assert asyncio.run(main()) == "data for Oslo"
+    assert prefetched() is None
+
+
+def test_prefetch_is_discarded_when_arguments_change():
+    async def main():
+        prefetcher = Prefetcher({"forecast": forecast})
+        done = stream_call(prefetcher, '{"city": "Oslo", "days": 3}')
+        assert await prefetcher.take(done, {"city": "Bergen", "days": 3}) is None
+        return await forecast(city="Bergen", days=3)
+
+    assert asyncio.run(main()) == "cold"
+
+
+def test_tools_without_hooks_are_ignored():
+    async def plain(city: str):
+        return city
+
+    assert not Prefetcher({"plain": plain}).enabled
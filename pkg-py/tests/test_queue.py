@@ -0,0 +1,73 @@
+import asyncio
+
+import pytest
+
+from shinyrealtime._queue import EventQueue
+
+
+def delta(text, item_id="item_1"):
+    return {
+        "type": "response.output_audio_transcript.delta",
+        "item_id": item_id,
+        "content_index": 0,
+        "delta": text,
+    }
+
+
+def drain(queue):
+    async def go():
+        return [(await queue.get())[:2] for _ in range(queue.depth())]
+
+    return asyncio.run(go())
+
+
+def test_consecutive_deltas_for_the_same_item_are_coalesced():
+    queue = EventQueue(10)
+    for text in ("Hel", "lo", " there"):
+        queue.put(delta(text)["type"], delta(text), 0.0)
+    queue.put(delta("x", "item_2")["type"], delta("x", "item_2"), 0.0)
+
+    events = drain(queue)
+    assert [event["delta"] for _, event in events] == ["Hello there", "x"]
+    assert queue.stats()["coalesced"] == 2
+
+
+def test_full_queue_drops_oldest_but_keeps_protected_events():
+    queue = EventQueue(2)
+    queue.put("response.done", {"type": "response.done"}, 0.0)
+    queue.put("conversation.item.created", {"n": 1}, 0.0)
+    queue.put("conversation.item.created", {"n": 2}, 0.0)
+    queue.put("response.done", {"type": "response.done"}, 0.0)
+
+    events = drain(queue)
+    assert [event_type for event_type, _ in events] == [
+        "response.done",
+        "response.done",
+    ]
+    stats = queue.stats()
+    assert stats["dropped"] == 2
+    assert stats["dropped_by_type"] == {"conversation.item.created": 2}
+    assert stats["max_depth"] == 2
+
+
+def test_custom_policies_override_defaults():
+    queue = EventQueue(1, {"conversation.*": "keep"})
+    assert queue.policy("conversation.item.created") == "keep"
+    assert queue.policy("response.text.delta") == "coalesce"
+    assert queue.policy("response.done") == "keep"
+    assert queue.policy("session.updated") == "drop_oldest"
+
+    with pytest.raises(ValueError):
+        EventQueue(1, {"*": "ignore"})
+
+
+def test_get_waits_for_an_event():
+    async def go():
+        queue = EventQueue(4)
+        getter = asyncio.create_task(queue.get())
+        await asyncio.sleep(0)
+        assert not getter.done()
+        queue.put("response.done", {"type": "response.done"}, 1.5)
+        return await getter
+
+    assert asyncio.run(go()) == ("response.done", {"type": "response.done"}, 1.5)
@@ -0,0 +1,114 @@
+import asyncio
+import json
+import time
+
+import pytest
+from aiohttp import web
+
+from shinyrealtime._secrets import (
+    ClientSecretPool,
+    get_client_secret_pool,
+    hold_http_session,
+    http_session,
+    mint_client_secret,
+)
+
+SECRETS_PATH = "/v1/realtime/client_secrets"
+BODY = json.dumps({"session": {"type": "realtime"}}).encode()
+
+
+def secrets_routes(expires_in=600):
+    """Routes for a stand-in client secrets endpoint, and the requests it got."""
+    requests = []
+
+    async def handler(request):
+        requests.append(
+            (request.headers["Authorization"], json.loads(await request.read()))
+        )
+        if request.headers["Authorization"] != "Bearer sk-test":
+            return web.json_response({"error": {"message": "bad key"}}, status=401)
+        return web.json_response(
+            {"value": f"ek_{len(requests)}", "expires_at": time.time() + expires_in}
+        )
+
+    return [web.post(SECRETS_PATH, handler)], requests
+
+
+def test_mint_client_secret_posts_body(stand_in):
+    routes, requests = secrets_routes()
+
+    async def main():
+        async with stand_in(routes) as base_url:
+            secret = await mint_client_secret("sk-test", BODY, base_url + SECRETS_PATH)
+        return secret, requests
+
+    secret, requests = asyncio.run(main())
+    assert secret["value"] == "ek_1"
+    assert requests == [("Bearer sk-test", {"session": {"type": "realtime"}})]
+
+
+def test_mint_client_secret_reports_api_errors(stand_in):
+    routes, _ = secrets_routes()
+
+    async def main():
+        async with stand_in(routes) as base_url:
+            await mint_client_secret("sk-wrong", BODY, base_url + SECRETS_PATH)
+
+    with pytest.raises(ValueError, match="bad key"):
+        asyncio.run(main())
+
+
+def test_pool_hands_out_pre_minted_secrets(stand_in):
+    routes, requests = secrets_routes()
+
+    async def main():
+        async with stand_in(routes) as base_url:
+            pool = ClientSecretPool("sk-test", BODY, base_url + SECRETS_PATH, size=2)
+            first = await pool.get()  # empty pool: minted on demand
+            await pool._refill_task
+            available = pool.available()
+            second = await pool.get()
+            await pool._refill_task
+        return first, available, second, len(requests)
+
+    first, available, second, n_requests = asyncio.run(main())
+    assert first["value"] == "ek_1"
+    assert available == 2
+    assert second["value"] == "ek_2"
+    assert n_requests == 4
+
+
+def test_pool_discards_expiring_secrets(stand_in):
+    routes, _ = secrets_routes(expires_in=30)
+
+    async def main():
+        async with stand_in(routes) as base_url:
+            url = base_url + SECRETS_PATH
+            pool = ClientSecretPool("sk-test", BODY, url, size=1, min_ttl=60)
+            await pool.get()
+            await pool._refill_task
+            return pool.available()
+
+    assert asyncio.run(main()) == 0
+
+
+def test_pools_are_shared_per_config():
+    assert get_client_secret_pool("sk", BODY, "http://x") is get_client_secret_pool(
+        "sk", BODY, "http://x"
+    )
+    assert get_client_secret_pool("sk", BODY, "http://x") is not (
+        get_client_secret_pool("sk", b"{}", "http://x")
+    )
+
+
+def test_http_session_closes_when_the_last_holder_releases():
+    async def main():
+        first, second = hold_http_session(), hold_http_session()
+        client = http_session()
+        await first()
+        await first()  # releasing twice only counts once
+        still_open = not client.closed
+        await second()
+        return still_open, client.closed
+
+    assert asyncio.run(main()) == (True, True)
@@ -0,0 +1,86 @@
+import gc
+import json
+import weakref
+
+from shinyrealtime._realtime import _session_config_body, _tool_schema
+
+
+def get_weather(city: str):
+    """Get the weather for a city."""
+
+
+def test_session_config_body_is_memoized():
+    args = ((get_weather,), "gpt-realtime", "marin", 1.0, "Be brief.", "{}")
+    body = _session_config_body(*args)
+    assert _session_config_body(*args) is body
+
+    session = json.loads(body)["session"]
+    assert session["instructions"] == "Be brief."
+    assert session["tools"] == [_tool_schema(get_weather)]
+    assert session["tools"][0]["type"] == "function"
+    assert session["tools"][0]["name"] == "get_weather"
+
+
+def test_session_config_body_merges_kwargs():
+    body = _session_config_body((), "gpt-realtime", "marin", 1.0, "", '{"x": 1}')
+    assert json.loads(body)["x"] == 1
+
+
+def test_push_to_talk_turns_off_turn_detection():
+    args = ((), "gpt-realtime", "marin", 1.0, "", "{}")
+    vad = json.loads(_session_config_body(*args))["session"]["audio"]["input"]
+    assert vad["turn_detection"] == {"type": "semantic_vad"}
+
+    ptt = json.loads(_session_config_body(*args, True))["session"]["audio"]["input"]
+    assert ptt == {"turn_detection": None}
+
+
+def make_tool(session_id: int):
+    def lookup_order(order_id: str):
+        """Look up an order for this session's user."""
+        return session_id, order_id
+
+    return lookup_order
+
+
+def test_per_session_closures_share_the_cache():
+    first, second = make_tool(1), make_tool(2)
+    assert first is not second
+
+    assert _tool_schema(second) is _tool_schema(first)
+    args = ("gpt-realtime", "marin", 1.0, "", "{}")
+    body = _session_config_body((first,), *args)
+    assert _session_config_body((second,), *args) is body
+    assert json.loads(body)["session"]["tools"][0]["name"] == "lookup_order"
+
+
+def make_lookup(name: str, data: list):
+    def lookup(city: str):
+        """Look up something about a city."""
+        return data
+
+    lookup.__name__ = name
+    return lookup
+
+
+def test_factory_made_tools_get_their_own_schemas():
+    get_weather, get_time = make_lookup("get_weather", []), make_lookup("get_time", [])
+    assert get_weather.__qualname__ == get_time.__qualname__
+
+    assert _tool_schema(get_weather)["name"] == "get_weather"
+    assert _tool_schema(get_time)["name"] == "get_time"
+
+    args = ("gpt-realtime", "marin", 1.0, "", "{}")
+    body = json.loads(_session_config_body((get_weather, get_time), *args))
+    names = [tool["name"] for tool in body["session"]["tools"]]
+    assert names == ["get_weather", "get_time"]
+
+
+def test_cached_schemas_do_not_keep_tools_alive():
+    tool = make_lookup("get_forecast", [1, 2, 3])
+    _session_config_body((tool,), "gpt-realtime", "marin", 1.0, "", "{}")
+
+    captured = weakref.ref(tool)
+    del tool
+    gc.collect()
+    assert captured() is None
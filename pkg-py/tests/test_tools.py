@@ -0,0 +1,429 @@
+import asyncio
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from shinyrealtime._tools import (
+    ToolCache,
+    ToolCallRunner,
+    get_tool_options,
+    invoke_tool,
+    resolve_tool_cache,
+    tool_options,
+)
+
+
+def current_thread_name(**kwargs):
+    return threading.current_thread().name
+
+
+def test_inline_runs_on_event_loop_thread():
+    assert asyncio.run(invoke_tool(current_thread_name, {})) == (
+        threading.current_thread().name
+    )
+
+
+def test_thread_policy_runs_off_event_loop():
+    name = asyncio.run(invoke_tool(current_thread_name, {}, "thread"))
+    assert name.startswith("shinyrealtime-tool")
+
+
+def test_custom_executor():
+    with ThreadPoolExecutor(thread_name_prefix="custom") as pool:
+        name = asyncio.run(invoke_tool(current_thread_name, {}, pool))
+    assert name.startswith("custom")
+
+
+def test_tool_options_override_server_policy():
+    @tool_options(executor="thread")
+    def tool():
+        return threading.current_thread().name
+
+    assert get_tool_options(tool).executor == "thread"
+    name = asyncio.run(invoke_tool(tool, {}, "inline"))
+    assert name.startswith("shinyrealtime-tool")
+
+
+def test_coroutine_tools_are_awaited_with_arguments():
+    async def add(a, b):
+        return a + b
+
+    assert asyncio.run(invoke_tool(add, {"a": 1, "b": 2}, "thread")) == 3
+
+
+def test_unknown_policy_raises():
+    with pytest.raises(ValueError):
+        asyncio.run(invoke_tool(current_thread_name, {}, "gpu"))
+
+
+def test_runner_collects_calls_concurrently_in_output_order():
+    running = []
+    max_running = []
+
+    async def run_call(event):
+        running.append(event["call_id"])
+        max_running.append(len(running))
+        await asyncio.sleep(0.01)
+        running.remove(event["call_id"])
+        return event["call_id"].upper()
+
+    async def main():
+        runner = ToolCallRunner(run_call, max_concurrency=2)
+        for index, call_id in [(2, "c"), (0, "a"), (1, "b")]:
+            runner.start(
+                {"response_id": "resp_1", "output_index": index, "call_id": call_id}
+            )
+        assert runner.has_calls("resp_1")
+        results = await runner.collect("resp_1")
+        assert not runner.has_calls("resp_1")
+        return results
+
+    assert asyncio.run(main()) == [("a", "A"), ("b", "B"), ("c", "C")]
+    assert max(max_running) == 2
+
+
+def test_runner_cancels_interrupted_responses():
+    async def run_call(event):
+        if event["call_id"] == "slow":
+            await asyncio.sleep(10)
+        return "done"
+
+    async def main():
+        runner = ToolCallRunner(run_call)
+        runner.start({"response_id": "resp_1", "output_index": 0, "call_id": "fast"})
+        runner.start({"response_id": "resp_1", "output_index": 1, "call_id": "slow"})
+        runner.start({"response_id": "resp_2", "output_index": 0, "call_id": "other"})
+        await asyncio.sleep(0)
+        assert runner.cancel("resp_unknown") == 0
+        assert not runner.interrupted("resp_unknown")
+
+        assert runner.cancel("resp_1") == 2
+        results = await runner.collect("resp_1")
+        assert runner.interrupted("resp_1")
+        assert not runner.interrupted("resp_1")
+
+        assert await runner.collect("resp_2") == [("other", "done")]
+        assert not runner.interrupted("resp_2")
+        return results
+
+    fast, slow = asyncio.run(main())
+    assert slow == ("slow", ToolCallRunner.CANCELLED)
+    # Cancelled before it got to run, or finished; either way it's reported
+    assert fast[1] in ("done", ToolCallRunner.CANCELLED)
+
+
+def test_cancel_running_covers_calls_being_collected():
+    async def run_call(event):
+        await asyncio.sleep(10)
+
+    async def main():
+        runner = ToolCallRunner(run_call)
+        runner.start({"response_id": None, "call_id": "a"})
+        collecting = asyncio.create_task(runner.collect(None))
+        await asyncio.sleep(0)
+        assert runner.cancel_running() == 1
+        return await collecting, runner.interrupted(None)
+
+    assert asyncio.run(main()) == ([("a", ToolCallRunner.CANCELLED)], True)
+
+
+def tool_server(sent, tools, handlers=(), **kwargs):
+    """
+    A server function that records the events sent to the model in `sent`,
+    with `on()` handlers given as `(event_type, handler)` pairs.
+    """
+    from shinyrealtime import realtime_server
+
+    def server(input, output, session):
+        send_custom_message = session.send_custom_message
+
+        async def record(type, message):
+            if type == "realtime_send":
+                sent.extend(json.loads(payload) for payload in message)
+            await send_custom_message(type, message)
+
+        session.send_custom_message = record
+        controls = realtime_server("rt", tools=tools, **kwargs)
+        for event_type, handler in handlers:
+            controls.on(event_type)(handler)
+
+    return server
+
+
+def function_call(response_id, call_id, name, **args):
+    return {
+        "type": "response.function_call_arguments.done",
+        "response_id": response_id,
+        "output_index": int(call_id.rsplit("_", 1)[-1]),
+        "call_id": call_id,
+        "name": name,
+        "arguments": json.dumps(args),
+    }
+
+
+async def send_events(server, *events):
+    await server.make_scope("rt").set_inputs(key_event=json.dumps(list(events)))
+
+
+async def wait_for(condition, timeout=2.0):
+    for _ in range(int(timeout / 0.01)):
+        if condition():
+            return
+        await asyncio.sleep(0.01)
+
+
+def test_server_sends_all_outputs_then_one_response_create(monkeypatch):
+    pytest.importorskip("shiny")
+    from shiny.testserver import test_server_async
+
+    monkeypatch.delenv("OPENAI_API_KEY", raising=False)
+
+    async def get_weather(city: str) -> str:
+        """Gets the weather for a city."""
+        await asyncio.sleep(0.01)
+        return f"Sunny in {city}"
+
+    def get_time(city: str) -> str:
+        """Gets the time in a city."""
+        return f"Noon in {city}"
+
+    sent = []
+
+    async def go():
+        server_fn = tool_server(sent, [get_weather, get_time])
+        async with test_server_async(server_fn) as server:
+            await send_events(
+                server,
+                function_call("resp_1", "call_0", "get_weather", city="Oslo"),
+                function_call("resp_1", "call_1", "get_time", city="Lima"),
+                function_call("resp_1", "call_2", "get_weather", city="Pune"),
+            )
+            # The calls finish, but nothing is sent before response.done
+            await asyncio.sleep(0.1)
+            assert sent == []
+
+            await send_events(
+                server, {"type": "response.done", "response": {"id": "resp_1"}}
+            )
+            await wait_for(lambda: sent)
+            await asyncio.sleep(0.1)
+
+    asyncio.run(go())
+    assert [event["type"] for event in sent] == [
+        "conversation.item.create",
+        "conversation.item.create",
+        "conversation.item.create",
+        "response.create",
+    ]
+    assert [(e["item"]["call_id"], e["item"]["output"]) for e in sent[:3]] == [
+        ("call_0", "Sunny in Oslo"),
+        ("call_1", "Noon in Lima"),
+        ("call_2", "Sunny in Pune"),
+    ]
+
+
+async def slow_lookup(city: str) -> str:
+    """Looks something up, slowly."""
+    await asyncio.sleep(10)
+    return city
+
+
+def test_server_reports_tool_timeouts(monkeypatch):
+    pytest.importorskip("shiny")
+    from shiny.testserver import test_server_async
+
+    monkeypatch.delenv("OPENAI_API_KEY", raising=False)
+    sent = []
+
+    async def go():
+        server_fn = tool_server(sent, [slow_lookup], tool_timeout=0.05)
+        async with test_server_async(server_fn) as server:
+            await send_events(
+                server,
+                function_call("resp_1", "call_0", "slow_lookup", city="Oslo"),
+                {"type": "response.done", "response": {"id": "resp_1"}},
+            )
+            await wait_for(lambda: sent)
+            await asyncio.sleep(0.05)
+
+    asyncio.run(go())
+    assert [event["type"] for event in sent] == [
+        "conversation.item.create",
+        "response.create",
+    ]
+    assert sent[0]["item"]["output"] == (
+        "Error: slow_lookup timed out after 0.05 seconds"
+    )
+
+
+@pytest.mark.parametrize(
+    "interruption",
+    [
+        {"type": "input_audio_buffer.speech_started"},
+        {"type": "response.cancelled", "response_id": "resp_1"},
+    ],
+)
+def test_server_cancels_tools_on_barge_in(monkeypatch, interruption):
+    pytest.importorskip("shiny")
+    from shiny.testserver import test_server_async
+
+    monkeypatch.delenv("OPENAI_API_KEY", raising=False)
+    sent = []
+
+    async def go():
+        async with test_server_async(tool_server(sent, [slow_lookup])) as server:
+            await send_events(
+                server, function_call("resp_1", "call_0", "slow_lookup", city="Oslo")
+            )
+            await asyncio.sleep(0.05)
+            await send_events(
+                server,
+                interruption,
+                {
+                    "type": "response.done",
+                    "response": {"id": "resp_1", "status": "cancelled"},
+                },
+            )
+            await wait_for(lambda: sent)
+            await asyncio.sleep(0.1)
+
+    asyncio.run(go())
+    # The model is told the call was cancelled, but isn't asked to respond
+    assert [event["type"] for event in sent] == ["conversation.item.create"]
+    assert sent[0]["item"]["output"].startswith("Cancelled: ")
+
+
+def weather(city):
+    return {"city": city}
+
+
+def test_cache_key_ignores_argument_order():
+    assert ToolCache.key(weather, {"a": 1, "b": 2}) == ToolCache.key(
+        weather, {"b": 2, "a": 1}
+    )
+
+
+def test_cache_keys_tell_factory_made_tools_apart():
+    def make_tool(name, reply):
+        def tool(city):
+            return reply
+
+        tool.__name__ = name
+        return tool
+
+    get_weather = make_tool("get_weather", "Sunny")
+    get_time = make_tool("get_time", "Noon")
+    assert get_weather.__qualname__ == get_time.__qualname__
+    assert ToolCache.key(get_weather, {"city": "Oslo"}) != ToolCache.key(
+        get_time, {"city": "Oslo"}
+    )
+
+
+def test_cache_hits_misses_and_lru_eviction():
+    cache = ToolCache(max_size=2)
+    boston = ToolCache.key(weather, {"city": "Boston"})
+    chicago = ToolCache.key(weather, {"city": "Chicago"})
+    denver = ToolCache.key(weather, {"city": "Denver"})
+
+    assert cache.get(boston) is None
+    cache.set(boston, "B")
+    cache.set(chicago, "C")
+    assert cache.get(boston) == "B"
+
+    # Chicago is now the least recently used entry
+    cache.set(denver, "D")
+    assert cache.get(chicago) is None
+    assert cache.stats() == {"hits": 1, "misses": 2, "size": 2}
+
+
+def test_cache_entries_expire():
+    cache = ToolCache(ttl=60)
+    key = ToolCache.key(weather, {"city": "Boston"})
+    cache.set(key, "stale", ttl=-1)
+    assert cache.get(key) is None
+    cache.set(key, "fresh")
+    assert cache.get(key) == "fresh"
+
+
+def test_tool_options_merge_across_decorators():
+    @tool_options(cache_ttl=30, timeout=5)
+    @tool_options(executor="thread")
+    def tool():
+        pass
+
+    options = get_tool_options(tool)
+    assert options.executor == "thread"
+    assert options.cache_ttl == 30
+    assert options.timeout == 5
+
+
+def test_resolve_tool_cache_scopes():
+    assert resolve_tool_cache(None) is None
+    assert resolve_tool_cache("session") is not resolve_tool_cache("session")
+    assert resolve_tool_cache("process") is resolve_tool_cache("process")
+
+
+def test_async_generator_tools_report_updates():
+    async def countdown(n):
+        for i in range(n, 0, -1):
+            yield f"{i} left"
+        yield "done"
+
+    updates = []
+
+    async def on_update(value, index):
+        updates.append((index, value))
+
+    result = asyncio.run(invoke_tool(countdown, {"n": 2}, on_update=on_update))
+    assert result == "done"
+    assert updates == [(0, "2 left"), (1, "1 left"), (2, "done")]
+
+
+def test_async_generator_tools_are_capped():
+    closed = []
+
+    async def runaway():
+        try:
+            i = 0
+            while True:
+                yield i
+                i += 1
+        finally:
+            closed.append(True)
+
+    assert asyncio.run(invoke_tool(runaway, {}, max_updates=5)) == 4
+    assert closed == [True]
+
+
+def test_failing_progress_handler_does_not_fail_the_tool(monkeypatch, caplog):
+    pytest.importorskip("shiny")
+    from shiny.testserver import test_server_async
+
+    monkeypatch.delenv("OPENAI_API_KEY", raising=False)
+
+    async def count_to(n: int):
+        """Counts to n, reporting each number."""
+        for i in range(1, n + 1):
+            yield i
+
+    async def broken(event):
+        raise RuntimeError("progress handler failed")
+
+    sent = []
+
+    async def go():
+        server_fn = tool_server(sent, [count_to], [("tool.progress", broken)])
+        async with test_server_async(server_fn) as server:
+            await send_events(
+                server,
+                function_call("resp_1", "call_0", "count_to", n=3),
+                {"type": "response.done", "response": {"id": "resp_1"}},
+            )
+            await wait_for(lambda: sent)
+
+    asyncio.run(go())
+    assert sent[0]["item"]["output"] == "3"
+    assert sent[-1]["type"] == "response.create"
+    assert "Error in tool.progress handler: progress handler failed" in caplog.text
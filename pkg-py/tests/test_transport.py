@@ -0,0 +1,237 @@
+import asyncio
+import json
+
+from aiohttp import WSMsgType, web
+
+from shinyrealtime._transport import RealtimeWebSocket, event_to_json
+
+REALTIME_PATH = "/v1/realtime"
+
+
+def realtime_routes():
+    """
+    Routes for a mock of the realtime WebSocket endpoint, the events it
+    received, and the (query, Authorization header) of each connection.
+    """
+    received = []
+    connections = []
+
+    async def handler(request):
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        connections.append((dict(request.query), request.headers["Authorization"]))
+        await ws.send_str(json.dumps({"type": "session.created"}))
+        async for msg in ws:
+            if msg.type == WSMsgType.TEXT:
+                received.append(json.loads(msg.data))
+                await ws.send_str(json.dumps({"type": "ack", "n": len(received)}))
+        return ws
+
+    return [web.get(REALTIME_PATH, handler)], received, connections
+
+
+def test_websocket_round_trip_with_queued_sends(stand_in):
+    routes, received, connections = realtime_routes()
+
+    async def main():
+        messages = []
+        done = asyncio.Event()
+
+        async def on_message(raw):
+            messages.append(json.loads(raw)["type"])
+            if len(messages) == 3:
+                done.set()
+
+        async with stand_in(routes) as base_url:
+            url = base_url.replace("http", "ws") + REALTIME_PATH
+            socket = RealtimeWebSocket("sk-test", on_message, url)
+            try:
+                # Sent before connecting, so it's queued
+                await socket.send({"type": "response.create", "response": {}})
+                await socket.connect(call_id="rtc_123")
+                await socket.send({"type": "input_audio_buffer.clear"})
+                await asyncio.wait_for(done.wait(), 5)
+            finally:
+                await socket.close()
+        return messages
+
+    messages = asyncio.run(main())
+    assert connections == [({"call_id": "rtc_123"}, "Bearer sk-test")]
+    assert received == [
+        {"type": "response.create", "response": {}},
+        {"type": "input_audio_buffer.clear"},
+    ]
+    assert messages == ["session.created", "ack", "ack"]
+
+
+def test_read_errors_report_the_connection_lost():
+    lost = []
+
+    class BrokenSocket:
+        def __aiter__(self):
+            return self
+
+        async def __anext__(self):
+            raise ConnectionResetError("reset by peer")
+
+    async def on_message(raw):
+        pass
+
+    async def on_lost():
+        lost.append(True)
+
+    socket = RealtimeWebSocket("sk-test", on_message, on_lost=on_lost)
+    asyncio.run(socket._read_loop(BrokenSocket()))
+    assert lost == [True]
+
+
+def test_server_falls_back_to_the_data_channel(stand_in, monkeypatch):
+    from shiny.testserver import test_server_async
+
+    from shinyrealtime import _realtime, realtime_server
+
+    monkeypatch.setattr(_realtime, "_SOCKET_RETRY_DELAYS", (0.0, 0.0))
+    attempts = []
+
+    async def refuse(request):
+        attempts.append(request.query["call_id"])
+        return web.Response(status=503)
+
+    async def mint(request):
+        return web.json_response({"value": "ek_test", "expires_at": 2**31})
+
+    routes = [web.get(REALTIME_PATH, refuse), web.post("/client_secrets", mint)]
+    messages = []
+    controls = {}
+
+    def server_fn(base_url):
+        def server(input, output, session):
+            send_custom_message = session.send_custom_message
+
+            async def record(type, message):
+                messages.append((type, message))
+                await send_custom_message(type, message)
+
+            session.send_custom_message = record
+            controls["rt"] = realtime_server(
+                "rt",
+                api_key="sk-test",
+                client_secrets_url=base_url + "/client_secrets",
+                transport="websocket",
+                realtime_url=base_url.replace("http", "ws") + REALTIME_PATH,
+            )
+
+        return server
+
+    def subscribed():
+        return [m["types"] for kind, m in messages if kind == "realtime_subscribe"]
+
+    async def main():
+        async with stand_in(routes) as base_url:
+            async with test_server_async(server_fn(base_url)) as server:
+                # Queued for the socket, which never connects
+                await controls["rt"].send({"type": "input_audio_buffer.clear"})
+                await server.make_scope("rt").set_inputs(key_call_id="rtc_123")
+                for _ in range(100):
+                    if any(kind == "realtime_send" for kind, _ in messages):
+                        break
+                    await asyncio.sleep(0.02)
+
+    asyncio.run(main())
+    assert attempts == ["rtc_123"] * 3
+    # The client keeps forwarding events, and gets the queued one
+    assert subscribed() and all("response.done" in types for types in subscribed())
+    assert ("realtime_send", ['{"type":"input_audio_buffer.clear"}']) in messages
+
+
+def test_client_forwards_events_until_the_socket_attaches(stand_in):
+    from shiny.testserver import test_server_async
+
+    from shinyrealtime import realtime_server
+
+    attach = asyncio.Event()
+    handed_over = asyncio.Event()
+
+    async def realtime(request):
+        await attach.wait()
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        # The client forwards this one too, until it learns about the socket
+        await ws.send_str(json.dumps({"type": "test.a", "event_id": "evt_2"}))
+        await handed_over.wait()
+        await ws.send_str(json.dumps({"type": "test.a", "event_id": "evt_4"}))
+        async for msg in ws:
+            pass
+        return ws
+
+    async def mint(request):
+        return web.json_response({"value": "ek_test", "expires_at": 2**31})
+
+    routes = [web.get(REALTIME_PATH, realtime), web.post("/client_secrets", mint)]
+    subscribed = []
+    received = []
+
+    def server_fn(base_url):
+        def server(input, output, session):
+            send_custom_message = session.send_custom_message
+
+            async def record(type, message):
+                if type == "realtime_subscribe":
+                    subscribed.append(message["types"])
+                await send_custom_message(type, message)
+
+            session.send_custom_message = record
+            controls = realtime_server(
+                "rt",
+                api_key="sk-test",
+                client_secrets_url=base_url + "/client_secrets",
+                transport="websocket",
+                realtime_url=base_url.replace("http", "ws") + REALTIME_PATH,
+            )
+
+            @controls.on("test.*")
+            async def handler(event):
+                received.append(event["event_id"])
+
+        return server
+
+    async def wait_for(condition):
+        for _ in range(100):
+            if condition():
+                return
+            await asyncio.sleep(0.02)
+
+    async def main():
+        async with stand_in(routes) as base_url:
+            async with test_server_async(server_fn(base_url)) as server:
+                rt = server.make_scope("rt")
+
+                async def forward(event_id):
+                    event = {"type": "test.a", "event_id": event_id}
+                    await rt.set_inputs(key_event=json.dumps(event))
+
+                await rt.set_inputs(key_call_id="rtc_123")
+                await asyncio.sleep(0.05)
+                # Not attached yet: the client forwards events
+                assert subscribed and "test.*" in subscribed[-1]
+                await forward("evt_1")
+
+                attach.set()
+                await wait_for(lambda: subscribed[-1] == [])
+                await wait_for(lambda: "evt_2" in received)
+                # Forwarded during the handover: duplicates are dropped
+                await forward("evt_2")
+                await forward("evt_3")
+                handed_over.set()
+                await wait_for(lambda: "evt_4" in received)
+
+    asyncio.run(main())
+    assert received == ["evt_1", "evt_2", "evt_3", "evt_4"]
+
+
+def test_event_to_json_accepts_pydantic_models():
+    import openai.types.beta.realtime as oair
+
+    event = oair.ResponseCreateEvent(type="response.create")
+    assert json.loads(event_to_json(event)) == {"type": "response.create"}
+    assert json.loads(event_to_json({"type": "x"})) == {"type": "x"}
@@ -0,0 +1,114 @@
+import asyncio
+import json
+import sys
+
+import pytest
+
+from shinyrealtime._usage import (
+    SessionUsage,
+    UsageLedger,
+    prices_for,
+    register_prices,
+    tokens_from_usage,
+)
+
+USAGE = {
+    "input_token_details": {
+        "text_tokens": 1_000,
+        "audio_tokens": 2_000,
+        "cached_tokens_details": {"text_tokens": 400, "audio_tokens": 0},
+    },
+    "output_token_details": {"text_tokens": 100, "audio_tokens": 500},
+}
+
+
+def test_cached_tokens_are_not_double_counted():
+    assert tokens_from_usage(USAGE) == [600, 2_000, 0, 400, 0, 0, 100, 500]
+
+
+def test_prices_by_model_pattern():
+    assert prices_for("gpt-realtime")["output_audio"] == 64
+    assert prices_for("gpt-realtime-mini-2025-10-06")["output_audio"] == 20
+    assert prices_for("unknown-model") == {}
+    with pytest.raises(ValueError):
+        register_prices("my-model", {"input_txt": 1})
+
+
+def test_session_usage_feeds_the_ledger():
+    ledger = UsageLedger()
+    usage = SessionUsage("gpt-realtime", ledger=ledger)
+    assert usage.record(
+        {
+            "usage": USAGE,
+            "output": [
+                {"type": "function_call", "name": "plot"},
+                {"type": "function_call", "name": "query"},
+            ],
+        }
+    )
+    expected = (600 * 4 + 2_000 * 32 + 400 * 0.4 + 100 * 16 + 500 * 64) / 1e6
+    assert usage.cost() == pytest.approx(expected)
+    assert usage.record({"usage": USAGE, "output": []})
+    assert not usage.record({"output": []})
+
+    assert usage.cost() == pytest.approx(2 * expected)
+    assert usage.tokens()["input_text_cached"] == 800
+    assert usage.responses() == 2
+
+    by_tool = ledger.rollup("tool")
+    assert set(by_tool) == {"plot", "query", ""}
+    assert by_tool["plot"]["cost"] == pytest.approx(expected / 2)
+    assert by_tool[""]["responses"] == 1
+    assert ledger.rollup("model")["gpt-realtime"]["output_audio"] == 1_000
+    assert ledger.total()["cost"] == pytest.approx(2 * expected)
+
+
+@pytest.mark.parametrize("use_numpy", [False, True])
+def test_ledger_rollups_by_window(monkeypatch, use_numpy):
+    if use_numpy:
+        pytest.importorskip("numpy")
+    else:
+        monkeypatch.delitem(sys.modules, "numpy", raising=False)
+
+    ledger = UsageLedger(bucket_seconds=60, retention=600)
+    for minute in range(5):
+        ledger.record("m", "", [1] * 8, cost=1.0, at=minute * 60 + 1)
+
+    windows = ledger.rollup("window", window=120)
+    assert {start: row["cost"] for start, row in windows.items()} == {
+        0: 2.0,
+        120: 2.0,
+        240: 1.0,
+    }
+    assert ledger.total(since=180)["responses"] == 2
+
+    # Buckets past the retention period are dropped
+    ledger.record("m", "", [1] * 8, cost=1.0, at=20 * 60)
+    assert ledger.total()["responses"] == 1
+
+
+def test_unpriced_usage_still_updates_the_session(monkeypatch):
+    pytest.importorskip("shiny")
+    from shiny import reactive
+    from shiny.testserver import test_server_async
+
+    from shinyrealtime import realtime_server
+
+    monkeypatch.delenv("OPENAI_API_KEY", raising=False)
+    seen = []
+
+    def server(input, output, session):
+        controls = realtime_server("rt", model="my-unpriced-model")
+
+        @reactive.effect
+        def track():
+            seen.append((controls.usage.responses(), controls.usage.cost()))
+
+    async def go():
+        async with test_server_async(server) as test_server:
+            event = {"type": "response.done", "response": {"usage": USAGE}}
+            await test_server.make_scope("rt").set_inputs(key_event=json.dumps(event))
+
+    asyncio.run(go())
+    # Costs nothing, but the usage counts
+    assert seen == [(0, 0.0), (1, 0.0)]
@@ -6,16 +6,22 @@ export class Connection {
   private eventListeners: Map<string, (data: any) => void>;
   private pendingSends: string[] = [];
 
+  // The Realtime API's id for this call, used by the server to attach its
+  // own WebSocket to the call; null if the API didn't report one
+  readonly callId: string | null;
+
   constructor(
     audioElement: HTMLAudioElement,
     peerConnection: RTCPeerConnection,
     dataChannel: RTCDataChannel,
-    micTrack: MediaStreamTrack
+    micTrack: MediaStreamTrack,
+    callId: string | null = null
   ) {
     this.audioEl = audioElement;
     this.pc = peerConnection;
     this.dc = dataChannel;
     this.micTrack = micTrack;
+    this.callId = callId;
     this.eventListeners = new Map();
 
     // Flush any queued sends once the channel opens
@@ -88,9 +94,13 @@ export class Connection {
   }
 
   // Data channel method
+  /**
+   * Send an event over the data channel. Strings are assumed to be
+   * JSON-encoded already (the server pre-serializes the events it sends).
+   */
   send(event: any): void {
     console.log("Sending event:", event);
-    const payload = JSON.stringify(event);
+    const payload = typeof event === "string" ? event : JSON.stringify(event);
     const state = this.dc.readyState;
     if (state === "open") {
       this.dc.send(payload);
@@ -0,0 +1,59 @@
+import { EventFilter } from "./EventFilter";
+
+export interface BatchOptions {
+  // Milliseconds to hold events before forwarding them
+  window: number;
+  // Maximum number of events per batch
+  size: number;
+  // Event types/patterns that are forwarded immediately
+  exclude: string[];
+}
+
+/**
+ * EventBatcher - Coalesces raw data channel messages into batches
+ *
+ * Messages are buffered for up to `window` ms or `size` messages, then passed
+ * to `onFlush` as a single JSON array of the raw (still JSON-encoded)
+ * messages, so the server can decode each one only if it needs to. Messages
+ * whose type matches an `exclude` pattern flush the buffer (including
+ * themselves) immediately, so latency-critical events are never held back and
+ * ordering is preserved.
+ */
+export class EventBatcher {
+  private buffer: string[] = [];
+  private timer: number | null = null;
+  private exclude: EventFilter = new EventFilter();
+
+  constructor(
+    private options: BatchOptions,
+    private onFlush: (data: string) => void
+  ) {
+    this.exclude.setPatterns(options.exclude);
+  }
+
+  public push(data: string, type: string | null): void {
+    this.buffer.push(data);
+
+    if (
+      this.buffer.length >= this.options.size ||
+      (type !== null && this.exclude.accepts(type))
+    ) {
+      this.flush();
+    } else if (this.timer === null) {
+      this.timer = window.setTimeout(() => this.flush(), this.options.window);
+    }
+  }
+
+  public flush(): void {
+    if (this.timer !== null) {
+      clearTimeout(this.timer);
+      this.timer = null;
+    }
+    if (this.buffer.length === 0) {
+      return;
+    }
+    const data = JSON.stringify(this.buffer);
+    this.buffer = [];
+    this.onFlush(data);
+  }
+}
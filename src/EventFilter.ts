@@ -0,0 +1,54 @@
+/**
+ * Extract the `type` field from a raw (JSON-encoded) data channel message, or
+ * null if the message can't be parsed.
+ */
+export function messageType(data: string): string | null {
+  try {
+    const type = JSON.parse(data).type;
+    return typeof type === "string" ? type : null;
+  } catch (err) {
+    return null;
+  }
+}
+
+/**
+ * EventFilter - Decides which realtime events are forwarded to the server
+ *
+ * Patterns follow the same rules as the server-side EventEmitter: an exact
+ * event type, a "prefix.*" wildcard, or "*" for everything. Until the server
+ * sends a pattern list, every event is accepted.
+ */
+export class EventFilter {
+  private acceptAll: boolean = true;
+  private exact: Set<string> = new Set();
+  private prefixes: string[] = [];
+
+  /**
+   * Replace the current patterns. Passing null accepts every event again.
+   */
+  public setPatterns(patterns: string[] | null): void {
+    this.exact = new Set();
+    this.prefixes = [];
+    this.acceptAll = patterns === null;
+
+    (patterns ?? []).forEach((pattern) => {
+      if (pattern === "*") {
+        this.acceptAll = true;
+      } else if (pattern.endsWith(".*")) {
+        // "a.b.*" matches "a.b" itself as well as "a.b.<anything>"
+        const prefix = pattern.slice(0, -2);
+        this.exact.add(prefix);
+        this.prefixes.push(prefix + ".");
+      } else {
+        this.exact.add(pattern);
+      }
+    });
+  }
+
+  public accepts(type: string): boolean {
+    if (this.acceptAll || this.exact.has(type)) {
+      return true;
+    }
+    return this.prefixes.some((prefix) => type.startsWith(prefix));
+  }
+}
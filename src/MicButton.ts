@@ -1,7 +1,9 @@
 /**
  * MicButton - Abstracts microphone button state management
  * 
- * Manages state for mute/unmute and push-to-talk functionality
+ * Manages state for mute/unmute and push-to-talk functionality. With
+ * `pushToTalkOnly`, the mic is only open while the button (or spacebar) is
+ * held down, and clicks don't toggle it.
  */
 export class MicButton {
   // Constants
@@ -18,7 +20,8 @@ export class MicButton {
 
   constructor(
     element: HTMLElement,
-    private onMuteChange: (muted: boolean) => void
+    private onMuteChange: (muted: boolean) => void,
+    private pushToTalkOnly: boolean = false
   ) {
     this.element = element;
 
@@ -91,6 +94,11 @@ export class MicButton {
    * It's the same logic for mouse, touch, and space key.
    */
   private startPress(): void {
+    if (this.pushToTalkOnly) {
+      // Open the mic right away so the start of the turn isn't cut off
+      this.startPushToTalk();
+      return;
+    }
     // Do nothing at first--we don't know if it's a click or hold
     this.holdTimeout = window.setTimeout(() => {
       this.startPushToTalk();
@@ -107,6 +115,11 @@ export class MicButton {
       this.suppressNextClick = false;
     }, 0);
 
+    if (this.pushToTalkOnly) {
+      this.stopPushToTalk();
+      return;
+    }
+
     if (this.holdTimeout) {
       // It was a click
       clearTimeout(this.holdTimeout);
@@ -130,6 +143,10 @@ export class MicButton {
       e.stopImmediatePropagation();
       return;
     }
+    if (this.pushToTalkOnly) {
+      // An open mic would never be committed without turn detection
+      return;
+    }
     this.toggle();
   }
 }
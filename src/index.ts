@@ -1,5 +1,7 @@
 import "./binding";
 import { Connection } from "./Connection";
+import { BatchOptions, EventBatcher } from "./EventBatcher";
+import { EventFilter, messageType } from "./EventFilter";
 import { MicButton } from "./MicButton";
 import "./styles.css";
 
@@ -44,8 +46,72 @@ export async function openConnection(ephemeralKey: string, model: string) {
   };
   await pc.setRemoteDescription(answer);
 
+  // The call's URL (ending in its id) comes back in the Location header
+  const location = sdpResponse.headers.get("Location");
+  const callId = location ? location.split("/").pop() || null : null;
+
   // Create and return the connection instance
-  return new Connection(audioEl, pc, dc, micTrack);
+  return new Connection(audioEl, pc, dc, micTrack, callId);
+}
+
+// Per-output event filters, keyed by output id. The server may send the
+// subscription list before the connection is open, so filters live outside
+// of renderValue.
+const eventFilters = new Map<string, EventFilter>();
+
+function getEventFilter(id: string): EventFilter {
+  let filter = eventFilters.get(id);
+  if (!filter) {
+    filter = new EventFilter();
+    eventFilters.set(id, filter);
+  }
+  return filter;
+}
+
+// Turns shorter than this are treated as accidental taps and discarded; the
+// API also rejects committing less than 100ms of audio
+const MIN_TURN_MS = 200;
+
+/**
+ * Manual turn-taking for push-to-talk, where the session has no turn
+ * detection: the audio buffer is cleared when the user starts talking (so
+ * noise captured between turns isn't sent as input), and committed with a
+ * response request as soon as they stop.
+ */
+class PushToTalkTurns {
+  private responseActive = false;
+  private startedAt = 0;
+
+  constructor(private connection: Connection) {
+    connection.addEventListener("pushToTalk", (data) => {
+      const type = messageType(data);
+      if (type === "response.created") {
+        this.responseActive = true;
+      } else if (type === "response.done") {
+        this.responseActive = false;
+      }
+    });
+  }
+
+  start(): void {
+    if (this.responseActive) {
+      // Talking over the model interrupts it, as it would with turn detection
+      this.connection.send({ type: "response.cancel" });
+      this.connection.send({ type: "output_audio_buffer.clear" });
+      this.responseActive = false;
+    }
+    this.connection.send({ type: "input_audio_buffer.clear" });
+    this.startedAt = Date.now();
+  }
+
+  end(): void {
+    if (Date.now() - this.startedAt < MIN_TURN_MS) {
+      this.connection.send({ type: "input_audio_buffer.clear" });
+      return;
+    }
+    this.connection.send({ type: "input_audio_buffer.commit" });
+    this.connection.send({ type: "response.create" });
+  }
 }
 
 // Custom Shiny output binding for real-time display
@@ -63,6 +129,9 @@ class RealtimeBinding extends Shiny.OutputBinding {
     const parsed = JSON.parse(data);
     const ephemeralKey: string = parsed.value;
     const model: string = parsed.model;
+    const batchOptions: BatchOptions | null = parsed.batch;
+    const transport: string = parsed.transport ?? "webrtc";
+    const pushToTalk: boolean = parsed.push_to_talk ?? false;
 
     // Store connection in element data for cleanup
     let connectionPromise = openConnection(ephemeralKey, model).then((connection) => {
@@ -77,9 +146,17 @@ class RealtimeBinding extends Shiny.OutputBinding {
       const micButtonElement = el.querySelector(
         ".mic-toggle-btn"
       ) as HTMLElement;
+      const turns = pushToTalk ? new PushToTalkTurns(connection) : null;
       const micButton = new MicButton(micButtonElement, (muted: boolean) => {
         // This is our callback when mic state changes
         connection.micMuted = muted;
+        if (turns) {
+          if (muted) {
+            turns.end();
+          } else {
+            turns.start();
+          }
+        }
 
         if (muted) {
           micButtonElement.classList.remove("active", "btn-danger");
@@ -88,16 +165,45 @@ class RealtimeBinding extends Shiny.OutputBinding {
           micButtonElement.classList.remove("btn-secondary");
           micButtonElement.classList.add("active", "btn-danger");
         }
-      });
+      }, pushToTalk);
 
       $(el).data("rtConnection", connection);
 
-      // Set up Shiny-specific event handling
-      connection.addEventListener("shiny", (data) => {
+      // Set up Shiny-specific event handling; events the server hasn't
+      // subscribed to are dropped here rather than sent over the websocket
+      const eventFilter = getEventFilter(id);
+      const forward = (data: string) => {
         Shiny.setInputValue(id + "_event", data, { priority: "event" });
+      };
+      const batcher = batchOptions
+        ? new EventBatcher(batchOptions, forward)
+        : null;
+      connection.addEventListener("shiny", (data) => {
+        const type = messageType(data);
+        if (type !== null && !eventFilter.accepts(type)) {
+          return;
+        }
+        if (batcher) {
+          batcher.push(data, type);
+        } else {
+          forward(data);
+        }
       });
 
-      // Set up message handler for sending events from Shiny
+      // With the websocket transport, the server attaches its own WebSocket
+      // to this call for events
+      if (transport === "websocket") {
+        if (connection.callId) {
+          Shiny.setInputValue(id + "_call_id", connection.callId);
+        } else {
+          console.warn(
+            "Realtime API did not report a call id; the server can't attach to the call"
+          );
+        }
+      }
+
+      // Set up message handler for sending events from Shiny. The server
+      // sends an array of JSON-encoded events, coalesced per event loop tick
       Shiny.addCustomMessageHandler("realtime_send", (events) => {
         if (Array.isArray(events)) {
           events.forEach((event) => connection.send(event));
@@ -123,6 +229,14 @@ class RealtimeBinding extends Shiny.OutputBinding {
 // Register the binding
 Shiny.outputBindings.register(new RealtimeBinding(), "realtime-output");
 
+// Updates the set of event types the server wants forwarded
+Shiny.addCustomMessageHandler(
+  "realtime_subscribe",
+  ({ id, types }: { id: string; types: string[] | null }) => {
+    getEventFilter(id).setPatterns(types);
+  }
+);
+
 // Plays audio elements, identified by CSS selector
 Shiny.addCustomMessageHandler(
   "play_audio",
@@ -1,2 +1,2 @@
-"use strict";(()=>{var u=class{constructor(e,t,i,c){this.pendingSends=[];this.audioEl=e,this.pc=t,this.dc=i,this.micTrack=c,this.eventListeners=new Map,this.dc.addEventListener("open",()=>{for(;this.pendingSends.length>0;){let n=this.pendingSends.shift();try{this.dc.send(n)}catch(a){console.warn("Failed to flush queued event:",a)}}}),this.dc.addEventListener("message",n=>{let a=n.data;this.eventListeners.forEach(l=>{l(a)})})}close(){console.log("Closing WebRTC connection"),this.micTrack&&this.micTrack.stop(),this.dc&&this.dc.close(),this.pc&&this.pc.close()}get volume(){return this.audioEl.volume}set volume(e){this.audioEl.volume=Math.max(0,Math.min(1,e))}get audioMuted(){return this.audioEl.muted}set audioMuted(e){this.audioEl.muted=e}get micMuted(){return!this.micTrack.enabled}set micMuted(e){this.micTrack.enabled=!e}send(e){console.log("Sending event:",e);let t=JSON.stringify(e),i=this.dc.readyState;i==="open"?this.dc.send(t):i==="connecting"?this.pendingSends.push(t):console.warn(`Dropping event; data channel readyState='${i}':`,e)}addEventListener(e,t){this.eventListeners.set(e,t)}removeEventListener(e){this.eventListeners.delete(e)}getAudioElement(){return this.audioEl}getPeerConnection(){return this.pc}getDataChannel(){return this.dc}getMicrophoneTrack(){return this.micTrack}};var p=class p{constructor(e,t){this.onMuteChange=t;this.muted=!0;this.holdTimeout=null;this.pushToTalkActive=!1;this.suppressNextClick=!1;this.element=e,this.element.addEventListener("mousedown",()=>this.startPress()),this.element.addEventListener("touchstart",()=>this.startPress()),this.element.ownerDocument.addEventListener("keydown",i=>{i.key===" "&&!i.repeat&&(i.preventDefault(),this.startPress())}),this.element.addEventListener("mouseup",()=>this.endPress()),this.element.addEventListener("touchend",()=>this.endPress()),this.element.ownerDocument.addEventListener("keyup",i=>{i.key===" "&&this.endPress()}),this.element.addEventListener("click",i=>this.onClick(i))}isMuted(){return this.muted}isPushToTalkActive(){return this.pushToTalkActive}setMuted(e){this.muted!==e&&(this.muted=e,this.onMuteChange(e))}startPushToTalk(){this.pushToTalkActive=!0,this.setMuted(!1)}stopPushToTalk(){this.pushToTalkActive&&(this.pushToTalkActive=!1,this.setMuted(!0))}toggle(){this.setMuted(!this.muted)}startPress(){this.holdTimeout=window.setTimeout(()=>{this.startPushToTalk(),this.holdTimeout=null},p.HOLD_DELAY)}endPress(){this.suppressNextClick=!0,window.setTimeout(()=>{this.suppressNextClick=!1},0),this.holdTimeout?(clearTimeout(this.holdTimeout),this.holdTimeout=null,this.toggle()):this.stopPushToTalk()}onClick(e){if(this.suppressNextClick){e.preventDefault(),e.stopImmediatePropagation();return}this.toggle()}};p.HOLD_DELAY=200;var h=p;async function T(r,e){let t=new RTCPeerConnection,i=document.createElement("audio");i.autoplay=!0,t.ontrack=s=>i.srcObject=s.streams[0];let n=(await navigator.mediaDevices.getUserMedia({audio:!0})).getTracks()[0];t.addTrack(n),n.enabled=!1;let a=t.createDataChannel("oai-events"),l=await t.createOffer();await t.setLocalDescription(l);let v={type:"answer",sdp:await(await fetch(`https://api.openai.com/v1/realtime/calls?model=${encodeURIComponent(e)}`,{method:"POST",body:l.sdp,headers:{Authorization:`Bearer ${r}`,"Content-Type":"application/sdp"}})).text()};return await t.setRemoteDescription(v),new u(i,t,a,n)}var m=class extends Shiny.OutputBinding{find(e){return $(e).find(".shinyrealtime")}renderValue(e,t){let i=this.getId(e),c=JSON.parse(t),n=c.value,a=c.model,l=T(n,a).then(o=>{$(document).on("shiny:disconnected",function(){console.log("Shiny disconnected, cleaning up any WebRTC connections"),o.close()});let d=e.querySelector(".mic-toggle-btn"),v=new h(d,s=>{o.micMuted=s,s?(d.classList.remove("active","btn-danger"),d.classList.add("btn-secondary")):(d.classList.remove("btn-secondary"),d.classList.add("active","btn-danger"))});return $(e).data("rtConnection",o),o.addEventListener("shiny",s=>{Shiny.setInputValue(i+"_event",s,{priority:"event"})}),Shiny.addCustomMessageHandler("realtime_send",s=>{Array.isArray(s)?s.forEach(g=>o.send(g)):o.send(s)}),o})}unsubscribe(e){let t=$(e).data("rtConnection");t&&typeof t.close=="function"&&(console.log("Closing WebRTC connection due to element unsubscribe"),t.close())}};Shiny.outputBindings.register(new m,"realtime-output");Shiny.addCustomMessageHandler("play_audio",({selector:r})=>{let e=document.querySelector(r);e?(e.currentTime=0,e.play().catch(t=>{console.error("Error playing audio:",t)})):console.error("Audio element not found for selector:",r)});})();
+(()=>{class T{constructor(e,t,s,i,m=null){this.pendingSends=[],this.audioEl=e,this.pc=t,this.dc=s,this.micTrack=i,this.callId=m,this.eventListeners=new Map,this.dc.addEventListener("open",()=>{while(this.pendingSends.length>0){let r=this.pendingSends.shift();try{this.dc.send(r)}catch(a){console.warn("Failed to flush queued event:",a)}}}),this.dc.addEventListener("message",(r)=>{let a=r.data;this.eventListeners.forEach((l)=>{l(a)})})}close(){if(console.log("Closing WebRTC connection"),this.micTrack)this.micTrack.stop();if(this.dc)this.dc.close();if(this.pc)this.pc.close()}get volume(){return this.audioEl.volume}set volume(e){this.audioEl.volume=Math.max(0,Math.min(1,e))}get audioMuted(){return this.audioEl.muted}set audioMuted(e){this.audioEl.muted=e}get micMuted(){return!this.micTrack.enabled}set micMuted(e){this.micTrack.enabled=!e}send(e){console.log("Sending event:",e);let t=typeof e==="string"?e:JSON.stringify(e),s=this.dc.readyState;if(s==="open")this.dc.send(t);else if(s==="connecting")this.pendingSends.push(t);else console.warn(`Dropping event; data channel readyState='${s}':`,e)}addEventListener(e,t){this.eventListeners.set(e,t)}removeEventListener(e){this.eventListeners.delete(e)}getAudioElement(){return this.audioEl}getPeerConnection(){return this.pc}getDataChannel(){return this.dc}getMicrophoneTrack(){return this.micTrack}}function y(e){try{let t=JSON.parse(e).type;return typeof t==="string"?t:null}catch(t){return null}}class d{constructor(){this.acceptAll=!0,this.exact=new Set,this.prefixes=[]}setPatterns(e){this.exact=new Set,this.prefixes=[],this.acceptAll=e===null,(e??[]).forEach((t)=>{if(t==="*")this.acceptAll=!0;else if(t.endsWith(".*")){let s=t.slice(0,-2);this.exact.add(s),this.prefixes.push(s+".")}else this.exact.add(t)})}accepts(e){if(this.acceptAll||this.exact.has(e))return!0;return this.prefixes.some((t)=>e.startsWith(t))}}class v{constructor(e,t){this.options=e,this.onFlush=t,this.buffer=[],this.timer=null,this.exclude=new d,this.exclude.setPatterns(e.exclude)}push(e,t){if(this.buffer.push(e),this.buffer.length>=this.options.size||t!==null&&this.exclude.accepts(t))this.flush();else if(this.timer===null)this.timer=window.setTimeout(()=>this.flush(),this.options.window)}flush(){if(this.timer!==null)clearTimeout(this.timer),this.timer=null;if(this.buffer.length===0)return;let e=JSON.stringify(this.buffer);this.buffer=[],this.onFlush(e)}}class p{constructor(e,t,s=!1){this.onMuteChange=t,this.pushToTalkOnly=s,this.muted=!0,this.holdTimeout=null,this.pushToTalkActive=!1,this.suppressNextClick=!1,this.element=e,this.element.addEventListener("mousedown",()=>this.startPress()),this.element.addEventListener("touchstart",()=>this.startPress()),this.element.ownerDocument.addEventListener("keydown",(i)=>{if(i.key===" "&&!i.repeat)i.preventDefault(),this.startPress()}),this.element.addEventListener("mouseup",()=>this.endPress()),this.element.addEventListener("touchend",()=>this.endPress()),this.element.ownerDocument.addEventListener("keyup",(i)=>{if(i.key===" ")this.endPress()}),this.element.addEventListener("click",(i)=>this.onClick(i))}isMuted(){return this.muted}isPushToTalkActive(){return this.pushToTalkActive}setMuted(e){if(this.muted===e)return;this.muted=e,this.onMuteChange(e)}startPushToTalk(){this.pushToTalkActive=!0,this.setMuted(!1)}stopPushToTalk(){if(this.pushToTalkActive)this.pushToTalkActive=!1,this.setMuted(!0)}toggle(){this.setMuted(!this.muted)}startPress(){if(this.pushToTalkOnly){this.startPushToTalk();return}this.holdTimeout=window.setTimeout(()=>{this.startPushToTalk(),this.holdTimeout=null},p.HOLD_DELAY)}endPress(){if(this.suppressNextClick=!0,window.setTimeout(()=>{this.suppressNextClick=!1},0),this.pushToTalkOnly){this.stopPushToTalk();return}if(this.holdTimeout)clearTimeout(this.holdTimeout),this.holdTimeout=null,this.toggle();else this.stopPushToTalk()}onClick(e){if(this.suppressNextClick){e.preventDefault(),e.stopImmediatePropagation();return}if(this.pushToTalkOnly)return;this.toggle()}}p.HOLD_DELAY=200;async function S(e,t){let s=new RTCPeerConnection,i=document.createElement("audio");i.autoplay=!0,s.ontrack=(b)=>i.srcObject=b.streams[0];let r=(await navigator.mediaDevices.getUserMedia({audio:!0})).getTracks()[0];s.addTrack(r),r.enabled=!1;let a=s.createDataChannel("oai-events"),l=await s.createOffer();await s.setLocalDescription(l);let g=await fetch(`${"https://api.openai.com/v1/realtime/calls"}?model=${encodeURIComponent(t)}`,{method:"POST",body:l.sdp,headers:{Authorization:`Bearer ${e}`,"Content-Type":"application/sdp"}}),o={type:"answer",sdp:await g.text()};await s.setRemoteDescription(o);let c=g.headers.get("Location"),h=c?c.split("/").pop()||null:null;return new T(i,s,a,r,h)}var E=new Map;function x(e){let t=E.get(e);if(!t)t=new d,E.set(e,t);return t}var M=200;class C{constructor(e){this.connection=e,this.responseActive=!1,this.startedAt=0,e.addEventListener("pushToTalk",(t)=>{let s=y(t);if(s==="response.created")this.responseActive=!0;else if(s==="response.done")this.responseActive=!1})}start(){if(this.responseActive)this.connection.send({type:"response.cancel"}),this.connection.send({type:"output_audio_buffer.clear"}),this.responseActive=!1;this.connection.send({type:"input_audio_buffer.clear"}),this.startedAt=Date.now()}end(){if(Date.now()-this.startedAt<M){this.connection.send({type:"input_audio_buffer.clear"});return}this.connection.send({type:"input_audio_buffer.commit"}),this.connection.send({type:"response.create"})}}class L extends Shiny.OutputBinding{find(e){return $(e).find(".shinyrealtime")}renderValue(e,t){let s=this.getId(e),i=JSON.parse(t),{value:m,model:r,batch:a}=i,l=i.transport??"webrtc",f=i.push_to_talk??!1,g=S(m,r).then((o)=>{$(document).on("shiny:disconnected",function(){console.log("Shiny disconnected, cleaning up any WebRTC connections"),o.close()});let c=e.querySelector(".mic-toggle-btn"),h=f?new C(o):null,b=new p(c,(n)=>{if(o.micMuted=n,h)if(n)h.end();else h.start();if(n)c.classList.remove("active","btn-danger"),c.classList.add("btn-secondary");else c.classList.remove("btn-secondary"),c.classList.add("active","btn-danger")},f);$(e).data("rtConnection",o);let A=x(s),k=(n)=>{Shiny.setInputValue(s+"_event",n,{priority:"event"})},w=a?new v(a,k):null;if(o.addEventListener("shiny",(n)=>{let u=y(n);if(u!==null&&!A.accepts(u))return;if(w)w.push(n,u);else k(n)}),l==="websocket")if(o.callId)Shiny.setInputValue(s+"_call_id",o.callId);else console.warn("Realtime API did not report a call id; the server can't attach to the call");return Shiny.addCustomMessageHandler("realtime_send",(n)=>{if(Array.isArray(n))n.forEach((u)=>o.send(u));else o.send(n)}),o})}unsubscribe(e){let t=$(e).data("rtConnection");if(t&&typeof t.close==="function")console.log("Closing WebRTC connection due to element unsubscribe"),t.close()}}Shiny.outputBindings.register(new L,"realtime-output");Shiny.addCustomMessageHandler("realtime_subscribe",({id:e,types:t})=>{x(e).setPatterns(t)});Shiny.addCustomMessageHandler("play_audio",({selector:e})=>{let t=document.querySelector(e);if(t)t.currentTime=0,t.play().catch((s)=>{console.error("Error playing audio:",s)});else console.error("Audio element not found for selector:",e)});})();
 //# sourceMappingURL=app.js.map